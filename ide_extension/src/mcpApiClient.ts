@@ -16,39 +16,55 @@ export interface McpServerData {
 
 export interface ServerListResponse {
 	servers: McpServerData[];
-	total: number;
+	total: number | null;
 	offset: number;
 	limit: number;
+	next_cursor: string | null;
 }
 
+const MAX_ETAG_ENTRIES = 500;
+
 export class McpApiClient {
 	private baseUrl: string;
+	// Last response body per URL, revalidated with If-None-Match so unchanged data costs a 304
+	private etagCache = new Map<string, { etag: string; body: unknown }>();
 
 	constructor() {
 		const config = vscode.workspace.getConfiguration('mcpRegistry');
 		this.baseUrl = config.get('apiBaseUrl', 'http://localhost:5000');
 	}
 
-	async getServers(query?: string, limit: number = 50, token?: string): Promise<ServerListResponse> {
+	async getServers(query?: string, limit: number = 50, token?: string, cursor?: string, includeTotal: boolean = true): Promise<ServerListResponse> {
 		const url = new URL(`${this.baseUrl}/v0/servers`);
 		if (query) {
 			url.searchParams.append('q', query);
 		}
 		url.searchParams.append('limit', limit.toString());
+		if (cursor) {
+			url.searchParams.append('cursor', cursor);
+		}
+		if (!includeTotal) {
+			url.searchParams.append('include_total', 'false');
+		}
 
 		const headers: Record<string, string> = {};
 		if (token) {
 			headers['Authorization'] = `Bearer ${token}`;
 		}
 
-		const response = await fetch(url.toString(), {
-			headers
-		});
-		if (!response.ok) {
-			throw new Error(`Failed to fetch servers: ${response.statusText}`);
-		}
+		return this.getJson<ServerListResponse>(url.toString(), headers, 'Failed to fetch servers');
+	}
 
-		return await response.json() as ServerListResponse;
+	async getAllServers(query?: string, pageSize: number = 100, token?: string): Promise<McpServerData[]> {
+		// Walk every page with keyset cursors; each page costs the same regardless of depth
+		const servers: McpServerData[] = [];
+		let cursor: string | undefined;
+		do {
+			const page = await this.getServers(query, pageSize, token, cursor, false);
+			servers.push(...page.servers);
+			cursor = page.next_cursor ?? undefined;
+		} while (cursor);
+		return servers;
 	}
 
 	async getServerDetails(serverId: string, token?: string): Promise<McpServerData> {
@@ -57,14 +73,35 @@ export class McpApiClient {
 			headers['Authorization'] = `Bearer ${token}`;
 		}
 
-		const response = await fetch(`${this.baseUrl}/v0/servers/${encodeURIComponent(serverId)}`, {
-			headers
-		});
+		return this.getJson<McpServerData>(
+			`${this.baseUrl}/v0/servers/${encodeURIComponent(serverId)}`, headers, 'Failed to fetch server details'
+		);
+	}
+
+	private async getJson<T>(url: string, headers: Record<string, string>, errorMessage: string): Promise<T> {
+		const cached = this.etagCache.get(url);
+		if (cached) {
+			headers['If-None-Match'] = cached.etag;
+		}
+
+		const response = await fetch(url, { headers });
+		if (response.status === 304 && cached) {
+			return cached.body as T;
+		}
 		if (!response.ok) {
-			throw new Error(`Failed to fetch server details: ${response.statusText}`);
+			throw new Error(`${errorMessage}: ${response.statusText}`);
 		}
 
-		return await response.json() as McpServerData;
+		const body = await response.json() as T;
+		const etag = response.headers.get('ETag');
+		if (etag) {
+			this.etagCache.delete(url);
+			this.etagCache.set(url, { etag, body });
+			if (this.etagCache.size > MAX_ETAG_ENTRIES) {
+				this.etagCache.delete(this.etagCache.keys().next().value as string);
+			}
+		}
+		return body;
 	}
 
 	async publishServer(serverConfig: any, namespace: string, token: string): Promise<void> {
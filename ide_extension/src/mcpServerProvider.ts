@@ -86,8 +86,8 @@ export class McpServerProvider implements vscode.TreeDataProvider<McpTreeItem> {
 			const token = await this.authManager.getToken();
 			const authDisabled = await this.authManager.isAuthenticationDisabled();
 			
-			const serverData = await this.apiClient.getServers(undefined, 50, token);
-			this.servers = serverData.servers.map((server: McpServerData) => 
+			const serverData = await this.apiClient.getAllServers(undefined, 100, token);
+			this.servers = serverData.map((server: McpServerData) => 
 				new McpServer(
 					server.id,
 					server.name,
@@ -1,40 +1,127 @@
-from flask import Flask, request, jsonify, abort
-from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity, create_access_token
+from flask import Flask, request, jsonify, abort, make_response, g
+from werkzeug.exceptions import HTTPException
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt, get_jwt_identity, create_access_token
 import pymongo
 from dotenv import load_dotenv
 from models import Server, Tool
+from cache import TTLCache, CachedServer
+from serialization import RegistryJSONProvider, dumps, json_response
+from compression import choose_encoding, compress, prepare_response as prepare_compression, set_encoded_body
+from auth_cache import Identity, JWKSCache, TokenValidator
+from search import InvertedIndex, SEARCH_PROJECTION
+from tool_index import ToolIndex, TOOL_INDEX_PROJECTION, MATCH_MODES
+from sync import ChangeSync
+from audit import AuditWriter
+from versions import bump_registry_version, get_registry_version, reserve_sync_seqs
+from logs import configure_logging, get_logger
+from indexes import ensure_indexes, verify_query_plans
+from db import LazyCollection, LazyDatabase, reset_client
+from metrics import registry as metrics_registry, request_db_stats, reset_request_db_stats, stats_collector, SIZE_BUCKETS, COUNT_BUCKETS
 from msal import ConfidentialClientApplication
+from jwt import PyJWTError
 import os
+import base64
+import hashlib
+import threading
+import json
+import logging
+import re
+import time
+import zlib
 from datetime import timedelta, datetime, timezone
 from typing import Optional
 
 
 load_dotenv(os.path.join(os.getcwd(), "kpmcpg", ".env"))
 
+# Structured JSON-lines logging through a queue drained by a background thread.
+# Categories: app (startup/lifecycle), query (per-request list queries, DEBUG),
+# request (slow requests), search, sync, audit
+log_pipeline = configure_logging()
+log = get_logger('app')
+query_log = get_logger('query')
+request_log = get_logger('request')
+
 # Development mode configuration
 DEV_MODE = os.getenv('DEV_MODE', 'false').lower() == 'true'
 MOCK_USER_EMAIL = os.getenv('MOCK_USER_EMAIL', 'dev@kp.com')
 
 app = Flask(__name__)
+app.json = RegistryJSONProvider(app)  # orjson when installed (serialization.py)
 if DEV_MODE:
     app.config['JWT_SECRET_KEY'] = os.getenv('MOCK_JWT_SECRET', 'dev-secret')
-    print("🔧 Running in DEVELOPMENT MODE with mock authentication")
+    log.info("Running in development mode with mock authentication")
 else:
     app.config['JWT_SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY')
-    print("🔐 Running in PRODUCTION MODE with Azure AD")
+    log.info("Running in production mode with Azure AD")
 
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
 jwt = JWTManager(app)
 
-# MongoDB
-client = pymongo.MongoClient(os.getenv('MONGO_URI'))
-db = client['Agentic']  # Match the database name used in seed.py
-servers_collection = db['servers']
-audits_collection = db['audits']
+# MongoDB handles (db.py): the client is created lazily per process, so pre-fork
+# servers never share a parent's connections with their workers
+db = LazyDatabase()
+servers_collection = LazyCollection('servers')
+# Single-server reads and export may be served by secondaries (MONGO_READ_PREFERENCE).
+# Lists stay on the primary, like the version their ETags come from, as do writes, the
+# changes feed and post-write refreshes
+servers_reads = LazyCollection('servers', secondary_reads=True)
+audits_collection = LazyCollection('audits')
+meta_collection = LazyCollection('meta')
+tombstones_collection = LazyCollection('tombstones')  # Deleted server ids, for the changes feed
+
+# Audit entries are queued and written in batches by a background thread
+audit_writer = AuditWriter(
+    audits_collection,
+    batch_size=int(os.getenv('AUDIT_BATCH_SIZE', 100)),
+    flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0)),
+    max_queue=int(os.getenv('AUDIT_QUEUE_SIZE', 10000)),
+    spill_path=os.getenv('AUDIT_SPILL_PATH') or None,
+    enabled=os.getenv('AUDIT_ASYNC', 'true').lower() == 'true'
+)
 
 # Global flag to track text search support
 TEXT_SEARCH_SUPPORTED = None
 
+# In-process read-through cache of serialized server documents keyed by id
+server_cache = TTLCache(
+    max_size=int(os.getenv('SERVER_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('SERVER_CACHE_TTL', 60))
+)
+# Keep each cached server's encoded response body, so hot GETs skip JSON encoding
+SERVER_CACHE_BODIES = os.getenv('SERVER_CACHE_BODIES', 'true').lower() == 'true'
+
+# Search backend for `q`: 'mongo' ($text, or $regex fallback) or 'memory' (in-process inverted index)
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'mongo').lower()
+search_index = InvertedIndex() if SEARCH_BACKEND == 'memory' else None
+
+# Tool name -> servers exposing it, for GET /v0/tools (kept in memory, follows writes like the search index)
+tool_index = ToolIndex()
+
+# Short-lived cache of list totals keyed by the normalized query
+count_cache = TTLCache(
+    max_size=int(os.getenv('COUNT_CACHE_SIZE', 256)),
+    ttl=float(os.getenv('COUNT_CACHE_TTL', 5))
+)
+
+# Cache-Control max-age for read endpoints; clients revalidate with ETags after it expires
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', 0))
+
+# Changes feed: max entries per page, and how long a write must have settled before it
+# is served (a write that reserved an earlier sequence number may still be in flight)
+MAX_CHANGES_LIMIT = int(os.getenv('MAX_CHANGES_LIMIT', 1000))
+CHANGES_GAP_TIMEOUT = float(os.getenv('CHANGES_GAP_TIMEOUT', 30))
+
+# Upper bound on servers accepted by one POST /v0/servers:batch
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 500))
+
+# GET /v0/servers:export: documents read and encoded per batch, and gzip level
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 500))
+EXPORT_GZIP_LEVEL = int(os.getenv('EXPORT_GZIP_LEVEL', 6))
+
+# Create missing indexes and check query plans for collection scans at startup
+ENSURE_INDEXES = os.getenv('ENSURE_INDEXES', 'true').lower() == 'true'
+
 # Azure AD Config (only in production mode)
 if not DEV_MODE:
     AUTHORITY = os.getenv('AZURE_AUTHORITY')
@@ -44,62 +131,453 @@ if not DEV_MODE:
         app_instance = ConfidentialClientApplication(
             CLIENT_ID, authority=AUTHORITY, client_credential=CLIENT_SECRET
         )
-        print("✅ Azure AD client initialized")
+        log.info("Azure AD client initialized")
     except Exception as e:
-        print(f"⚠️  Warning: Azure AD initialization failed: {e}")
+        log.warning("Azure AD initialization failed: %s", e)
         app_instance = None
+
+    # Azure AD tokens are verified locally against the tenant's signing keys (cached,
+    # refreshed on rotation); verified identities are cached until the token expires
+    authority = (AUTHORITY or '').rstrip('/')
+    AUTH_JWKS_URI = os.getenv('AUTH_JWKS_URI') or (f'{authority}/discovery/v2.0/keys' if authority else None)
+    AUTH_ISSUER = os.getenv('AUTH_ISSUER') or (f'{authority}/v2.0' if authority else None)
+    if AUTH_JWKS_URI and AUTH_ISSUER:
+        token_validator = TokenValidator(
+            JWKSCache(AUTH_JWKS_URI,
+                      ttl=float(os.getenv('AUTH_JWKS_TTL', 3600)),
+                      min_refresh_interval=float(os.getenv('AUTH_JWKS_MIN_REFRESH', 60))),
+            issuer=AUTH_ISSUER,
+            audience=os.getenv('AUTH_AUDIENCE') or CLIENT_ID,
+            cache_size=int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000)),
+            cache_ttl=float(os.getenv('AUTH_TOKEN_CACHE_TTL', 3600))
+        )
+    else:
+        token_validator = None
+        log.warning("Token validation not configured (set AZURE_AUTHORITY or AUTH_JWKS_URI and AUTH_ISSUER)")
 else:
     app_instance = None
-    print("🔧 Skipping Azure AD initialization in development mode")
+    token_validator = None
+    log.info("Skipping Azure AD initialization in development mode")
 
 # Helper: Validate Azure AD token and get user
-def validate_token(token: str) -> str:
+def validate_token(token: str) -> Identity:
     if DEV_MODE:
         # Mock validation - always return mock user
-        return MOCK_USER_EMAIL
-    
-    if not app_instance:
+        return Identity(user_id=MOCK_USER_EMAIL, email=MOCK_USER_EMAIL, subject=None, expires_at=0)
+
+    if not token_validator:
         abort(401, "Authentication not configured")
-        
+
     try:
-        result = app_instance.acquire_token_silent(scopes=['User.Read'], account=None)
-        if not result:
-            abort(401, "Invalid token")
-        # In prod, decode token to get email/group
-        user_email = "user@example.com"  # Placeholder; use jwt.decode(token) for real
-        return user_email
-    except Exception as e:
+        return token_validator.validate(token)
+    except PyJWTError as e:
         abort(401, f"Token validation failed: {str(e)}")
 
-# Helper: Audit log
+# Helper: Registry access token. Its identity (the server `owner`) is the user's immutable id;
+# the email rides along as a claim for display only.
+def issue_token(user_id: str, email: Optional[str]) -> str:
+    return create_access_token(identity=user_id, additional_claims={'email': email})
+
+# Helper: (owner id, display email) of the caller's registry token
+def current_user() -> tuple:
+    return get_jwt_identity(), get_jwt().get('email')
+
+# Helper: Audit log (queued; written asynchronously in batches)
 def log_audit(action: str, user_id: str, server_id: Optional[str] = None, details: dict = None):
-    audits_collection.insert_one({
-        "action": action, "user_id": user_id, "server_id": server_id,
-        "timestamp": datetime.now(timezone.utc), "details": details or {}
+    log_audits([(action, user_id, server_id, details)])
+
+# Helper: Audit log for many writes at once
+def log_audits(entries: list):
+    now = datetime.now(timezone.utc)
+    audit_writer.submit_many([
+        {"action": action, "user_id": user_id, "server_id": server_id,
+         "timestamp": now, "details": details or {}}
+        for action, user_id, server_id, details in entries
+    ])
+
+# Projection for server documents returned by the API: `sync_seq` is internal bookkeeping
+# for the changes feed, and would otherwise change server ETags on every rewrite
+SERVER_PROJECTION = {'_id': 0, 'sync_seq': 0}
+
+# Helper: Read-through lookup of a single server document (with its ETag)
+def load_server(server_id: str) -> Optional[CachedServer]:
+    entry = server_cache.get(server_id)
+    if entry is not None:
+        return entry
+    server = servers_reads.find_one({'id': server_id}, SERVER_PROJECTION)
+    if server is None:
+        return None
+    entry = CachedServer(server, keep_body=SERVER_CACHE_BODIES)
+    server_cache.set(server_id, entry)
+    return entry
+
+# Helper: True when the client's validators match and a 304 can be sent
+def is_not_modified(etag: str, last_modified: Optional[datetime] = None, req=None) -> bool:
+    req = req if req is not None else request
+    if req.if_none_match:
+        # Weak comparison: compressed responses carry the ETag as W/"..."
+        return req.if_none_match.contains_weak(etag)
+    if last_modified is not None and req.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= req.if_modified_since
+    return False
+
+# Helper: Attach validators and Cache-Control to a read response (or answer 304)
+def conditional_response(etag: str, build_body, last_modified: Optional[datetime] = None):
+    if is_not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(build_body())
+    return set_cache_headers(response, etag, last_modified)
+
+# Helper: Conditional response whose ETag hashes the built body. For bodies read from this
+# worker's in-memory indexes, which the registry version does not describe
+def hashed_conditional_response(build_body):
+    response = make_response(build_body())
+    etag = hashlib.sha1(response.get_data()).hexdigest()
+    if is_not_modified(etag):
+        response = make_response('', 304)
+    return set_cache_headers(response, etag)
+
+# Helper: Response for a cached server's body (or its /tools body) in the client's preferred
+# content encoding. Compressed bytes are kept on the cache entry, so each is compressed once.
+def cached_body_response(application, entry: CachedServer, tools: bool = False, req=None):
+    req = req if req is not None else request
+    encoding = choose_encoding(req.accept_encodings, len(entry.tools_body if tools else entry.body))
+    response = json_response(application, entry.encoded(encoding, tools))
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+# Helper: Validators and Cache-Control for read responses
+def set_cache_headers(response, etag: str, last_modified: Optional[datetime] = None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = HTTP_CACHE_MAX_AGE
+    response.cache_control.must_revalidate = True
+    return response
+
+# Helper: Reserve changes-feed sequence numbers for `count` writes (stamped as `sync_seq`).
+# Returns the first one.
+def next_sync_seq(count: int = 1) -> int:
+    return reserve_sync_seqs(meta_collection, count)
+
+# Helper: Advance the registry version, which drives list ETags, once writes have committed.
+# Bumping it earlier would let a concurrent list pair the new ETag with the old body.
+def record_writes(count: int = 1):
+    bump_registry_version(meta_collection, count)
+
+_search_index_lock = threading.Lock()
+
+# Helper: Build the in-memory search index from the collection (once per process)
+def ensure_search_index():
+    if search_index is None or search_index.built:
+        return
+    with _search_index_lock:
+        if not search_index.built:
+            indexed = search_index.rebuild(servers_collection.find({}, SEARCH_PROJECTION))
+            get_logger('search').info("Built in-memory search index over %d servers", indexed)
+
+_tool_index_lock = threading.Lock()
+
+# Helper: Build the in-memory tool index from the collection (once per process)
+def ensure_tool_index():
+    if tool_index.built:
+        return
+    with _tool_index_lock:
+        if not tool_index.built:
+            indexed = tool_index.rebuild(servers_collection.find({}, TOOL_INDEX_PROJECTION))
+            get_logger('search').info("Built in-memory tool index over %d servers", indexed)
+
+# Helper: In-memory indexes, which must follow every write. Stale or mid-rebuild ones too:
+# rebuild() holds the index lock while reading the collection, so a write applied
+# during a rebuild lands after it and wins over the copy the rebuild read
+def local_indexes() -> list:
+    return [index for index in (search_index, tool_index) if index is not None]
+
+# Helper: Refresh cached state after a write. Servers are re-read from the primary and
+# primed into the cache, so a lagging secondary cannot put a stale copy there.
+def refresh_servers(server_ids: list):
+    count_cache.clear()
+    found = {doc['id']: doc for doc in servers_collection.find({'id': {'$in': server_ids}}, SERVER_PROJECTION)}
+    indexes = local_indexes()
+    for server_id in server_ids:
+        doc = found.get(server_id)
+        if doc is None:
+            server_cache.invalidate(server_id)
+        else:
+            server_cache.set(server_id, CachedServer(doc, keep_body=SERVER_CACHE_BODIES))
+        for index in indexes:
+            if doc is None:
+                index.remove(server_id)
+            else:
+                index.add(doc)
+
+# Helper: Update cached state for a server after a write (or drop it after a delete)
+def invalidate_server(server_id: str, deleted: bool = False):
+    if not deleted:
+        refresh_servers([server_id])
+        return
+    server_cache.invalidate(server_id)
+    count_cache.clear()
+    for index in local_indexes():
+        index.remove(server_id)
+
+# Helper: Drop all local state when a change cannot be attributed to one server
+def reset_local_state():
+    server_cache.clear()
+    count_cache.clear()
+    if search_index is not None:
+        search_index.invalidate()
+    tool_index.invalidate()
+
+# Helper: Apply a write observed by the background sync (possibly from another worker)
+def apply_remote_change(server_id: Optional[str], deleted: bool):
+    if server_id is None:
+        reset_local_state()
+    else:
+        invalidate_server(server_id, deleted=deleted)
+
+# Keeps caches and the search index coherent across workers/pods:
+# 'auto' (change streams, else polling), 'changestream', 'poll' or 'off'
+change_sync = ChangeSync(
+    servers_collection, tombstones_collection,
+    mode=os.getenv('SYNC_MODE', 'auto').lower(),
+    poll_interval=float(os.getenv('SYNC_POLL_INTERVAL', 2))
+)
+change_sync.add_listener(apply_remote_change)
+
+@app.before_request
+def start_background_sync():
+    log_pipeline.ensure_started()
+    change_sync.ensure_started()
+
+# Request instrumentation, exposed per worker process on GET /metrics (Prometheus text format)
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0))  # 0 disables the slow-request log
+
+http_request_seconds = metrics_registry.histogram(
+    'registry_http_request_duration_seconds', 'Request latency by route', ['method', 'route', 'status'])
+http_response_bytes = metrics_registry.histogram(
+    'registry_http_response_bytes', 'Response body size by route', ['method', 'route'], SIZE_BUCKETS)
+http_request_mongo_operations = metrics_registry.histogram(
+    'registry_http_request_mongo_operations', 'MongoDB commands issued per request', ['method', 'route'], COUNT_BUCKETS)
+http_request_mongo_seconds = metrics_registry.histogram(
+    'registry_http_request_mongo_seconds', 'Time spent in MongoDB commands per request', ['method', 'route'])
+http_slow_requests = metrics_registry.counter(
+    'registry_http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS', ['method', 'route'])
+
+cache_stats = {'server': server_cache.stats, 'count': count_cache.stats}
+if token_validator is not None:
+    cache_stats['token'] = token_validator.cache.stats
+    metrics_registry.gauges('registry_auth_jwks_fetches_total', 'Signing key set fetches by outcome', ['outcome'],
+                            lambda: {('ok',): token_validator.jwks.fetches, ('failed',): token_validator.jwks.failures},
+                            metric_type='counter')
+metrics_registry.gauges('registry_cache_entries', 'Entries held in in-process caches', ['cache'],
+                        stats_collector(cache_stats, 'size'))
+for counter_name in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+    metrics_registry.gauges(f'registry_cache_{counter_name}_total', f'Cache {counter_name}', ['cache'],
+                            stats_collector(cache_stats, counter_name), metric_type='counter')
+search_stats = {SEARCH_BACKEND: search_index.stats} if search_index is not None else {}
+metrics_registry.gauges('registry_search_index_documents', 'Documents in the in-memory search index', ['backend'],
+                        stats_collector(search_stats, 'documents'))
+metrics_registry.gauges('registry_search_index_terms', 'Distinct terms in the in-memory search index', ['backend'],
+                        stats_collector(search_stats, 'terms'))
+metrics_registry.gauges('registry_tool_index_tools', 'Distinct tool names in the tool index', [],
+                        lambda: {(): tool_index.stats()['tools']})
+metrics_registry.gauges('registry_audit_queue_depth', 'Audit entries waiting to be written', [],
+                        lambda: {(): audit_writer.stats()['queued']})
+metrics_registry.gauges('registry_audit_entries_total', 'Audit entries by outcome', ['outcome'],
+                        lambda: {(key,): value for key, value in audit_writer.stats().items()
+                                 if key in ('written', 'spilled', 'replayed', 'dropped', 'sync_writes', 'failures')},
+                        metric_type='counter')
+metrics_registry.gauges('registry_sync_events_total', 'Changes applied by the background sync', [],
+                        lambda: {(): change_sync.events}, metric_type='counter')
+metrics_registry.gauges('registry_sync_errors_total', 'Background sync failures', [],
+                        lambda: {(): change_sync.errors}, metric_type='counter')
+metrics_registry.gauges('registry_sync_connected', 'Whether the background sync is receiving changes (1) or not (0)',
+                        [], lambda: {(): int(change_sync.connected)})
+metrics_registry.gauges('registry_log_records_dropped_total', 'Log records dropped because the log queue was full', [],
+                        lambda: {(): log_pipeline.handler.dropped}, metric_type='counter')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    reset_request_db_stats()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    # Streamed bodies have no length until they are sent
+    size = None if response.is_streamed else response.calculate_content_length()
+    observe_request(request, response.status_code, time.perf_counter() - started, size,
+                    g.get('mongo_query'), request_db_stats)
+    return response
+
+# Compress eligible bodies (compression.py). Registered after the metrics hook so it runs
+# first, and response sizes are recorded as sent.
+@app.after_request
+def compress_response(response):
+    encoding = prepare_compression(response, request.accept_encodings)
+    if encoding is not None:
+        set_encoded_body(response, compress(response.get_data(), encoding), encoding)
+    return response
+
+# Helper: Record one finished request (shared with the async serving mode, which has
+# no per-request database stats because Motor runs commands on its own threads)
+def observe_request(req, status: int, elapsed: float, size: Optional[int], mongo_query: Optional[dict] = None,
+                    db_stats=None):
+    method = req.method
+    route = req.url_rule.rule if req.url_rule is not None else 'unmatched'
+    http_request_seconds.observe(elapsed, method=method, route=route, status=status)
+    if db_stats is not None:
+        http_request_mongo_operations.observe(db_stats.operations, method=method, route=route)
+        http_request_mongo_seconds.observe(db_stats.seconds, method=method, route=route)
+    if size is not None:
+        http_response_bytes.observe(size, method=method, route=route)
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        http_slow_requests.inc(method=method, route=route)
+        request_log.warning("Slow request", extra={
+            'method': method,
+            'path': req.full_path.rstrip('?'),
+            'status': status,
+            'duration_ms': round(elapsed * 1000, 1),
+            'mongo_operations': db_stats.operations if db_stats is not None else None,
+            'mongo_ms': round(db_stats.seconds * 1000, 1) if db_stats is not None else None,
+            'mongo_query': mongo_query,
+        })
+
+# Helper: Total matching documents, served from the count cache when fresh. Keyed by the
+# registry version the list ETag was built from, so a total never outlives a write.
+def count_servers(mongo_query: dict, version: int) -> int:
+    key = json.dumps([version, mongo_query], sort_keys=True, default=str)
+    total = count_cache.get(key)
+    if total is None:
+        total = servers_collection.count_documents(mongo_query)
+        count_cache.set(key, total)
+    return total
+
+# Helper: Opaque pagination cursor. Holds {'id': last_id} for keyset pages sorted by
+# the unique `id`, or {'o': offset} for ranked search results.
+def encode_cursor(state: dict) -> str:
+    raw = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        abort(400, "Invalid cursor")
+    if not isinstance(state, dict) or not (isinstance(state.get('id'), str) or isinstance(state.get('o'), int)):
+        abort(400, "Invalid cursor")
+    return state
+
+# Fields returned by `view=summary` (what list UIs actually render)
+SUMMARY_FIELDS = ['id', 'name', 'description', 'version', 'endpoint', 'owner', 'owner_email', 'team', 'tags', 'tools.name',
+                  'updated_at']
+# Dotted field path: no empty segment, no `$` operators
+FIELD_PATH = re.compile(r'[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*')
+
+# Helper: Mongo projection for the `fields` / `view` list parameters
+def list_projection(fields: str, view: str) -> dict:
+    if view == 'summary':
+        names = list(SUMMARY_FIELDS)
+    elif view in ('', 'full'):
+        names = [name.strip() for name in fields.split(',') if name.strip()] if fields else []
+    else:
+        abort(400, f"Unknown view '{view}'. Use 'full' or 'summary'")
+    if not names:
+        return dict(SERVER_PROJECTION)
+    invalid = [name for name in names if not FIELD_PATH.fullmatch(name)]
+    if invalid:
+        abort(400, f"Invalid fields: {', '.join(invalid)}")
+    unknown = [name for name in names if name.split('.', 1)[0] not in Server.model_fields]
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}")
+    projection = {'_id': 0, 'id': 1}  # `id` is always returned; cursors depend on it
+    for name in names:
+        # A parent path makes its sub-paths redundant (and Mongo rejects the overlap)
+        if not any(name.startswith(other + '.') for other in names + ['id']):
+            projection[name] = 1
+    return projection
+
+# Helper: Page of ids from the in-memory search ranking -> (page_ids, end_offset, total)
+def ranked_page(query: str, tools: Optional[list], limit: int, offset: int, id_prefix: str = ''):
+    ranked_ids = search_index.search(query, tools=tools)
+    if id_prefix:
+        ranked_ids = [server_id for server_id in ranked_ids if server_id.startswith(id_prefix)]
+    end = offset + limit
+    return ranked_ids[offset:end], end, len(ranked_ids)
+
+# Helper: One page of ranked results from the in-memory search index
+def search_index_page(query: str, tools: Optional[list], limit: int, offset: int, include_total: bool,
+                      projection: dict, id_prefix: str = ''):
+    ensure_search_index()
+    page_ids, end, total = ranked_page(query, tools, limit, offset, id_prefix)
+    docs = {doc['id']: doc for doc in servers_collection.find({'id': {'$in': page_ids}}, projection)}
+    servers = [docs[server_id] for server_id in page_ids if server_id in docs]
+    next_cursor = encode_cursor({'o': end}) if end < total else None
+    return jsonify({
+        "servers": servers,
+        "total": total if include_total else None,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": next_cursor
     })
 
-@app.route('/v0/servers', methods=['GET'])
-def list_servers():
+# Helper: List ETag. It depends only on the registry version and the query string,
+# so unchanged polls are answered with 304 without running the query. Not for
+# SEARCH_BACKEND=memory searches, whose rankings come from this worker's index.
+def list_etag(version: int, args) -> str:
+    items = sorted(args.items(multi=True))
+    return hashlib.sha1(f"{version}|{SEARCH_BACKEND}|{items}".encode('utf-8')).hexdigest()
+
+# Helper: Integer query parameter of at least `minimum` (aborts with 400 otherwise)
+def int_arg(args, name: str, default: int, minimum: int) -> int:
+    try:
+        value = int(args.get(name, default))
+    except (TypeError, ValueError):
+        abort(400, f"{name} must be an integer")
+    if value < minimum:
+        abort(400, f"{name} must be at least {minimum}")
+    return value
+
+# Helper: Parse the list query string (aborts on invalid limit/offset/cursor/fields/view)
+def parse_list_args(args) -> dict:
+    return {
+        'query': args.get('q', ''),
+        'tools_filter': args.get('tools', ''),
+        'id_prefix': args.get('id_prefix', ''),
+        'limit': int_arg(args, 'limit', 20, 1),
+        'offset': int_arg(args, 'offset', 0, 0),
+        'cursor': args.get('cursor'),
+        'include_total': args.get('include_total', 'true').lower() != 'false',
+        # Push the requested fields down to Mongo so unused data never leaves the database
+        'projection': list_projection(args.get('fields', ''), args.get('view', '').lower()),
+    }
+
+# Helper: Check (once) whether the database supports $text search
+def check_text_search(collection=None):
     global TEXT_SEARCH_SUPPORTED
-    
-    query = request.args.get('q', '')
-    tools_filter = request.args.get('tools', '')
-    limit = int(request.args.get('limit', 20))
-    offset = int(request.args.get('offset', 0))
-    
+    if TEXT_SEARCH_SUPPORTED is not None:
+        return TEXT_SEARCH_SUPPORTED
+    try:
+        # Test if text search is supported
+        (collection or servers_collection).count_documents({'$text': {'$search': 'test'}})
+        TEXT_SEARCH_SUPPORTED = True
+        log.info("Text search is supported")
+    except Exception as e:
+        TEXT_SEARCH_SUPPORTED = False
+        log.info("Text search not supported, using regex fallback: %s", e)
+    return TEXT_SEARCH_SUPPORTED
+
+# Helper: Mongo filter for the `q`, `tools` and `id_prefix` list parameters
+def build_list_query(query: str, tools_filter: str, id_prefix: str = '') -> dict:
     mongo_query = {}
     
-    # Check if text search is supported (cache the result)
-    if TEXT_SEARCH_SUPPORTED is None:
-        try:
-            # Test if text search is supported
-            servers_collection.count_documents({'$text': {'$search': 'test'}})
-            TEXT_SEARCH_SUPPORTED = True
-            print("ℹ️  Text search is supported")
-        except Exception as e:
-            TEXT_SEARCH_SUPPORTED = False
-            print(f"ℹ️  Text search not supported, using regex fallback: {e}")
-    
     # Handle text search based on support
     if query:
         if TEXT_SEARCH_SUPPORTED:
@@ -107,67 +585,265 @@ def list_servers():
             mongo_query['$text'] = {'$search': query}
         else:
             # Use case-insensitive regex fallback for "contains" search
-            import re
             escaped_query = re.escape(query)  # Escape special regex characters
             mongo_query['$or'] = [
                 {'name': {'$regex': escaped_query, '$options': 'i'}},
                 {'description': {'$regex': escaped_query, '$options': 'i'}},
                 {'tags': {'$regex': escaped_query, '$options': 'i'}}
             ]
-            print(f"🔍 Using regex search for: '{query}' -> '{escaped_query}'")
     
     # Tool filtering
     if tools_filter:
         mongo_query['tools.name'] = {'$in': tools_filter.split(',')}
     
-    print(f"🔍 Final query: {mongo_query}")  # Debug: show final query
+    # Namespace filter: an anchored, case-sensitive regex is a range scan on the unique id index
+    if id_prefix:
+        mongo_query['id'] = {'$regex': '^' + re.escape(id_prefix)}
+    
+    # Per-request query logging is off unless LOG_LEVELS enables query=DEBUG (optionally sampled)
+    if query_log.isEnabledFor(logging.DEBUG):
+        query_log.debug("List query", extra={'q': query, 'tools': tools_filter, 'id_prefix': id_prefix,
+                                             'mongo_query': mongo_query})
+    return mongo_query
+
+# Helper: Keyset pagination. A cursor resumes after the last id of the previous page,
+# so deep pages cost the same as the first one. Offset is kept for compatibility.
+def keyset_page_query(mongo_query: dict, cursor: Optional[str]) -> dict:
+    if not cursor:
+        return mongo_query
+    last_id = decode_cursor(cursor).get('id')
+    if last_id is None:
+        abort(400, "Invalid cursor")
+    return dict(mongo_query, id=dict(mongo_query.get('id', {}), **{'$gt': last_id}))
+
+# Helper: Trim the extra document fetched past the page limit -> (servers, next_cursor)
+def trim_page(servers: list, limit: int):
+    if len(servers) > limit:
+        servers = servers[:limit]
+        return servers, encode_cursor({'id': servers[-1]['id']})
+    return servers, None
+
+@app.route('/v0/servers', methods=['GET'])
+def list_servers():
+    if request.args.get('q') and search_index is not None:
+        return hashed_conditional_response(query_servers)
+    version = get_registry_version(meta_collection)
+    return conditional_response(list_etag(version, request.args), lambda: query_servers(version))
+
+def query_servers(version: Optional[int] = None):
+    """Run the list query for the current request and build the JSON response"""
+    params = parse_list_args(request.args)
+    query, tools_filter, limit, offset, cursor = (
+        params['query'], params['tools_filter'], params['limit'], params['offset'], params['cursor'])
+    
+    # Ranked search from the in-process index; pages are offsets into the ranking
+    if query and search_index is not None:
+        if cursor:
+            offset = decode_cursor(cursor).get('o', 0)
+        tools = tools_filter.split(',') if tools_filter else None
+        return search_index_page(query, tools, limit, offset, params['include_total'], params['projection'],
+                                 params['id_prefix'])
+    
+    check_text_search()
+    mongo_query = build_list_query(query, tools_filter, params['id_prefix'])
+    g.mongo_query = mongo_query  # For the slow-request log
     
     # Execute query (should work with either text search or regex)
-    total = servers_collection.count_documents(mongo_query)
-    servers = list(servers_collection.find(mongo_query).skip(offset).limit(limit))
+    # Total is optional; pagers that already know it can skip the second scan
+    total = count_servers(mongo_query, version) if params['include_total'] else None
     
-    # Remove MongoDB ObjectId from results
-    for server in servers:
-        server.pop('_id', None)
+    page_query = keyset_page_query(mongo_query, cursor)
+    if cursor:
+        offset = 0
+    
+    # Fetch one extra document to know whether another page exists
+    find_cursor = servers_collection.find(page_query, params['projection']).sort('id', pymongo.ASCENDING)
+    if offset:
+        find_cursor = find_cursor.skip(offset)
+    servers, next_cursor = trim_page(list(find_cursor.limit(limit + 1)), limit)
     
     return jsonify({
         "servers": servers,
         "total": total,
         "offset": offset,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
+    })
+
+@app.route('/v0/tools', methods=['GET'])
+def list_tools():
+    """Servers exposing a tool, by exact, prefix (default) or fuzzy tool name"""
+    # Served from this worker's tool index, so the ETag hashes the body
+    return hashed_conditional_response(query_tools)
+
+def query_tools():
+    """Run the tool lookup for the current request and build the JSON response"""
+    query = request.args.get('q', '').strip()
+    match = request.args.get('match', 'prefix').lower()
+    if match not in MATCH_MODES:
+        abort(400, f"Unknown match '{match}'. Use one of: {', '.join(MATCH_MODES)}")
+    if not query and match != 'prefix':
+        abort(400, f"q is required for match={match}")
+    limit = int_arg(request.args, 'limit', 20, 1)
+    offset = int_arg(request.args, 'offset', 0, 0)
+    cursor = request.args.get('cursor')
+    if cursor:
+        offset = decode_cursor(cursor).get('o', 0)
+    
+    ensure_tool_index()
+    tools, total = tool_index.search(query, match, offset, limit)
+    end = offset + len(tools)
+    return jsonify({
+        "tools": tools,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": encode_cursor({'o': end}) if end < total else None
+    })
+
+# Helper: NDJSON for every server, one keyset batch (id > last id) at a time. No cursor
+# stays open while the client reads, and memory is bounded by the batch size.
+def export_batches(projection: dict, batch_size: int):
+    last_id = None
+    while True:
+        batch_query = {} if last_id is None else {'id': {'$gt': last_id}}
+        batch = list(servers_reads.find(batch_query, projection).sort('id', pymongo.ASCENDING).limit(batch_size))
+        if not batch:
+            return
+        yield b''.join(dumps(doc) + b'\n' for doc in batch)
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1]['id']
+
+# Helper: Compress a stream of chunks into one gzip member as it is produced
+def gzip_chunks(chunks, level: int):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/v0/servers:export', methods=['GET'])
+def export_servers():
+    """Stream every server as newline-delimited JSON (gzip when accepted), ordered by id"""
+    projection = list_projection(request.args.get('fields', ''), request.args.get('view', '').lower())
+    body = export_batches(projection, max(1, EXPORT_BATCH_SIZE))
+    headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-store'}
+    if request.accept_encodings['gzip']:
+        body = gzip_chunks(body, EXPORT_GZIP_LEVEL)
+        headers['Content-Encoding'] = 'gzip'
+    return app.response_class(body, mimetype='application/x-ndjson', headers=headers)
+
+# Helper: Documents after the (sync_seq, id) position of a changes token.
+# Servers written before sequence numbers existed have no `sync_seq` and sort as 0.
+def after_sync_position(seq: int, last_id: str) -> dict:
+    same_seq = {'sync_seq': {'$in': [None, 0]}} if seq == 0 else {'sync_seq': seq}
+    return {'$or': [{'sync_seq': {'$gt': seq}}, dict(same_seq, id={'$gt': last_id})]}
+
+# Helper: Naive Mongo datetimes are UTC
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+@app.route('/v0/servers/changes', methods=['GET'])
+def server_changes():
+    """Delta sync: upserts and deletions after `since`, in write order"""
+    limit = max(1, min(int(request.args.get('limit', 100)), MAX_CHANGES_LIMIT))
+    since = request.args.get('since')
+    seq, last_id = 0, ''
+    if since:
+        state = decode_cursor(since)
+        seq, last_id = state.get('seq'), state.get('id')
+        if not isinstance(seq, int) or not isinstance(last_id, str):
+            abort(400, "Invalid since token")
+    
+    projection = list_projection(request.args.get('fields', ''), request.args.get('view', '').lower())
+    if projection.get('id'):
+        projection = {name: value for name, value in projection.items() if not name.startswith('updated_at.')}
+        projection.update({'sync_seq': 1, 'updated_at': 1})
+    else:
+        projection = {'_id': 0}  # The feed orders by sync_seq; it is dropped from the bodies below
+    
+    after = after_sync_position(seq, last_id)
+    order = [('sync_seq', pymongo.ASCENDING), ('id', pymongo.ASCENDING)]
+    upserts = servers_collection.find(after, projection).sort(order).limit(limit + 1)
+    deletes = tombstones_collection.find(after, {'_id': 0}).sort(order).limit(limit + 1)
+    changes = [(doc.pop('sync_seq', None) or 0, doc['id'], 'upsert', as_utc(doc.get('updated_at')), doc) for doc in upserts]
+    changes += [(doc['sync_seq'], doc['id'], 'delete', as_utc(doc.get('deleted_at')), None) for doc in deletes]
+    changes.sort(key=lambda change: (change[0], change[1]))
+    
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    # A write reserves its sync_seq before it commits, so a missing number may be a write still
+    # in flight: stop before it until the write after it is older than CHANGES_GAP_TIMEOUT
+    # (by then the missing write has failed, or was overwritten by a later write to its server)
+    expected = seq + 1
+    gap_before = datetime.now(timezone.utc) - timedelta(seconds=CHANGES_GAP_TIMEOUT)
+    for index, (change_seq, _, _, written_at, _) in enumerate(changes):
+        if change_seq == 0:
+            continue
+        if change_seq > expected and written_at is not None and written_at > gap_before:
+            changes = changes[:index]
+            has_more = False
+            break
+        expected = change_seq + 1
+    
+    if changes:
+        seq, last_id = changes[-1][0], changes[-1][1]
+    return jsonify({
+        'changes': [
+            {'type': kind, 'id': server_id, 'sync_seq': change_seq, **({'server': doc} if doc is not None else {})}
+            for change_seq, server_id, kind, _, doc in changes
+        ],
+        'next_token': encode_cursor({'seq': seq, 'id': last_id}),
+        'has_more': has_more
     })
 
 @app.route('/v0/servers/<server_id>', methods=['GET'])
 def get_server(server_id):
-    server = servers_collection.find_one({'id': server_id})
-    if not server:
+    entry = load_server(server_id)
+    if not entry:
         abort(404)
-    # Remove MongoDB ObjectId from result
-    server.pop('_id', None)
-    return jsonify(server)
+    return conditional_response(entry.etag, lambda: cached_body_response(app, entry), entry.last_modified)
 
 @app.route('/v0/servers/<server_id>/tools', methods=['GET'])
 def get_server_tools(server_id):
     """Get only the tools for a specific server"""
-    server = servers_collection.find_one({'id': server_id}, {'tools': 1, 'name': 1, '_id': 0})
-    if not server:
+    entry = load_server(server_id)
+    if not entry:
         abort(404)
-    return jsonify({
-        'server_id': server_id,
-        'server_name': server.get('name', ''),
-        'tools': server.get('tools', [])
-    })
+    return conditional_response(f"{entry.etag}-tools", lambda: cached_body_response(app, entry, tools=True),
+                                entry.last_modified)
 
 @app.route('/v0/servers', methods=['POST'])
 @jwt_required()
 def publish_server():
-    user_email = get_jwt_identity()  # From token
+    owner_id, owner_email = current_user()  # From token
     data = request.get_json()
+    server = prepare_server(data, owner_id, owner_email)
+    
+    server_dict = server.model_dump()
+    server_dict['sync_seq'] = next_sync_seq()
+    server_dict['updated_at'] = datetime.now(timezone.utc)
+    servers_collection.replace_one({'id': server.id}, server_dict, upsert=True)
+    record_writes()
+    tombstones_collection.delete_many({'id': server.id})
+    invalidate_server(server.id)
+    log_audit('publish', owner_id, server.id)
+    return jsonify({'id': server.id, 'message': 'Published'}), 201
+
+# Helper: Validate a publish payload and enforce namespace ownership (aborts on failure)
+def prepare_server(data: dict, owner_id: str, owner_email: Optional[str] = None) -> Server:
+    if not isinstance(data, dict):
+        abort(400, "Server payload must be a JSON object")
     try:
         # Create a copy of data to avoid modifying the original
         server_data = data.copy()
         # Set owner in the data dictionary
-        server_data['owner'] = user_email
+        server_data['owner'] = owner_id
+        server_data['owner_email'] = owner_email
         # Create Server object without duplicate id parameter
         server = Server(**server_data)  # Validates schema
     except ValueError as e:
@@ -180,39 +856,94 @@ def publish_server():
             abort(403, "Invalid namespace. Must start with kp.internal., kp.public., or kp.experimental.")
     else:
         # Strict validation for production
-        if not server.id.startswith('kp.internal.') or server.owner != user_email:
+        if not server.id.startswith('kp.internal.') or server.owner != owner_id:
             abort(403, "Ownership mismatch")
+    return server
+
+@app.route('/v0/servers:batch', methods=['POST'])
+@jwt_required()
+def publish_servers_batch():
+    """Publish many servers with one bulk upsert and one audit insert"""
+    owner_id, owner_email = current_user()
+    data = request.get_json()
+    payloads = data.get('servers') if isinstance(data, dict) else data
+    if not isinstance(payloads, list) or not payloads:
+        abort(400, "Expected a non-empty list of servers (or {\"servers\": [...]})")
+    if len(payloads) > MAX_BATCH_SIZE:
+        abort(413, f"Batch too large: {len(payloads)} servers (max {MAX_BATCH_SIZE})")
     
-    server_dict = server.model_dump()
-    servers_collection.replace_one({'id': server.id}, server_dict, upsert=True)
-    log_audit('publish', user_email, server.id)
-    return jsonify({'id': server.id, 'message': 'Published'}), 201
+    results = []
+    accepted = {}  # server id -> validated document
+    for index, payload in enumerate(payloads):
+        try:
+            server = prepare_server(payload, owner_id, owner_email)
+        except HTTPException as e:
+            results.append({'index': index, 'id': (payload or {}).get('id') if isinstance(payload, dict) else None,
+                            'status': e.code, 'error': e.description})
+            continue
+        if server.id in accepted:
+            results.append({'index': index, 'id': server.id, 'status': 409, 'error': 'Duplicate id in batch'})
+            continue
+        accepted[server.id] = server.model_dump()
+        results.append({'index': index, 'id': server.id, 'status': 201, 'message': 'Published'})
+    
+    if accepted:
+        first_seq = next_sync_seq(len(accepted))
+        now = datetime.now(timezone.utc)
+        for offset, doc in enumerate(accepted.values()):
+            doc['sync_seq'] = first_seq + offset
+            doc['updated_at'] = now
+        servers_collection.bulk_write(
+            [pymongo.ReplaceOne({'id': server_id}, doc, upsert=True) for server_id, doc in accepted.items()],
+            ordered=False
+        )
+        record_writes(len(accepted))
+        refresh_servers(list(accepted))
+        tombstones_collection.delete_many({'id': {'$in': list(accepted)}})
+        log_audits([('publish', owner_id, server_id, {'batch': True}) for server_id in accepted])
+    
+    failed = len(results) - len(accepted)
+    return jsonify({
+        'results': results,
+        'published': len(accepted),
+        'failed': failed
+    }), 201 if not failed else 207
 
 @app.route('/v0/servers/<server_id>', methods=['PUT'])
 @jwt_required()
 def update_server(server_id):
-    user_email = get_jwt_identity()
+    owner_id, owner_email = current_user()
     data = request.get_json()
     existing = servers_collection.find_one({'id': server_id})
-    if not existing or existing['owner'] != user_email:
+    if not existing or existing['owner'] != owner_id:
         abort(403)
     
     # Partial update
-    update_data = {k: v for k, v in data.items() if k != 'owner' and k != 'id'}
+    update_data = {k: v for k, v in data.items() if k not in ('owner', 'owner_email', 'id')}
+    update_data['owner_email'] = owner_email  # The owner's current email
+    update_data['sync_seq'] = next_sync_seq()
     update_data['updated_at'] = datetime.now(timezone.utc)
     servers_collection.update_one({'id': server_id}, {'$set': update_data})
-    log_audit('update', user_email, server_id)
+    record_writes()
+    invalidate_server(server_id)
+    log_audit('update', owner_id, server_id)
     return jsonify({'message': 'Updated'})
 
 @app.route('/v0/servers/<server_id>', methods=['DELETE'])
 @jwt_required()
 def delete_server(server_id):
-    user_email = get_jwt_identity()
+    owner_id = get_jwt_identity()
     existing = servers_collection.find_one({'id': server_id})
-    if not existing or existing['owner'] != user_email:
+    if not existing or existing['owner'] != owner_id:
         abort(403)
+    # Leave a tombstone so mirrors following the changes feed see the deletion
+    tombstones_collection.insert_one({
+        'id': server_id, 'sync_seq': next_sync_seq(), 'deleted_at': datetime.now(timezone.utc)
+    })
     servers_collection.delete_one({'id': server_id})
-    log_audit('delete', user_email, server_id)
+    record_writes()
+    invalidate_server(server_id, deleted=True)
+    log_audit('delete', owner_id, server_id)
     return jsonify({'message': 'Deleted'})
 
 @app.route('/auth/token', methods=['POST'])
@@ -220,7 +951,7 @@ def get_token():
     """Get JWT token for authentication"""
     if DEV_MODE:
         # Mock token generation for development
-        token = create_access_token(identity=MOCK_USER_EMAIL)
+        token = issue_token(MOCK_USER_EMAIL, MOCK_USER_EMAIL)
         return jsonify({
             'access_token': token,
             'user_email': MOCK_USER_EMAIL,
@@ -230,6 +961,22 @@ def get_token():
     else:
         # Production OAuth flow
         data = request.get_json() or {}
+        if not isinstance(data, dict):
+            abort(400, "Expected a JSON object")
+        id_token = data.get('id_token')
+        if id_token is not None and not isinstance(id_token, str):
+            abort(400, "id_token must be a string")
+        if id_token:
+            # Exchange a verified Azure AD token for a registry token
+            identity = validate_token(id_token)
+            token = issue_token(identity.user_id, identity.email)
+            return jsonify({
+                'access_token': token,
+                'user_id': identity.user_id,
+                'user_email': identity.email,
+                'dev_mode': False
+            })
+
         code = data.get('code')
         if not code:
             abort(400, "Authorization code required")
@@ -248,16 +995,27 @@ def health():
     return jsonify({
         'status': 'healthy',
         'dev_mode': DEV_MODE,
-        'mock_user': MOCK_USER_EMAIL if DEV_MODE else None
+        'mock_user': MOCK_USER_EMAIL if DEV_MODE else None,
+        'cache': server_cache.stats(),
+        'count_cache': count_cache.stats(),
+        'search': {'backend': SEARCH_BACKEND, **(search_index.stats() if search_index is not None else {})},
+        'tools': tool_index.stats(),
+        'sync': change_sync.stats(),
+        'audit': audit_writer.stats(),
+        'auth': token_validator.stats() if token_validator is not None else None
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return app.response_class(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/dev/token', methods=['GET'])
 def dev_get_token():
     """Development helper: Get a mock token without authentication"""
     if not DEV_MODE:
         abort(404, "Development endpoints not available in production mode")
     
-    token = create_access_token(identity=MOCK_USER_EMAIL)
+    token = issue_token(MOCK_USER_EMAIL, MOCK_USER_EMAIL)
     return jsonify({
         'access_token': token,
         'user_email': MOCK_USER_EMAIL,
@@ -266,52 +1024,55 @@ def dev_get_token():
         'example': f'export KP_MCP_TOKEN="{token[:20]}..."'
     })
 
-if __name__ == '__main__':
-    # Create text index (optional - may not work with Cosmos DB)
-    # Only attempt if we haven't tried before in this session
-    if not hasattr(app, '_indexes_checked'):
-        # Initialize text search support check
-        if TEXT_SEARCH_SUPPORTED is None:
-            try:
-                # Test if text search is supported before creating indexes
-                servers_collection.count_documents({'$text': {'$search': 'test'}})
-                TEXT_SEARCH_SUPPORTED = True
-            except Exception as e:
-                TEXT_SEARCH_SUPPORTED = False
-                if "'text' is not supported" in str(e) or "CommandNotSupported" in str(e):
-                    print("ℹ️  Text search not supported by database, using regex fallback")
-                else:
-                    print(f"⚠️  Warning: Could not test text search: {e}")
-                print("🔧 Search will use case-insensitive regex matching instead")
-        
-        # Create indexes only if text search is supported
-        if TEXT_SEARCH_SUPPORTED:
-            try:
-                existing_indexes = list(servers_collection.list_indexes())
-                text_index_exists = any('text' in str(idx) for idx in existing_indexes)
-                
-                if not text_index_exists:
-                    servers_collection.create_index([
-                        ("name", "text"), 
-                        ("description", "text"), 
-                        ("tools.name", "text"),
-                        ("tags", "text")
-                    ])
-                    print("✅ Created text search indexes")
-                else:
-                    print("ℹ️  Text search indexes already exist")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not create text indexes: {e}")
-        
-        app._indexes_checked = True
+# Helper: One-time startup work before serving traffic (once in the master with
+# gunicorn's preload_app): text search probe, indexes, query plans, in-memory indexes
+def prepare_to_serve():
+    if getattr(app, '_indexes_checked', False):
+        return
     
+    # Declared indexes (indexes.py). The text index is optional: deployments without text
+    # search fail to create it, and the probe below then falls back to regex search.
+    if ENSURE_INDEXES:
+        ensure_indexes(db)
+        for plan in verify_query_plans(db):
+            if plan['status'] == 'unavailable':
+                log.info("Could not verify query plans: %s", plan['error'])
+                break
+    
+    # $text needs the text index, so probe only once it exists
+    check_text_search()
+    
+    # Warm the in-memory indexes before serving traffic (forked workers inherit them)
+    ensure_search_index()
+    ensure_tool_index()
+    
+    app._indexes_checked = True
+
+# Helper: Per-process reset in a freshly forked worker (gunicorn post_fork). The Mongo
+# client and log listener are recreated; sync and audit threads start on first use.
+def after_fork():
+    reset_client()
+    log_pipeline.after_fork()
+
+# Helper: Stop background work and flush buffered audit entries and logs (worker exit)
+def shutdown():
+    change_sync.stop()
+    audit_writer.close()
+    log_pipeline.stop()
+
+if __name__ == '__main__':
+    # Development server; use gunicorn (gunicorn.conf.py) in production.
     # Check if running under debugger to avoid reloader conflicts
     import sys
     in_debugger = hasattr(sys, 'gettrace') and sys.gettrace() is not None
     
+    # With the reloader, only the child process that serves requests does startup work
+    if in_debugger or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        prepare_to_serve()
+    
     if in_debugger:
         # Running under debugger - disable reloader to avoid "No module named app" error
         app.run(debug=True, host="0.0.0.0", port=5000, use_reloader=False)
     else:
         # Normal execution - enable reloader for development convenience
-        app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
+        app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Async serving mode for high-concurrency reads.
+
+The read endpoints IDEs poll (GET /v0/servers, /v0/servers/<id> and
+/v0/servers/<id>/tools) are served by a Quart app on asyncio with Motor, so one
+process holds thousands of mostly idle connections without a thread per request.
+Every other route (writes, auth, changes feed, health, metrics) is passed to the
+Flask app in app.py through asgiref's WsgiToAsgi, sharing its caches, search index,
+background sync and audit writer. Responses, ETags and errors match the Flask app.
+
+    uv run uvicorn async_app:application --host 0.0.0.0 --port 5000 --workers 4
+
+Requires the `async` extra (quart, motor<3.0, asgiref, uvicorn).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import pymongo
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, abort, g, jsonify, make_response, request
+from werkzeug.exceptions import HTTPException
+
+import app as registry
+from cache import CachedServer
+from db import client_options, read_preference
+from metrics import MongoCommandListener, MongoPoolListener
+from compression import compress, prepare_response as prepare_compression, set_encoded_body
+from serialization import RegistryJSONProvider
+from versions import REGISTRY_VERSION_ID
+
+# Flask endpoints served natively on the event loop; the rest go to the WSGI app
+ASYNC_ENDPOINTS = {'list_servers', 'get_server', 'get_server_tools'}
+
+async_app = Quart(__name__)
+async_app.json = RegistryJSONProvider(async_app)
+db = None  # Motor database, created on the serving event loop
+servers_primary = None  # Servers collection on the primary (lists, whose ETags come from the primary)
+servers_reads = None  # Servers collection following MONGO_READ_PREFERENCE (single-server reads)
+
+
+class ThreadedCursor:
+    """Motor-style cursor over a synchronous one; iteration runs in a worker thread"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    async def to_list(self, length=None):
+        return await asyncio.to_thread(list, self._cursor)
+
+
+class ThreadedCollection:
+    """The subset of Motor's collection API used here, over a synchronous collection"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return ThreadedCursor(self._collection.find(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return await asyncio.to_thread(self._collection.find_one, *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return await asyncio.to_thread(self._collection.count_documents, *args, **kwargs)
+
+
+class ThreadedDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getitem__(self, name):
+        return ThreadedCollection(self._database[name])
+
+    def get_collection(self, name, **kwargs):
+        return ThreadedCollection(self._database[name])
+
+
+def create_async_database(uri, name):
+    # mongomock has no async driver; share the Flask app's in-memory database instead
+    if uri and uri.startswith('mongomock://'):
+        return ThreadedDatabase(registry.db)
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(uri, event_listeners=[MongoCommandListener(), MongoPoolListener()],
+                                **client_options(uri))
+    return client[name]
+
+
+@async_app.before_serving
+async def startup():
+    global db, servers_primary, servers_reads
+    db = create_async_database(os.getenv('MONGO_URI'), registry.db.name)
+    servers_primary = db['servers']
+    servers_reads = db.get_collection('servers', read_preference=read_preference())
+    registry.log_pipeline.ensure_started()
+    registry.change_sync.ensure_started()
+    # Text search probe, indexes, query plan checks and in-memory indexes, off the event loop
+    await asyncio.to_thread(registry.prepare_to_serve)
+
+
+@async_app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@async_app.after_request
+async def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        registry.observe_request(request, response.status_code, time.perf_counter() - started,
+                                 response.content_length, g.get('mongo_query'))
+    return response
+
+
+# Async counterpart of app.compress_response (runs before the metrics hook)
+@async_app.after_request
+async def compress_response(response):
+    encoding = prepare_compression(response, request.accept_encodings)
+    if encoding is not None:
+        set_encoded_body(response, compress(await response.get_data(), encoding), encoding)
+    return response
+
+
+# Helper: Current registry version (see versions.get_registry_version)
+async def get_registry_version() -> int:
+    doc = await db['meta'].find_one({'_id': REGISTRY_VERSION_ID})
+    return doc.get('version', 0) if doc else 0
+
+
+# Helper: Read-through lookup of a single server document (shares the Flask app's cache)
+async def load_server(server_id: str):
+    entry = registry.server_cache.get(server_id)
+    if entry is not None:
+        return entry
+    server = await servers_reads.find_one({'id': server_id}, registry.SERVER_PROJECTION)
+    if server is None:
+        return None
+    entry = CachedServer(server, keep_body=registry.SERVER_CACHE_BODIES)
+    registry.server_cache.set(server_id, entry)
+    return entry
+
+
+# Helper: Total matching documents, served from the shared count cache when fresh
+async def count_servers(mongo_query: dict, version: int) -> int:
+    key = json.dumps([version, mongo_query], sort_keys=True, default=str)
+    total = registry.count_cache.get(key)
+    if total is None:
+        total = await servers_primary.count_documents(mongo_query)
+        registry.count_cache.set(key, total)
+    return total
+
+
+# Helper: Async counterpart of app.conditional_response
+async def conditional_response(etag: str, build_body, last_modified=None):
+    if registry.is_not_modified(etag, last_modified, request):
+        response = await make_response('', 304)
+    else:
+        response = await make_response(await build_body())
+    return registry.set_cache_headers(response, etag, last_modified)
+
+
+# Helper: Async counterpart of app.hashed_conditional_response
+async def hashed_conditional_response(build_body):
+    response = await make_response(await build_body())
+    etag = hashlib.sha1(await response.get_data()).hexdigest()
+    if registry.is_not_modified(etag, req=request):
+        response = await make_response('', 304)
+    return registry.set_cache_headers(response, etag)
+
+
+@async_app.route('/v0/servers', methods=['GET'])
+async def list_servers():
+    if request.args.get('q') and registry.search_index is not None:
+        return await hashed_conditional_response(query_servers)
+    version = await get_registry_version()
+    return await conditional_response(registry.list_etag(version, request.args), lambda: query_servers(version))
+
+
+async def query_servers(version=None):
+    """Async counterpart of app.query_servers"""
+    params = registry.parse_list_args(request.args)
+    query, tools_filter, limit, offset, cursor = (
+        params['query'], params['tools_filter'], params['limit'], params['offset'], params['cursor'])
+    projection = params['projection']
+
+    # Ranked search from the in-process index; pages are offsets into the ranking
+    if query and registry.search_index is not None:
+        if cursor:
+            offset = registry.decode_cursor(cursor).get('o', 0)
+        tools = tools_filter.split(',') if tools_filter else None
+        if not registry.search_index.built:
+            await asyncio.to_thread(registry.ensure_search_index)
+        page_ids, end, total = registry.ranked_page(query, tools, limit, offset, params['id_prefix'])
+        found = await servers_primary.find({'id': {'$in': page_ids}}, projection).to_list(None)
+        docs = {doc['id']: doc for doc in found}
+        return jsonify({
+            "servers": [docs[server_id] for server_id in page_ids if server_id in docs],
+            "total": total if params['include_total'] else None,
+            "offset": offset,
+            "limit": limit,
+            "next_cursor": registry.encode_cursor({'o': end}) if end < total else None
+        })
+
+    mongo_query = registry.build_list_query(query, tools_filter, params['id_prefix'])
+    g.mongo_query = mongo_query  # For the slow-request log
+    total = await count_servers(mongo_query, version) if params['include_total'] else None
+
+    page_query = registry.keyset_page_query(mongo_query, cursor)
+    if cursor:
+        offset = 0
+    find_cursor = servers_primary.find(page_query, projection).sort('id', pymongo.ASCENDING)
+    if offset:
+        find_cursor = find_cursor.skip(offset)
+    servers, next_cursor = registry.trim_page(await find_cursor.limit(limit + 1).to_list(None), limit)
+
+    return jsonify({
+        "servers": servers,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": next_cursor
+    })
+
+
+@async_app.route('/v0/servers/<server_id>', methods=['GET'])
+async def get_server(server_id):
+    entry = await load_server(server_id)
+    if not entry:
+        abort(404)
+
+    async def build_body():
+        return registry.cached_body_response(async_app, entry, req=request)
+    return await conditional_response(entry.etag, build_body, entry.last_modified)
+
+
+@async_app.route('/v0/servers/<server_id>/tools', methods=['GET'])
+async def get_server_tools(server_id):
+    """Get only the tools for a specific server"""
+    entry = await load_server(server_id)
+    if not entry:
+        abort(404)
+
+    async def build_body():
+        return registry.cached_body_response(async_app, entry, tools=True, req=request)
+    return await conditional_response(f"{entry.etag}-tools", build_body, entry.last_modified)
+
+
+flask_application = WsgiToAsgi(registry.app)
+_flask_routes = registry.app.url_map.bind('localhost')
+
+
+async def application(scope, receive, send):
+    """ASGI entry point: route to the async handlers or fall through to Flask"""
+    if scope['type'] == 'http':
+        try:
+            endpoint, _ = _flask_routes.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            endpoint = None
+        if endpoint not in ASYNC_ENDPOINTS:
+            await flask_application(scope, receive, send)
+            return
+    await async_app(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('async_app:application', host='0.0.0.0', port=int(os.getenv('PORT', 5000)),
+                workers=int(os.getenv('WEB_CONCURRENCY', 1)))
@@ -0,0 +1,206 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from logs import get_logger
+
+log = get_logger('audit')
+
+
+class _FlushRequest:
+    """Queue marker: the writer sets `done` once everything queued before it is written"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AuditWriter:
+    """Batched, non-blocking audit log persistence.
+
+    Entries go into a bounded in-memory queue drained by a background thread that
+    writes them with `insert_many` once `batch_size` entries are waiting or
+    `flush_interval` seconds have passed. When the queue is full, producers block for
+    up to `enqueue_timeout` seconds (backpressure) and then write synchronously.
+    Batches that cannot be written are appended to `spill_path` (JSON lines) if set,
+    and replayed into the collection the next time the writer starts.
+    """
+
+    def __init__(self, collection, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_queue: int = 10000, enqueue_timeout: float = 1.0,
+                 spill_path: Optional[str] = None, enabled: bool = True):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.spill_path = spill_path
+        self.enabled = enabled
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.sync_writes = 0
+        self.failures = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = []  # failed batch kept for retry when there is no spill file
+        self._pid = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def submit(self, entry: dict) -> None:
+        self.submit_many([entry])
+
+    def submit_many(self, entries: List[dict]) -> None:
+        if not entries:
+            return
+        if not self.enabled:
+            self._write(entries)
+            return
+        self.ensure_started()
+        for index, entry in enumerate(entries):
+            try:
+                self._queue.put(entry, timeout=self.enqueue_timeout)
+            except queue.Full:
+                # Backpressure exhausted: pay for the write on the caller's thread
+                self.sync_writes += 1
+                self._write(entries[index:])
+                return
+
+    def ensure_started(self) -> None:
+        """Start the writer thread once per process (threads do not survive fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything submitted so far has been written (or spilled)"""
+        if not self.enabled or self._thread is None or not self._thread.is_alive():
+            return True
+        marker = _FlushRequest()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Drain the queue and stop the writer thread (registered with atexit)"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._pid = None
+
+    def _run(self) -> None:
+        # Replayed here rather than in ensure_started, which runs on the first request's thread
+        try:
+            self._replay_spill()
+        except Exception as e:
+            log.warning("Could not read spilled audit entries: %s", e)
+        batch = []
+        markers = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            stopping = self._stop.is_set()
+            try:
+                item = self._queue.get(timeout=0 if stopping else max(0.0, deadline - time.monotonic()))
+                if isinstance(item, _FlushRequest):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            due = time.monotonic() >= deadline or markers or len(batch) >= self.batch_size
+            drained = self._queue.empty()
+            if due or (stopping and drained):
+                self._write(self._pending + batch, from_thread=True)
+                batch = []
+                for marker in markers:
+                    marker.done.set()
+                markers = []
+                deadline = time.monotonic() + self.flush_interval
+            if stopping and drained and not batch:
+                return
+
+    def _write(self, entries: List[dict], from_thread: bool = False) -> None:
+        if not entries:
+            return
+        if from_thread:
+            self._pending = []
+        try:
+            self.collection.insert_many([dict(entry) for entry in entries], ordered=False)
+            self.written += len(entries)
+        except Exception as e:
+            self.failures += 1
+            log.warning("Audit write of %d entries failed: %s", len(entries), e)
+            if self.spill_path:
+                self._spill(entries)
+            elif from_thread and len(entries) <= self._queue.maxsize:
+                self._pending = entries  # Retry with the next batch
+            else:
+                self.dropped += len(entries)
+
+    def _spill(self, entries: List[dict]) -> None:
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    record = dict(entry)
+                    if isinstance(record.get('timestamp'), datetime):
+                        record['timestamp'] = record['timestamp'].isoformat()
+                    f.write(json.dumps(record, default=str) + '\n')
+        self.spilled += len(entries)
+
+    def _replay_spill(self) -> None:
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        # Claim the file so other workers keep appending to a fresh one
+        claimed = f"{self.spill_path}.replay-{os.getpid()}"
+        try:
+            os.replace(self.spill_path, claimed)
+        except OSError:
+            return
+        entries = []
+        with open(claimed, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if isinstance(record.get('timestamp'), str):
+                    record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+                entries.append(record)
+        try:
+            if entries:
+                self.collection.insert_many(entries, ordered=False)
+            self.replayed += len(entries)
+            os.remove(claimed)
+            log.info("Replayed %d spilled audit entries", len(entries))
+        except Exception as e:
+            # Put them back for the next start
+            self._spill(entries)
+            self.spilled -= len(entries)
+            os.remove(claimed)
+            log.warning("Could not replay spilled audit entries: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            'async': self.enabled,
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'spilled': self.spilled,
+            'replayed': self.replayed,
+            'dropped': self.dropped,
+            'sync_writes': self.sync_writes,
+            'failures': self.failures,
+        }
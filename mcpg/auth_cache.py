@@ -0,0 +1,156 @@
+"""
+Bearer token verification with cached signing keys and identities.
+
+Verifying an Azure AD token means fetching the tenant's JWKS and checking an RSA
+signature. JWKSCache keeps the keys in memory and TokenValidator remembers each
+verified token's identity until the token expires, so repeat requests with the same
+token cost one dictionary lookup. Both work with any issuer; a `file://` JWKS URI
+allows verifying tokens offline (tests, air-gapped environments).
+"""
+
+import hashlib
+import json
+import threading
+import time
+import urllib.request
+from typing import Dict, NamedTuple, Optional, Sequence
+
+import jwt
+
+from cache import TTLCache
+from logs import get_logger
+
+log = get_logger('auth')
+
+# Claims holding the user's email/UPN, in order of preference (Azure AD v2, v1, generic).
+# These can be renamed or reassigned to another person, so they are for display only.
+EMAIL_CLAIMS = ('preferred_username', 'upn', 'email')
+
+
+class Identity(NamedTuple):
+    user_id: str  # Immutable: `<tid>:<oid>` (Azure AD object id in its tenant), else `sub`
+    email: Optional[str]
+    subject: Optional[str]
+    expires_at: int  # The token's `exp` (seconds since the epoch)
+
+
+def user_id_from_claims(claims: dict) -> Optional[str]:
+    """The user's immutable id: tenant-scoped object id where present, else the subject"""
+    if claims.get('oid'):
+        return f"{claims['tid']}:{claims['oid']}" if claims.get('tid') else claims['oid']
+    return claims.get('sub') or None
+
+
+class JWKSCache:
+    """Signing keys from a JWKS URI, refreshed every `ttl` seconds and on key rotation.
+
+    Identity providers publish a new key before they start signing with it, so a
+    token whose `kid` is unknown triggers a refetch. Refetches are spaced at least
+    `min_refresh_interval` seconds apart so tokens with made-up key ids cannot flood
+    the provider. When a refresh fails the previous keys stay in use; failed fetches
+    are retried at most every `min_refresh_interval` seconds either way.
+    """
+
+    def __init__(self, uri: str, ttl: float = 3600.0, min_refresh_interval: float = 60.0, timeout: float = 5.0):
+        self.uri = uri
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.fetches = 0
+        self.failures = 0
+        self._keys: Optional[Dict[str, jwt.PyJWK]] = None
+        self._fetched_at = float('-inf')
+        self._expires_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def _fetch(self) -> Dict[str, jwt.PyJWK]:
+        with urllib.request.urlopen(self.uri, timeout=self.timeout) as response:
+            jwks = json.loads(response.read())
+        keys = jwt.PyJWKSet.from_dict(jwks).keys
+        return {key.key_id: key for key in keys if key.public_key_use in (None, 'sig')}
+
+    def _refresh(self, now: float) -> None:
+        self._fetched_at = now
+        try:
+            self._keys = self._fetch()
+            self.fetches += 1
+            self._expires_at = now + self.ttl
+            log.info("Fetched %d signing keys from %s", len(self._keys), self.uri)
+        except Exception as e:
+            self.failures += 1
+            # Retry after the refresh interval, so an unreachable provider is not hit on every request
+            self._expires_at = now + self.min_refresh_interval
+            if self._keys is None:
+                raise jwt.PyJWKClientError(f"Could not fetch signing keys: {e}") from e
+            # Keep serving the old keys meanwhile
+            log.warning("Signing key refresh from %s failed, keeping %d cached keys: %s",
+                        self.uri, len(self._keys), e)
+
+    def get_signing_key(self, kid: Optional[str]) -> jwt.PyJWK:
+        # Fetches happen under the lock so concurrent misses trigger a single request
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._expires_at:
+                self._refresh(now)
+            if self._keys is None:
+                raise jwt.PyJWKClientError(f"No signing keys from {self.uri} (retrying after the refresh interval)")
+            key = self._keys.get(kid)
+            if key is None and now - self._fetched_at >= self.min_refresh_interval:
+                self._refresh(now)
+                key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key '{kid}'")
+        return key
+
+    def stats(self) -> dict:
+        return {
+            'keys': len(self._keys or ()),
+            'fetches': self.fetches,
+            'failures': self.failures,
+        }
+
+
+class TokenValidator:
+    """Verifies JWTs against a JWKSCache and caches the identity of each valid token.
+
+    Cached entries expire with the token (`exp`), capped at the cache's ttl. Tokens
+    are keyed by their SHA-256 so the cache never holds usable credentials.
+    """
+
+    def __init__(self, jwks: JWKSCache, issuer: str, audience: Optional[str],
+                 algorithms: Sequence[str] = ('RS256',), leeway: float = 60.0,
+                 cache_size: int = 10000, cache_ttl: float = 3600.0):
+        self.jwks = jwks
+        self.issuer = issuer
+        self.audience = audience
+        self.algorithms = list(algorithms)
+        self.leeway = leeway
+        self.cache = TTLCache(max_size=cache_size, ttl=cache_ttl)
+
+    def validate(self, token: str) -> Identity:
+        """Identity for a valid token; raises jwt.PyJWTError otherwise"""
+        cache_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        identity = self.cache.get(cache_key)
+        if identity is not None:
+            return identity
+
+        header = jwt.get_unverified_header(token)
+        signing_key = self.jwks.get_signing_key(header.get('kid'))
+        claims = jwt.decode(
+            token, signing_key.key, algorithms=self.algorithms, issuer=self.issuer,
+            audience=self.audience, leeway=self.leeway,
+            options={'require': ['exp', 'iss'], 'verify_aud': self.audience is not None},
+        )
+        user_id = user_id_from_claims(claims)
+        if not user_id:
+            raise jwt.InvalidTokenError("Token has no user id claim (oid or sub)")
+        email = next((claims[claim] for claim in EMAIL_CLAIMS if claims.get(claim)), None)
+        identity = Identity(user_id=user_id, email=email, subject=claims.get('sub'), expires_at=int(claims['exp']))
+
+        remaining = identity.expires_at - time.time()
+        if remaining > 0:
+            self.cache.set(cache_key, identity, ttl=min(remaining, self.cache.ttl))
+        return identity
+
+    def stats(self) -> dict:
+        return {'tokens': self.cache.stats(), 'jwks': self.jwks.stats()}
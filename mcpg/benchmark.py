@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the registry API.
+
+Seeds N synthetic servers (seed.generate_servers) into a local Mongo stand-in and
+drives the hot endpoints, reporting throughput and latency percentiles as JSON.
+
+In-process (default): the Flask app runs against mongomock (or MONGO_URI) through
+the test client; --server async drives the ASGI app (async_app.py) on one event
+loop instead, and --server both runs every scenario against each. HTTP (--url,
+repeatable): requests go to running servers over keep-alive sessions from a pool
+of threads; seed first with --seed-only against the same MONGO_URI/MONGO_DB, or
+point it at existing data.
+
+    uv run python benchmark.py --servers 10000 --requests 200 --output bench.json
+    uv run python benchmark.py --server both --concurrency 64
+    uv run python benchmark.py --url http://localhost:5000 --url http://localhost:8000 --concurrency 32
+
+--validation instead measures server.json validation throughput on the batch import
+path (models.Server), comparing the cached validator with plain jsonschema.validate.
+"""
+
+import asyncio
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import click
+
+from seed import generate_servers
+
+# Scenarios whose name starts with one of these prefixes write to the registry
+WRITE_SCENARIOS = ('publish', 'update', 'delete')
+
+# In-process only: list search forced onto MongoDB $text (True) or the regex fallback (False),
+# whatever the startup probe chose, so both paths are measured on the same data
+SEARCH_PATH_SCENARIOS = {'search_text': True, 'search_regex': False}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, wall_seconds):
+    ordered = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall_seconds, 2) if wall_seconds else None,
+        'mean_ms': to_ms(statistics.fmean(ordered)) if ordered else None,
+        'p50_ms': to_ms(percentile(ordered, 0.50)),
+        'p95_ms': to_ms(percentile(ordered, 0.95)),
+        'p99_ms': to_ms(percentile(ordered, 0.99)),
+        'max_ms': to_ms(ordered[-1]) if ordered else None,
+    }
+
+
+class InProcessClient:
+    """Flask test client per thread, same call shape as HTTPClient"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, params=None, json_body=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, query_string=params, json=json_body, headers=headers)
+        response.close()
+        return response.status_code, response.headers
+
+
+class HTTPClient:
+    """requests.Session per thread (keep-alive) against a running server"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self._requests = requests
+        self._local = threading.local()
+
+    def request(self, method, path, params=None, json_body=None, headers=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.request(method, self.base_url + path, params=params, json=json_body, headers=headers)
+        return response.status_code, response.headers
+
+
+class ASGIClient:
+    """Drives an ASGI app on a single event loop thread, as one async worker would"""
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name='bench-asgi', daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._startup(), self.loop).result()
+
+    async def _startup(self):
+        started = asyncio.Event()
+        messages = self._lifespan_messages = asyncio.Queue()
+        await messages.put({'type': 'lifespan.startup'})
+
+        async def send(message):
+            if message['type'].startswith('lifespan.startup'):
+                if message['type'] == 'lifespan.startup.failed':
+                    raise RuntimeError(message.get('message'))
+                started.set()
+
+        self._lifespan = asyncio.ensure_future(
+            self.app({'type': 'lifespan', 'asgi': {'version': '3.0'}, 'state': {}}, messages.get, send))
+        await started.wait()
+
+    async def _shutdown(self):
+        await self._lifespan_messages.put({'type': 'lifespan.shutdown'})
+        await asyncio.wait_for(self._lifespan, timeout=10)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def request(self, method, path, params=None, json_body=None, headers=None):
+        future = asyncio.run_coroutine_threadsafe(self._request(method, path, params, json_body, headers), self.loop)
+        return future.result()
+
+    async def _request(self, method, path, params, json_body, headers):
+        body = json.dumps(json_body).encode('utf-8') if json_body is not None else b''
+        raw_headers = [(b'host', b'localhost'), (b'content-length', str(len(body)).encode('ascii'))]
+        if json_body is not None:
+            raw_headers.append((b'content-type', b'application/json'))
+        raw_headers += [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in (headers or {}).items()]
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode('utf-8'), 'root_path': '',
+            'query_string': urlencode(params or {}, doseq=True).encode('ascii'), 'headers': raw_headers,
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80), 'state': {},
+        }
+        delivered = False
+
+        async def receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await asyncio.Event().wait()  # No disconnect; the app cancels this when done
+
+        response = {}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {name.decode('latin-1'): value.decode('latin-1')
+                                       for name, value in message.get('headers', [])}
+
+        await self.app(scope, receive, send)
+        return response.get('status'), response.get('headers', {})
+
+
+def seed_collection(servers_collection, count, metadata_padding, chunk_size=1000):
+    """Replace the collection contents with `count` synthetic servers; returns their ids"""
+    servers_collection.delete_many({})
+    ids = []
+    chunk = []
+    now = datetime.now(timezone.utc)
+    for number, doc in enumerate(generate_servers(count, metadata_padding=metadata_padding), 1):
+        doc.update(created_at=now, updated_at=now, sync_seq=number)
+        chunk.append(doc)
+        ids.append(doc['id'])
+        if len(chunk) >= chunk_size:
+            servers_collection.insert_many(chunk, ordered=False)
+            chunk = []
+    if chunk:
+        servers_collection.insert_many(chunk, ordered=False)
+    return ids
+
+
+@contextmanager
+def forced_search_path(registry, use_text):
+    """Send list searches to $text or regex (never the in-memory index) while the block runs.
+    None leaves the search path alone."""
+    if use_text is None:
+        yield
+        return
+    saved = registry.TEXT_SEARCH_SUPPORTED, registry.search_index
+    registry.TEXT_SEARCH_SUPPORTED, registry.search_index = use_text, None
+    try:
+        yield
+    finally:
+        registry.TEXT_SEARCH_SUPPORTED, registry.search_index = saved
+
+
+def fetch_deep_cursor(get_page, count):
+    """A real next_cursor from the middle of the registry (one offset query, made once up front)"""
+    if not count:
+        return None
+    return get_page({'fields': 'id', 'limit': 1, 'offset': count // 2, 'include_total': 'false'}).get('next_cursor')
+
+
+def build_scenarios(ids, token, include_writes, deep_cursor=None):
+    """Scenario name -> function(rng) returning (method, path, params, json_body, headers, ok_statuses)"""
+    auth = {'Authorization': f'Bearer {token}'} if token else {}
+    deep_offset = max(0, len(ids) - 50)
+
+    words = ['github', 'slack', 'analytics', 'billing', 'monitoring', 'deploy', 'search', 'docs']
+    tools = ['list_repos', 'send_messages', 'query_tables', 'export_reports', 'sync_files']
+
+    scenarios = {
+        'list_first_page': lambda rng: ('GET', '/v0/servers', {'limit': 20}, None, {}, (200,)),
+        'list_summary_view': lambda rng: ('GET', '/v0/servers', {'limit': 20, 'view': 'summary'}, None, {}, (200,)),
+        'list_deep_offset': lambda rng: ('GET', '/v0/servers', {'limit': 20, 'offset': deep_offset}, None, {}, (200,)),
+        'list_deep_cursor': lambda rng: ('GET', '/v0/servers', {'limit': 20, 'cursor': deep_cursor}, None, {}, (200,)),
+        'list_search': lambda rng: ('GET', '/v0/servers', {'q': rng.choice(words), 'limit': 20}, None, {}, (200,)),
+        'search_text': lambda rng: ('GET', '/v0/servers', {'q': rng.choice(words), 'limit': 20}, None, {}, (200,)),
+        'search_regex': lambda rng: ('GET', '/v0/servers', {'q': rng.choice(words), 'limit': 20}, None, {}, (200,)),
+        'list_tools_filter': lambda rng: ('GET', '/v0/servers', {'tools': rng.choice(tools), 'limit': 20}, None, {}, (200,)),
+        'get_server': lambda rng: ('GET', f'/v0/servers/{rng.choice(ids)}', None, None, {}, (200,)),
+        'get_server_hot': lambda rng: ('GET', f'/v0/servers/{ids[rng.randrange(min(50, len(ids)))]}', None, None, {}, (200,)),
+        'get_server_tools': lambda rng: ('GET', f'/v0/servers/{rng.choice(ids)}/tools', None, None, {}, (200,)),
+        'find_tool_prefix': lambda rng: ('GET', '/v0/tools', {'q': rng.choice(tools)[:6], 'limit': 20}, None, {}, (200,)),
+        'find_tool_fuzzy': lambda rng: ('GET', '/v0/tools', {'q': rng.choice(tools), 'match': 'fuzzy', 'limit': 20},
+                                        None, {}, (200,)),
+        'changes_feed': lambda rng: ('GET', '/v0/servers/changes', {'limit': 100}, None, {}, (200,)),
+    }
+    if include_writes:
+        counter = iter(range(10 ** 9))
+        lock = threading.Lock()
+
+        def next_number():
+            with lock:
+                return next(counter)
+
+        def publish(rng):
+            doc = next(generate_servers(1, start=10 ** 7 + next_number(), seed=rng.randrange(1 << 30)))
+            doc.pop('owner')
+            return 'POST', '/v0/servers', None, doc, auth, (201,)
+
+        def update(rng):
+            return 'PUT', f'/v0/servers/{rng.choice(ids)}', None, {'version': f"9.{rng.randrange(100)}.0"}, auth, (200,)
+
+        def delete(rng):
+            return 'DELETE', f'/v0/servers/{ids.pop()}', None, None, auth, (200,)
+
+        scenarios.update(publish=publish, update=update, delete=delete)
+    return scenarios
+
+
+def run_scenario(client, make_request, requests_count, concurrency, seed):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(worker_number, count):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_number)
+        local = []
+        local_errors = 0
+        for _ in range(count):
+            method, path, params, body, headers, ok = make_request(rng)
+            started = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, params=params, json_body=body, headers=headers)
+                if status not in ok:
+                    local_errors += 1
+            except Exception:
+                local_errors += 1
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    shares = [requests_count // concurrency + (1 if n < requests_count % concurrency else 0) for n in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker, n, share) for n, share in enumerate(shares) if share]:
+            future.result()
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def benchmark_validation(count, metadata_padding):
+    """Validations per second over `count` synthetic documents: schema only (uncached vs cached) and full models"""
+    import jsonschema
+    from models import MCP_SERVER_SCHEMA, Server, validate_metadata
+
+    docs = list(generate_servers(count, metadata_padding=metadata_padding))
+
+    def measure(validate):
+        started = time.perf_counter()
+        for doc in docs:
+            validate(doc)
+        elapsed = time.perf_counter() - started
+        return {'validations': len(docs), 'seconds': round(elapsed, 3),
+                'per_second': round(len(docs) / elapsed, 1) if elapsed else None}
+
+    return {
+        'schema_uncached': measure(lambda doc: jsonschema.validate(instance=doc['metadata'], schema=MCP_SERVER_SCHEMA)),
+        'schema_cached': measure(lambda doc: validate_metadata(doc['metadata'])),
+        'server_model': measure(lambda doc: Server(**doc)),
+    }
+
+
+def write_report(report, output):
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        click.echo(text)
+
+
+@click.command()
+@click.option('--servers', 'server_count', default=10000, help='Synthetic servers to seed (default: 10000)')
+@click.option('--requests', 'requests_count', default=200, help='Requests per scenario (default: 200)')
+@click.option('--concurrency', default=1, help='Concurrent client threads (default: 1)')
+@click.option('--warmup', default=10, help='Unmeasured requests per scenario (default: 10)')
+@click.option('--scenario', 'selected', multiple=True, help='Only run these scenarios (repeatable)')
+@click.option('--no-writes', is_flag=True, help='Skip publish/update/delete scenarios')
+@click.option('--metadata-kb', default=0, help='Extra KB of metadata per server (default: 0)')
+@click.option('--server', 'server_mode', type=click.Choice(['flask', 'async', 'both']), default='flask',
+              help='In-process app to drive: Flask (WSGI), async_app (ASGI) or both (default: flask)')
+@click.option('--url', 'urls', multiple=True, help='Benchmark a running server over HTTP instead of in-process (repeatable)')
+@click.option('--validation', is_flag=True, help='Measure server.json validation throughput instead of endpoints')
+@click.option('--seed-only', is_flag=True, help='Seed MONGO_URI/MONGO_DB and exit (for --url runs)')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the JSON report here (default: stdout)')
+@click.option('--seed', 'random_seed', default=0, help='Random seed for request mixes (default: 0)')
+def main(server_count, requests_count, concurrency, warmup, selected, no_writes, metadata_kb, server_mode, urls,
+         validation, seed_only, output, random_seed):
+    """Benchmark registry endpoints and report p50/p95/p99 latency as JSON"""
+    if validation:
+        results = benchmark_validation(server_count, metadata_kb * 1024)
+        for name, result in results.items():
+            click.echo(f"⏱️  {name}: {result['per_second']} validations/s", err=True)
+        write_report({
+            'config': {
+                'mode': 'validation',
+                'servers': server_count,
+                'metadata_kb': metadata_kb,
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+            },
+            'results': results,
+        }, output)
+        return
+
+    # Never point a benchmark at the real registry database by accident
+    os.environ.setdefault('MONGO_URI', 'mongomock://')
+    os.environ.setdefault('MONGO_DB', 'Agentic_bench')
+    os.environ.setdefault('DEV_MODE', 'true')
+    os.environ.setdefault('SYNC_MODE', 'off')
+    if os.environ['MONGO_DB'] == 'Agentic':
+        raise click.UsageError("Refusing to seed the 'Agentic' database; set MONGO_DB to a scratch database")
+    forced = set(selected) & set(SEARCH_PATH_SCENARIOS)
+    if urls and not seed_only and forced:
+        raise click.UsageError(f"{', '.join(sorted(forced))} only run in-process (without --url)")
+
+    token = None
+    registry = text_search = None
+    if seed_only or not urls:
+        import app as registry
+        from indexes import ensure_indexes
+        started = time.perf_counter()
+        ids = seed_collection(registry.servers_collection, server_count, metadata_kb * 1024)
+        # Indexes as a deployed registry has them (the text index where supported), then
+        # re-probe $text now that its index exists
+        ensure_indexes(registry.db)
+        registry.TEXT_SEARCH_SUPPORTED = None
+        text_search = registry.check_text_search()
+        click.echo(f"🌱 Seeded {len(ids)} servers and indexes in {time.perf_counter() - started:.1f}s "
+                   f"(text search {'supported' if text_search else 'not supported'})", err=True)
+        if seed_only:
+            return
+        targets = {}
+        if server_mode in ('flask', 'both'):
+            targets['flask'] = InProcessClient(registry.app)
+        if server_mode in ('async', 'both'):
+            import async_app
+            targets['async'] = ASGIClient(async_app.application)
+        with registry.app.test_request_context():
+            token = registry.issue_token(registry.MOCK_USER_EMAIL, registry.MOCK_USER_EMAIL)
+        list_client = registry.app.test_client()
+        get_page = lambda params: list_client.get('/v0/servers', query_string=params).get_json()
+    else:
+        import requests
+        targets = {url: HTTPClient(url) for url in urls}
+        if not no_writes:
+            token = requests.get(f"{urls[0].rstrip('/')}/dev/token").json()['access_token']
+        ids = discover_ids(urls[0])
+        get_page = lambda params: requests.get(f"{urls[0].rstrip('/')}/v0/servers", params=params).json()
+
+    if not ids:
+        raise click.ClickException("No servers to benchmark against")
+
+    scenarios = build_scenarios(ids, token, include_writes=not no_writes,
+                                deep_cursor=fetch_deep_cursor(get_page, len(ids)))
+    if urls:
+        # A running server's search path cannot be switched from here; list_search measures it
+        scenarios = {name: scenario for name, scenario in scenarios.items() if name not in SEARCH_PATH_SCENARIOS}
+    if selected:
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise click.UsageError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = {name: scenarios[name] for name in selected}
+
+    # Scenario by scenario, so every target sees the registry in the same state
+    results = {target: {} for target in targets}
+    for name, make_request in scenarios.items():
+        for target, client in targets.items():
+            label = f"{target} {name}" if len(targets) > 1 else name
+            use_text = SEARCH_PATH_SCENARIOS.get(name)
+            if use_text and not text_search:
+                results[target][name] = {'skipped': 'text search not supported by this database'}
+                click.echo(f"⏭️  {label}: skipped, text search not supported", err=True)
+                continue
+            measured = requests_count
+            if name == 'delete':
+                measured = min(measured, max(0, len(ids) - warmup - 1))
+            with forced_search_path(registry, use_text):
+                if warmup and not name.startswith(WRITE_SCENARIOS):
+                    run_scenario(client, make_request, warmup, 1, random_seed + 1)
+                result = results[target][name] = run_scenario(client, make_request, measured, concurrency,
+                                                              random_seed)
+            click.echo(f"⏱️  {label}: p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+                       f"{result['throughput_rps']} req/s", err=True)
+
+    for client in targets.values():
+        if isinstance(client, ASGIClient):
+            client.close()
+
+    report = {
+        'config': {
+            'target': list(urls) if urls else f'in-process ({server_mode})',
+            'mongo_uri': None if urls else os.environ['MONGO_URI'].split('@')[-1],
+            'servers': len(ids) if urls else server_count,
+            'requests_per_scenario': requests_count,
+            'concurrency': concurrency,
+            'metadata_kb': metadata_kb,
+            'search_backend': os.getenv('SEARCH_BACKEND', 'mongo'),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+        },
+        # Single target: {scenario: stats}; several: {target: {scenario: stats}}
+        'results': next(iter(results.values())) if len(results) == 1 else results,
+    }
+    write_report(report, output)
+
+
+def discover_ids(url):
+    """Collect server ids from a running registry with cursor pagination"""
+    import requests
+    ids = []
+    params = {'fields': 'id', 'limit': 1000, 'include_total': 'false'}
+    while True:
+        data = requests.get(f"{url.rstrip('/')}/v0/servers", params=params).json()
+        ids.extend(server['id'] for server in data['servers'])
+        if not data.get('next_cursor'):
+            return ids
+        params['cursor'] = data['next_cursor']
+
+
+if __name__ == '__main__':
+    main()
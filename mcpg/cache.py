@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Hashable, Optional
+
+from compression import compress
+from serialization import dumps_body
+
+
+class TTLCache:
+    """Thread-safe bounded LRU cache with per-entry time-to-live"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value or None on a miss / expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value for `ttl` seconds (default: the cache's ttl)"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Counters for monitoring (hit/miss/eviction) plus current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class CachedServer:
+    """A server document plus the validators derived from it, computed once per cache fill.
+
+    The document is encoded once; its bytes give the ETag and, with `keep_body`, are
+    kept as the ready-made GET response body (likewise the /tools body, on first use).
+    Compressed bodies are kept the same way, one per content encoding.
+    """
+
+    __slots__ = ('doc', 'etag', 'last_modified', '_body', '_tools_body', '_compressed')
+
+    def __init__(self, doc: dict, keep_body: bool = True):
+        self.doc = doc
+        body = dumps_body(doc)
+        self.etag = hashlib.sha1(body).hexdigest()
+        self._body = body if keep_body else None
+        self._tools_body = None
+        self._compressed = {}  # (tools, encoding) -> compressed body
+        updated_at = doc.get('updated_at')
+        if isinstance(updated_at, datetime) and updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)  # Mongo returns naive UTC
+        self.last_modified = updated_at if isinstance(updated_at, datetime) else None
+
+    @property
+    def body(self) -> bytes:
+        """Encoded document, as served by GET /v0/servers/<id>"""
+        return self._body if self._body is not None else dumps_body(self.doc)
+
+    @property
+    def tools_body(self) -> bytes:
+        """Encoded GET /v0/servers/<id>/tools response"""
+        body = self._tools_body
+        if body is None:
+            body = dumps_body({
+                'server_id': self.doc.get('id'),
+                'server_name': self.doc.get('name', ''),
+                'tools': self.doc.get('tools', [])
+            })
+            if self._body is not None:
+                self._tools_body = body
+        return body
+
+    def encoded(self, encoding: Optional[str], tools: bool = False) -> bytes:
+        """GET body (or the /tools body) in a content encoding; None is the plain body"""
+        body = self.tools_body if tools else self.body
+        if encoding is None:
+            return body
+        data = self._compressed.get((tools, encoding))
+        if data is None:
+            data = compress(body, encoding)
+            if self._body is not None:
+                self._compressed[(tools, encoding)] = data
+        return data
@@ -3,11 +3,93 @@ import requests
 import json
 from models import Server
 import os
+import gzip
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 load_dotenv()
 API_BASE = os.getenv('API_BASE', 'http://localhost:5000')  # Default to localhost
 TOKEN = os.getenv('KP_MCP_TOKEN')
+CONCURRENCY = int(os.getenv('CLI_CONCURRENCY', 8))  # Parallel requests in bulk commands
+RETRIES = int(os.getenv('CLI_RETRIES', 3))
+TIMEOUT = float(os.getenv('CLI_TIMEOUT', 30))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Shared keep-alive session; idempotent requests are retried with exponential backoff"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=RETRIES, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504],
+                          allowed_methods=['GET', 'HEAD', 'PUT', 'DELETE'], raise_on_status=False)
+            adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=max(CONCURRENCY, 10))
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+def api_request(method, path, **kwargs):
+    """Request against API_BASE through the shared session"""
+    kwargs.setdefault('timeout', TIMEOUT)
+    return get_session().request(method, f'{API_BASE}{path}', **kwargs)
+
+def run_concurrently(items, task, label, concurrency=CONCURRENCY):
+    """Run task(item) for every item on a bounded thread pool, showing progress on stderr.
+
+    Returns [(item, result)] in input order; a task's exception is returned as its result.
+    """
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(task, item): index for index, item in enumerate(items)}
+        with click.progressbar(length=len(items), label=label, file=sys.stderr) as bar:
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = (items[index], future.result())
+                except Exception as e:
+                    results[index] = (items[index], e)
+                bar.update(1)
+    return results
+
+def read_ids(path):
+    """Server ids from a file (or '-' for stdin), one per line; blank lines and # comments skipped"""
+    with click.open_file(path, 'r') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def iter_ids_with_prefix(prefix):
+    """Ids of all servers starting with `prefix` (filtered server-side on the id index)"""
+    params = {'id_prefix': prefix, 'fields': 'id', 'limit': 1000, 'include_total': 'false'}
+    while True:
+        response = api_request('GET', '/v0/servers', params=params)
+        response.raise_for_status()
+        data = response.json()
+        for server in data['servers']:
+            yield server['id']
+        if not data.get('next_cursor'):
+            return
+        params['cursor'] = data['next_cursor']
+
+def report_bulk(results, ok_statuses, verb):
+    """Print per-item failures and a summary; exit non-zero if anything failed"""
+    succeeded = 0
+    for item, result in results:
+        if isinstance(result, Exception):
+            click.echo(f"❌ {item}: {result}")
+        elif result.status_code in ok_statuses:
+            succeeded += 1
+        else:
+            click.echo(f"❌ {item}: Error {result.status_code}: {result.text.strip()}")
+    failed = len(results) - succeeded
+    click.echo(f"✅ Done: {succeeded} {verb}, {failed} failed")
+    if failed:
+        raise SystemExit(1)
 
 def get_headers():
     """Get common headers for API requests"""
@@ -68,58 +150,214 @@ def publish(file, namespace):
     # POST to API
     headers = get_headers()
     try:
-        response = requests.post(f'{API_BASE}/v0/servers', json=server.model_dump(), headers=headers)
+        response = api_request('POST', '/v0/servers', json=server.model_dump(), headers=headers)
         handle_api_response(response, "Server published successfully!")
     except requests.ConnectionError:
         click.echo(f"❌ Error: Could not connect to API at {API_BASE}")
     except Exception as e:
         click.echo(f"❌ Error: {e}")
 
+def iter_server_files(directory, jsonl_file):
+    """Yield (source, server.json data) from a directory of *.json files or a JSONL file"""
+    if directory:
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                with open(path, 'r') as f:
+                    yield path, json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                yield path, e
+    if jsonl_file:
+        with open(jsonl_file, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                source = f"{jsonl_file}:{line_number}"
+                try:
+                    yield source, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield source, e
+
+def build_server_payload(data, namespace):
+    """Payload for one server.json, validated locally (owner is set by the API)"""
+    server_id = f"{namespace}/{data['name'].lower().replace(' ', '-')}"
+    payload = {**data, 'id': server_id, 'metadata': data}
+    Server(**{'owner': '', **payload})
+    return payload
+
+@cli.command('publish-many')
+@click.option('--dir', 'directory', type=click.Path(exists=True, file_okay=False), help='Directory of server.json files')
+@click.option('--file', 'jsonl_file', type=click.Path(exists=True, dir_okay=False), help='JSONL file, one server.json per line')
+@click.option('--namespace', required=True, help='Namespace prefix, e.g., kp.internal.example')
+@click.option('--chunk-size', default=50, help='Servers per batch request (default: 50)')
+def publish_many(directory, jsonl_file, namespace, chunk_size):
+    """Publish many MCP servers through the batch endpoint"""
+    if not directory and not jsonl_file:
+        click.echo("❌ Error: Provide --dir and/or --file")
+        return
+    
+    headers = get_headers()
+    published = failed = 0
+    
+    def send(chunk):
+        nonlocal published, failed
+        response = api_request('POST', '/v0/servers:batch', json={'servers': [p for _, p in chunk]}, headers=headers)
+        if response.status_code not in [201, 207]:
+            click.echo(f"❌ Error {response.status_code}: {response.text}")
+            failed += len(chunk)
+            return
+        body = response.json()
+        published += body['published']
+        failed += body['failed']
+        for result in body['results']:
+            if result['status'] != 201:
+                source = chunk[result['index']][0]
+                click.echo(f"❌ {source}: {result['status']} {result.get('error')}")
+        click.echo(f"📤 Batch of {len(chunk)}: {body['published']} published, {body['failed']} failed")
+    
+    try:
+        chunk = []
+        for source, data in iter_server_files(directory, jsonl_file):
+            if isinstance(data, Exception):
+                click.echo(f"❌ {source}: Invalid JSON: {data}")
+                failed += 1
+                continue
+            try:
+                chunk.append((source, build_server_payload(data, namespace)))
+            except (ValueError, KeyError, TypeError) as e:
+                click.echo(f"❌ {source}: Validation error: {e}")
+                failed += 1
+                continue
+            if len(chunk) >= chunk_size:
+                send(chunk)
+                chunk = []
+        if chunk:
+            send(chunk)
+    except requests.ConnectionError:
+        click.echo(f"❌ Error: Could not connect to API at {API_BASE}")
+        return
+    
+    click.echo(f"✅ Done: {published} published, {failed} failed")
+
+def print_server_summary(server):
+    """Print the one-block summary used by `list`"""
+    click.echo(f"🔧 {server['name']} ({server['id']})")
+    click.echo(f"   📝 {server['description']}")
+    click.echo(f"   🔗 {server['endpoint']}")
+    click.echo(f"   👤 {server.get('owner_email') or server['owner']} | 🏢 {server['team']}")
+    if server.get('tools'):
+        tools_names = [tool['name'] for tool in server['tools']]
+        click.echo(f"   🛠️  Tools: {', '.join(tools_names)}")
+    click.echo()
+
 @cli.command()
 @click.option('--query', '-q', help='Search query')
 @click.option('--tools', help='Filter by tool names (comma-separated)')
 @click.option('--limit', default=20, help='Number of results (default: 20)')
 @click.option('--offset', default=0, help='Offset for pagination (default: 0)')
-def list(query, tools, limit, offset):
+@click.option('--cursor', help='Resume from a next_cursor returned by a previous page')
+@click.option('--all', 'fetch_all', is_flag=True, help='Walk every page using cursor pagination')
+def list(query, tools, limit, offset, cursor, fetch_all):
     """List servers from the registry"""
     params = {
         'limit': limit,
-        'offset': offset
+        'offset': offset,
+        'view': 'summary'  # Only the fields printed below
     }
     if query:
         params['q'] = query
     if tools:
         params['tools'] = tools
+    if cursor:
+        params['cursor'] = cursor
     
     try:
-        response = requests.get(f'{API_BASE}/v0/servers', params=params)
-        if response.status_code == 200:
+        shown = 0
+        while True:
+            response = api_request('GET', '/v0/servers', params=params)
+            if response.status_code != 200:
+                click.echo(f"❌ Error {response.status_code}: {response.text}")
+                return
             data = response.json()
-            click.echo(f"📋 Found {data['total']} servers (showing {len(data['servers'])})")
-            click.echo("─" * 80)
+            if shown == 0:
+                click.echo(f"📋 Found {data['total']} servers" + ("" if fetch_all else f" (showing {len(data['servers'])})"))
+                click.echo("─" * 80)
             
             for server in data['servers']:
-                click.echo(f"🔧 {server['name']} ({server['id']})")
-                click.echo(f"   📝 {server['description']}")
-                click.echo(f"   🔗 {server['endpoint']}")
-                click.echo(f"   👤 {server['owner']} | 🏢 {server['team']}")
-                if server.get('tools'):
-                    tools_names = [tool['name'] for tool in server['tools']]
-                    click.echo(f"   🛠️  Tools: {', '.join(tools_names)}")
-                click.echo()
-        else:
+                print_server_summary(server)
+            shown += len(data['servers'])
+            
+            next_cursor = data.get('next_cursor')
+            if not fetch_all or not next_cursor:
+                break
+            params['cursor'] = next_cursor
+            params.pop('offset', None)
+            params['include_total'] = 'false'  # Already reported on the first page
+        
+        if next_cursor and not fetch_all:
+            click.echo(f"➡️  More results: --cursor {next_cursor}")
+    except requests.ConnectionError:
+        click.echo(f"❌ Error: Could not connect to API at {API_BASE}")
+    except Exception as e:
+        click.echo(f"❌ Error: {e}")
+
+@cli.command('tools')
+@click.argument('query', default='')
+@click.option('--match', type=click.Choice(['exact', 'prefix', 'fuzzy']), default='prefix',
+              help='How QUERY matches tool names (default: prefix)')
+@click.option('--limit', default=20, help='Number of results (default: 20)')
+@click.option('--cursor', help='Resume from a next_cursor returned by a previous page')
+def find_tools(query, match, limit, cursor):
+    """Find which servers expose a tool, by name"""
+    params = {'q': query, 'match': match, 'limit': limit}
+    if cursor:
+        params['cursor'] = cursor
+
+    try:
+        response = api_request('GET', '/v0/tools', params=params)
+        if response.status_code != 200:
             click.echo(f"❌ Error {response.status_code}: {response.text}")
+            return
+        data = response.json()
+        click.echo(f"🛠️  Found {data['total']} tools (showing {len(data['tools'])})")
+        click.echo("─" * 80)
+        for tool in data['tools']:
+            click.echo(f"🔧 {tool['name']} — {tool['server']['name']} ({tool['server']['id']})")
+            if tool['description']:
+                click.echo(f"   📝 {tool['description']}")
+        if data.get('next_cursor'):
+            click.echo(f"➡️  More results: --cursor {data['next_cursor']}")
     except requests.ConnectionError:
         click.echo(f"❌ Error: Could not connect to API at {API_BASE}")
     except Exception as e:
         click.echo(f"❌ Error: {e}")
 
 @cli.command()
-@click.argument('server_id')
-def get(server_id):
-    """Get detailed information about a specific server"""
+@click.argument('server_ids', nargs=-1)
+@click.option('--from-file', type=click.Path(allow_dash=True), help="File of server ids, one per line ('-' for stdin)")
+@click.option('--concurrency', default=CONCURRENCY, help=f'Parallel requests for several ids (default: {CONCURRENCY})')
+def get(server_ids, from_file, concurrency):
+    """Get detailed information about one or more servers"""
+    server_ids = [*server_ids, *(read_ids(from_file) if from_file else [])]
+    if not server_ids:
+        click.echo("❌ Error: Provide a server id or --from-file")
+        return
+    
+    if len(server_ids) > 1:
+        # One JSON document per line, in the order given; failures are reported after
+        results = run_concurrently(server_ids, lambda server_id: api_request('GET', f'/v0/servers/{server_id}'),
+                                   f"📥 Fetching {len(server_ids)} servers", concurrency)
+        for _, result in results:
+            if not isinstance(result, Exception) and result.status_code == 200:
+                click.echo(json.dumps(result.json(), default=str))
+        report_bulk(results, [200], 'fetched')
+        return
+    
+    server_id = server_ids[0]
     try:
-        response = requests.get(f'{API_BASE}/v0/servers/{server_id}')
+        response = api_request('GET', f'/v0/servers/{server_id}')
         if response.status_code == 200:
             server = response.json()
             click.echo(f"🔧 Server Details: {server['name']}")
@@ -133,14 +371,21 @@ def get(server_id):
         click.echo(f"❌ Error: {e}")
 
 @cli.command()
-@click.argument('server_id')
+@click.argument('server_id', required=False)
+@click.option('--namespace', help='Apply the update to every server whose id starts with this prefix')
 @click.option('--file', help='Path to updated server.json (optional)')
 @click.option('--name', help='Update server name')
 @click.option('--description', help='Update server description')
 @click.option('--version', help='Update server version')
 @click.option('--endpoint', help='Update server endpoint')
-def update(server_id, file, name, description, version, endpoint):
-    """Update an existing server"""
+@click.option('--confirm', is_flag=True, help='Skip confirmation prompt for --namespace')
+@click.option('--concurrency', default=CONCURRENCY, help=f'Parallel requests for --namespace (default: {CONCURRENCY})')
+def update(server_id, namespace, file, name, description, version, endpoint, confirm, concurrency):
+    """Update an existing server, or every server in a namespace"""
+    if bool(server_id) == bool(namespace):
+        click.echo("❌ Error: Provide either a server id or --namespace")
+        return
+    
     update_data = {}
     
     # Load data from file if provided
@@ -170,8 +415,26 @@ def update(server_id, file, name, description, version, endpoint):
         return
     
     headers = get_headers()
+    if namespace:
+        try:
+            server_ids = [*iter_ids_with_prefix(namespace)]
+        except requests.RequestException as e:
+            click.echo(f"❌ Error listing servers in '{namespace}': {e}")
+            return
+        if not server_ids:
+            click.echo(f"❌ No servers found in namespace '{namespace}'")
+            return
+        if not confirm and not click.confirm(f"⚠️  Update {len(server_ids)} servers in '{namespace}'?"):
+            click.echo("❌ Update cancelled")
+            return
+        results = run_concurrently(
+            server_ids, lambda sid: api_request('PUT', f'/v0/servers/{sid}', json=update_data, headers=headers),
+            f"📝 Updating {len(server_ids)} servers", concurrency)
+        report_bulk(results, [200], 'updated')
+        return
+    
     try:
-        response = requests.put(f'{API_BASE}/v0/servers/{server_id}', json=update_data, headers=headers)
+        response = api_request('PUT', f'/v0/servers/{server_id}', json=update_data, headers=headers)
         handle_api_response(response, f"Server '{server_id}' updated successfully!")
     except requests.ConnectionError:
         click.echo(f"❌ Error: Could not connect to API at {API_BASE}")
@@ -179,10 +442,28 @@ def update(server_id, file, name, description, version, endpoint):
         click.echo(f"❌ Error: {e}")
 
 @cli.command()
-@click.argument('server_id')
+@click.argument('server_ids', nargs=-1)
+@click.option('--from-file', type=click.Path(allow_dash=True), help="File of server ids, one per line ('-' for stdin)")
 @click.option('--confirm', is_flag=True, help='Skip confirmation prompt')
-def delete(server_id, confirm):
-    """Delete a server from the registry"""
+@click.option('--concurrency', default=CONCURRENCY, help=f'Parallel requests for several ids (default: {CONCURRENCY})')
+def delete(server_ids, from_file, confirm, concurrency):
+    """Delete one or more servers from the registry"""
+    server_ids = [*server_ids, *(read_ids(from_file) if from_file else [])]
+    if not server_ids:
+        click.echo("❌ Error: Provide a server id or --from-file")
+        return
+    
+    if len(server_ids) > 1:
+        if not confirm and not click.confirm(f"⚠️  Are you sure you want to delete {len(server_ids)} servers?"):
+            click.echo("❌ Deletion cancelled")
+            return
+        headers = get_headers()
+        results = run_concurrently(server_ids, lambda sid: api_request('DELETE', f'/v0/servers/{sid}', headers=headers),
+                                   f"🗑️  Deleting {len(server_ids)} servers", concurrency)
+        report_bulk(results, [200], 'deleted')
+        return
+    
+    server_id = server_ids[0]
     if not confirm:
         if not click.confirm(f"⚠️  Are you sure you want to delete server '{server_id}'?"):
             click.echo("❌ Deletion cancelled")
@@ -190,18 +471,65 @@ def delete(server_id, confirm):
     
     headers = get_headers()
     try:
-        response = requests.delete(f'{API_BASE}/v0/servers/{server_id}', headers=headers)
+        response = api_request('DELETE', f'/v0/servers/{server_id}', headers=headers)
         handle_api_response(response, f"Server '{server_id}' deleted successfully!")
     except requests.ConnectionError:
         click.echo(f"❌ Error: Could not connect to API at {API_BASE}")
     except Exception as e:
         click.echo(f"❌ Error: {e}")
 
+@cli.command()
+@click.option('--output', '-o', required=True, type=click.Path(dir_okay=False, allow_dash=True),
+              help="Destination file ('-' for stdout); a .gz name is written gzip-compressed")
+@click.option('--fields', help='Comma-separated fields to export (id is always included)')
+@click.option('--view', type=click.Choice(['full', 'summary']), help='Export summary fields only')
+def export(output, fields, view):
+    """Export every server as newline-delimited JSON"""
+    params = {}
+    if fields:
+        params['fields'] = fields
+    if view:
+        params['view'] = view
+    compressed = output.endswith('.gz')
+    part = output if output == '-' else f'{output}.part'  # Renamed into place once complete
+    
+    try:
+        response = api_request('GET', '/v0/servers:export', params=params, stream=True,
+                               headers={'Accept-Encoding': 'gzip'})
+        if response.status_code != 200:
+            click.echo(f"❌ Error {response.status_code}: {response.text}")
+            return
+        written = 0
+        with response, click.open_file(part, 'wb') as f:
+            if compressed and response.headers.get('Content-Encoding') == 'gzip':
+                # Keep the server's gzip stream as is
+                for chunk in response.raw.stream(1 << 16, decode_content=False):
+                    f.write(chunk)
+                    written += len(chunk)
+            else:
+                target = gzip.GzipFile(fileobj=f, mode='wb') if compressed else f
+                for chunk in response.iter_content(1 << 16):
+                    target.write(chunk)
+                    written += len(chunk)
+                if compressed:
+                    target.close()
+        if part != output:
+            shutil.move(part, output)
+        if output != '-':
+            click.echo(f"✅ Exported registry to {output} ({written / (1 << 20):.1f} MB)", err=True)
+    except requests.ConnectionError:
+        click.echo(f"❌ Error: Could not connect to API at {API_BASE}")
+    except Exception as e:
+        click.echo(f"❌ Error: {e}")
+    finally:
+        if part != output and os.path.exists(part):
+            os.remove(part)  # Incomplete export
+
 @cli.command()
 def health():
     """Check API health status"""
     try:
-        response = requests.get(f'{API_BASE}/v0/health')
+        response = api_request('GET', '/v0/health')
         if response.status_code == 200:
             click.echo("✅ API is healthy!")
             click.echo(f"Response: {response.json()}")
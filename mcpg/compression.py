@@ -0,0 +1,67 @@
+"""
+Response compression negotiated with Accept-Encoding.
+
+JSON and text bodies of at least COMPRESSION_MIN_SIZE bytes are compressed with
+brotli (when installed: the `compression` extra) or gzip, whichever the client
+prefers. Streamed responses have no length up front and are left alone; the export
+endpoint compresses its own stream. ETags are made weak, since one entity is now
+served in several encodings, and compressible responses send `Vary: Accept-Encoding`.
+"""
+
+import gzip
+import os
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION = os.getenv('COMPRESSION', 'true').lower() == 'true'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+
+# In order of preference when the client accepts several equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_TYPES = frozenset({'application/json', 'application/x-ndjson', 'text/plain', 'text/html'})
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)  # mtime=0: same bytes every time
+    raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+
+def choose_encoding(accept_encodings, size: int) -> Optional[str]:
+    """Encoding for a body of `size` bytes given the request's parsed Accept-Encoding, or None"""
+    if not COMPRESSION or size < COMPRESSION_MIN_SIZE:
+        return None
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def prepare_response(response, accept_encodings) -> Optional[str]:
+    """Set Vary and weak ETags on a (Flask or Quart) response; returns the encoding for its body, if any"""
+    if not COMPRESSION:
+        return None
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    if response.status_code == 304:
+        response.vary.add('Accept-Encoding')
+        return None
+    if not 200 <= response.status_code < 300 or response.mimetype not in COMPRESSIBLE_TYPES:
+        return None
+    response.vary.add('Accept-Encoding')
+    # Already encoded (cached bodies, export), or streamed with no length up front
+    if 'Content-Encoding' in response.headers or response.content_length is None:
+        return None
+    return choose_encoding(accept_encodings, response.content_length)
+
+
+def set_encoded_body(response, data: bytes, encoding: str) -> None:
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
@@ -0,0 +1,63 @@
+"""
+Shared pytest fixtures: the Flask app against an in-memory (mongomock) database.
+"""
+
+import os
+
+os.environ.setdefault('MONGO_URI', 'mongomock://')
+os.environ.setdefault('DEV_MODE', 'true')
+os.environ.setdefault('MOCK_JWT_SECRET', 'test-secret-at-least-32-bytes-long!')
+os.environ.setdefault('SYNC_MODE', 'off')
+os.environ.setdefault('AUDIT_ASYNC', 'false')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import pytest
+
+import app as registry
+
+
+@pytest.fixture
+def registry_app():
+    """The app module with empty collections and local caches/indexes"""
+    for name in registry.db.list_collection_names():
+        registry.db.drop_collection(name)
+    registry.reset_local_state()
+    yield registry
+    registry.reset_local_state()
+
+
+@pytest.fixture
+def client(registry_app):
+    return registry_app.app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client):
+    token = client.get('/dev/token').get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def make_server(server_id: str, **overrides) -> dict:
+    """A valid publish payload"""
+    server = {
+        'id': server_id,
+        'name': f'Server {server_id}',
+        'description': 'A test server for github repos',
+        'version': '1.0.0',
+        'endpoint': 'https://example.kp.com',
+        'tools': [{'name': 'list_repos', 'description': 'List repositories'}],
+        'auth_methods': ['bearer'],
+        'team': 'Test Team',
+        'tags': ['git'],
+        'metadata': {'name': f'Server {server_id}', 'endpoint': 'https://example.kp.com'},
+    }
+    server.update(overrides)
+    return server
+
+
+@pytest.fixture
+def publish(client, auth_headers):
+    """publish(server_id, **overrides) -> response"""
+    def publish(server_id, **overrides):
+        return client.post('/v0/servers', json=make_server(server_id, **overrides), headers=auth_headers)
+    return publish
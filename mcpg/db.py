@@ -0,0 +1,157 @@
+import os
+import threading
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import pymongo
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from metrics import MongoCommandListener, MongoPoolListener
+
+
+def _parse_bool(value: str) -> bool:
+    return value.lower() in ('1', 'true', 'yes')
+
+
+# MongoClient option -> (environment variable, parser, default). Options set in
+# MONGO_URI win over these defaults; an explicitly set variable wins over both.
+# Cosmos DB does not support retryable writes: use MONGO_RETRY_WRITES=false there.
+CLIENT_OPTIONS = {
+    'maxPoolSize': ('MONGO_MAX_POOL_SIZE', int, 100),
+    'minPoolSize': ('MONGO_MIN_POOL_SIZE', int, 0),
+    'maxIdleTimeMS': ('MONGO_MAX_IDLE_TIME_MS', int, 60000),
+    'waitQueueTimeoutMS': ('MONGO_WAIT_QUEUE_TIMEOUT_MS', int, 5000),  # Fail fast instead of piling up threads
+    'serverSelectionTimeoutMS': ('MONGO_SERVER_SELECTION_TIMEOUT_MS', int, 5000),
+    'connectTimeoutMS': ('MONGO_CONNECT_TIMEOUT_MS', int, 5000),
+    'socketTimeoutMS': ('MONGO_SOCKET_TIMEOUT_MS', int, None),
+    'retryWrites': ('MONGO_RETRY_WRITES', _parse_bool, True),
+    'retryReads': ('MONGO_RETRY_READS', _parse_bool, True),
+    'appname': ('MONGO_APP_NAME', str, 'kpmcpg'),
+}
+
+READ_PREFERENCES = {
+    'primarypreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondarypreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+
+def client_options(uri: Optional[str]) -> dict:
+    """Keyword arguments for MongoClient from CLIENT_OPTIONS"""
+    in_uri = {name.lower() for name in parse_qs(urlsplit(uri).query)} if uri else set()
+    options = {}
+    for option, (variable, parse, default) in CLIENT_OPTIONS.items():
+        value = os.getenv(variable)
+        if value:
+            options[option] = parse(value)
+        elif default is not None and option.lower() not in in_uri:
+            options[option] = default
+    return options
+
+
+def read_preference():
+    """Read preference for single-server reads and export (writes and everything else use the primary)"""
+    mode = os.getenv('MONGO_READ_PREFERENCE', 'secondaryPreferred').lower()
+    if mode == 'primary':
+        return Primary()
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown MONGO_READ_PREFERENCE '{mode}'")
+    # Secondaries lagging more than this are skipped (MongoDB requires at least 90 seconds)
+    max_staleness = int(os.getenv('MONGO_MAX_STALENESS_SECONDS', -1))
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+# MongoDB ('mongomock://' selects an in-memory stand-in for tests and benchmarks).
+# Command and pool monitoring feed the database metrics on /metrics.
+def create_mongo_client(uri: Optional[str]):
+    if uri and uri.startswith('mongomock://'):
+        import mongomock
+        return mongomock.MongoClient()
+    return pymongo.MongoClient(uri, event_listeners=[MongoCommandListener(), MongoPoolListener()],
+                               **client_options(uri))
+
+
+def _is_in_memory() -> bool:
+    return os.getenv('MONGO_URI', '').startswith('mongomock://')
+
+
+def get_client():
+    """The MongoClient for the current process, created on first use.
+
+    MongoClient is not fork-safe (its pool sockets and monitor threads belong to
+    the parent), so a pre-fork server's workers each create their own after fork.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client_pid != pid:
+        with _client_lock:
+            if _client_pid != pid:
+                # mongomock keeps data in the client object; it must survive the fork
+                if _client is None or not _is_in_memory():
+                    _client = create_mongo_client(os.getenv('MONGO_URI'))
+                _client_pid = pid
+    return _client
+
+
+def reset_client() -> None:
+    """Forget the inherited client in a freshly forked worker (never close it: the parent owns it)"""
+    global _client_pid
+    with _client_lock:
+        _client_pid = None
+
+
+def database_name() -> str:
+    return os.getenv('MONGO_DB', 'Agentic')  # Match the database name used in seed.py
+
+
+def get_database():
+    return get_client()[database_name()]
+
+
+class LazyCollection:
+    """Collection handle that resolves against the current process's client on each use.
+
+    With `secondary_reads`, reads follow MONGO_READ_PREFERENCE (secondaryPreferred
+    by default); use it only for reads that tolerate replication lag.
+    """
+
+    __slots__ = ('name', 'secondary_reads', '_client', '_collection')
+
+    def __init__(self, name: str, secondary_reads: bool = False):
+        self.name = name
+        self.secondary_reads = secondary_reads
+        self._client = None
+        self._collection = None
+
+    def _resolve(self):
+        client = get_client()
+        if client is not self._client:
+            preference = read_preference() if self.secondary_reads else Primary()
+            self._collection = client[database_name()].get_collection(self.name, read_preference=preference)
+            self._client = client
+        return self._collection
+
+    def __getattr__(self, attribute):
+        return getattr(self._resolve(), attribute)
+
+    def __repr__(self) -> str:
+        return f'LazyCollection({self.name!r})'
+
+
+class LazyDatabase:
+    """Database handle that resolves against the current process's client on each use"""
+
+    @property
+    def name(self) -> str:
+        return database_name()
+
+    def __getitem__(self, collection_name: str):
+        return get_database()[collection_name]
+
+    def __getattr__(self, attribute):
+        return getattr(get_database(), attribute)
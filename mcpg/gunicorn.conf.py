@@ -0,0 +1,37 @@
+"""
+Gunicorn settings for running the registry in production.
+
+    uv run gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the master imports the app once (Azure AD client, index checks,
+search index warm-up) and forks workers from it; each worker then creates its own
+MongoClient and background threads. Workers are recycled after max_requests
+(+ jitter, so they do not all restart together) and get graceful_timeout seconds to
+finish in-flight requests and flush queued audit entries.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads per worker: requests mostly wait on MongoDB, so a few threads per process help
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+
+
+def post_fork(server, worker):
+    import app
+    app.after_fork()
+
+
+def worker_exit(server, worker):
+    import app
+    app.shutdown()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Bulk import of server documents for seeding and migrations.
+
+Streams records from NDJSON files (optionally gzipped, e.g. from `cli.py export`) or
+directories of server JSON files, validates them with models.Server in a process
+pool, and writes each chunk with one unordered bulk_write of upserts. Like the
+publish endpoints, every chunk reserves `sync_seq` numbers and stamps `updated_at`,
+so the changes feed and the running workers' caches pick the servers up.
+
+With --checkpoint, progress is saved after each written chunk; rerunning the same
+command after an interruption resumes after the last written chunk. Upserts are
+idempotent, so a chunk that was partly written when the import stopped is safe to
+write again.
+
+    uv run python importer.py catalogue.ndjson --checkpoint import.ckpt
+    uv run python importer.py ./servers --namespace kp.internal.example --owner <tid>:<oid>
+"""
+
+import gzip
+import itertools
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import click
+import pymongo
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from models import Server
+from versions import bump_registry_version, reserve_sync_seqs
+
+# Fields owned by the registry, never taken from the input
+_REGISTRY_FIELDS = ('_id', 'sync_seq')
+
+
+def iter_records(paths: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """(source, JSON text) for every record, in a stable order so positions can be resumed"""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith('.json'):
+                    full_path = os.path.join(path, name)
+                    with open(full_path, 'r', encoding='utf-8') as f:
+                        yield full_path, f.read()
+            continue
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield f'{path}:{line_number}', line
+
+
+def prepare_document(raw, namespace: Optional[str] = None, owner: Optional[str] = None) -> dict:
+    """Validated server document from JSON text or a dict; raises on invalid input.
+
+    Records without an `id` are treated as server.json files: the id is derived from
+    the name under `namespace` and the record becomes the metadata (as in cli.py).
+    """
+    data = json.loads(raw) if isinstance(raw, str) else dict(raw)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    for field in _REGISTRY_FIELDS:
+        data.pop(field, None)
+    if 'id' not in data:
+        if not namespace:
+            raise ValueError("Missing 'id' (pass --namespace to derive it from the name)")
+        if not data.get('name'):
+            raise ValueError("Missing 'id' and 'name'")
+        data = {**data, 'id': f"{namespace}/{data['name'].lower().replace(' ', '-')}", 'metadata': data}
+    if owner and not data.get('owner'):
+        data['owner'] = owner
+    return Server(**data).model_dump()
+
+
+def validate_chunk(records: List[Tuple[str, object]], namespace: Optional[str], owner: Optional[str]) -> list:
+    """Pool task: [(source, raw)] -> [(source, document or None, error or None)]"""
+    results = []
+    for source, raw in records:
+        try:
+            results.append((source, prepare_document(raw, namespace, owner), None))
+        except ValidationError as e:
+            problems = '; '.join(f"{'.'.join(map(str, error['loc'])) or 'server'}: {error['msg']}" for error in e.errors())
+            results.append((source, None, f"Invalid server: {problems}"))
+        except Exception as e:
+            message = getattr(e, 'message', None) or str(e)  # jsonschema errors keep the short form in .message
+            results.append((source, None, f"{type(e).__name__}: {' '.join(message.split())[:500]}"))
+    return results
+
+
+def validated_chunks(chunks: Iterable[list], workers: int, namespace: Optional[str], owner: Optional[str]):
+    """Validate chunks in a process pool, in input order, with at most 2 chunks per worker in flight"""
+    if workers <= 0:
+        for chunk in chunks:
+            yield validate_chunk(chunk, namespace, owner)
+        return
+    # Spawned workers never inherit the parent's MongoClient or logging threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(validate_chunk, chunk, namespace, owner))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_chunk(db, entries: List[Tuple[str, dict]], skip_existing: bool, actor: str) -> Tuple[int, int, list]:
+    """Upsert validated (source, document) pairs -> (written, existing, [(source, error)])"""
+    # A later record for the same id wins, as if the records were written one by one
+    latest = {doc['id']: (source, doc) for source, doc in entries}
+    if skip_existing:
+        # Sequence numbers only for servers that will be inserted: each unused one is a gap
+        # that holds up the changes feed for CHANGES_GAP_TIMEOUT
+        found = db['servers'].find({'id': {'$in': list(latest)}}, {'_id': 0, 'id': 1})
+        known = {doc['id'] for doc in found}
+        entries = [entry for server_id, entry in latest.items() if server_id not in known]
+    else:
+        known = set()
+        entries = list(latest.values())
+    if not entries:
+        return 0, len(known), []
+    first_seq = reserve_sync_seqs(db['meta'], len(entries))
+    now = datetime.now(timezone.utc)
+    operations = []
+    for offset, (_, doc) in enumerate(entries):
+        doc['sync_seq'] = first_seq + offset
+        doc['updated_at'] = now
+        if skip_existing:
+            operations.append(pymongo.UpdateOne({'id': doc['id']}, {'$setOnInsert': doc}, upsert=True))
+        else:
+            operations.append(pymongo.ReplaceOne({'id': doc['id']}, doc, upsert=True))
+
+    try:
+        details = db['servers'].bulk_write(operations, ordered=False).bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+    failed = {error['index']: error.get('errmsg', 'write failed') for error in details.get('writeErrors', [])}
+    if skip_existing:
+        written_indexes = {upsert['index'] for upsert in details.get('upserted', [])}
+    else:
+        written_indexes = set(range(len(entries))) - set(failed)
+    written = [entries[index] for index in sorted(written_indexes)]
+
+    if written:
+        # Only once the writes have committed, so a list never pairs the new ETag with the old body
+        bump_registry_version(db['meta'], len(written))
+        db['tombstones'].delete_many({'id': {'$in': [doc['id'] for _, doc in written]}})
+        db['audits'].insert_many([
+            {'action': 'import', 'user_id': actor, 'server_id': doc['id'], 'timestamp': now,
+             'details': {'source': source}}
+            for source, doc in written
+        ], ordered=False)
+    # Servers inserted since `known` was read are existing too (their sequence numbers go unused)
+    existing = len(known) + len(entries) - len(written) - len(failed)
+    return len(written), existing, [(entries[index][0], message) for index, message in failed.items()]
+
+
+def import_servers(db, records: Iterable[Tuple[str, object]], chunk_size: int = 500, workers: int = 0,
+                   namespace: Optional[str] = None, owner: Optional[str] = None, skip_existing: bool = False,
+                   actor: str = 'importer', start: int = 0, stats: Optional[dict] = None,
+                   on_chunk: Optional[Callable[[int, dict, list], None]] = None) -> dict:
+    """Validate and write (source, raw) records in chunks; returns counts.
+
+    `start` skips records already imported (a checkpoint position). After each chunk
+    is written, `on_chunk(position, stats, errors)` receives the number of records
+    consumed so far, the running counts and that chunk's [(source, error)].
+    """
+    stats = dict(stats or {'imported': 0, 'existing': 0, 'invalid': 0, 'failed': 0})
+    position = start
+    chunks = _chunked(itertools.islice(records, start, None), chunk_size)
+    for results in validated_chunks(chunks, workers, namespace, owner):
+        errors = [(source, error) for source, _, error in results if error is not None]
+        valid = [(source, doc) for source, doc, error in results if error is None]
+        if valid:
+            written, existing, write_errors = write_chunk(db, valid, skip_existing, actor)
+            stats['imported'] += written
+            stats['existing'] += existing
+            stats['failed'] += len(write_errors)
+            errors.extend(write_errors)
+        stats['invalid'] += len(results) - len(valid)
+        position += len(results)
+        if on_chunk is not None:
+            on_chunk(position, stats, errors)
+    return stats
+
+
+def _chunked(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_checkpoint(path: str, sources: List[str]) -> Tuple[int, Optional[dict]]:
+    """(position, stats) saved for these sources, or (0, None) when there is none"""
+    if not os.path.exists(path):
+        return 0, None
+    with open(path, 'r') as f:
+        state = json.load(f)
+    if state.get('sources') != sources:
+        raise click.ClickException(f"Checkpoint {path} belongs to a different import ({state.get('sources')}); "
+                                   "use --restart to discard it")
+    return state['position'], state['stats']
+
+
+def save_checkpoint(path: str, sources: List[str], position: int, stats: dict) -> None:
+    """Write the checkpoint atomically, so an interruption never leaves it half-written"""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump({'sources': sources, 'position': position, 'stats': stats,
+                   'saved_at': datetime.now(timezone.utc).isoformat()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+@click.command()
+@click.argument('sources', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--namespace', help='Derive ids for server.json records without one, e.g. kp.internal.example')
+@click.option('--owner', help='Owner user id (<tid>:<oid>, as in registry tokens) for records without one')
+@click.option('--chunk-size', default=500, help='Records per validation task and bulk write (default: 500)')
+@click.option('--workers', default=os.cpu_count() or 1, help='Validation processes; 0 validates inline (default: CPUs)')
+@click.option('--skip-existing', is_flag=True, help='Only insert servers whose id is not in the registry yet')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='Save progress here and resume from it')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint and import from the start')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False),
+              help='Append rejected records (source, error) here as JSON lines')
+@click.option('--actor', default='importer', help='user_id recorded in the audit log (default: importer)')
+def main(sources, namespace, owner, chunk_size, workers, skip_existing, checkpoint, restart, errors_path, actor):
+    """Import server documents from NDJSON files or directories of JSON files"""
+    from db import create_mongo_client, database_name
+    from indexes import ensure_indexes
+
+    mongo_uri = os.getenv('MONGO_URI')
+    if not mongo_uri:
+        raise click.ClickException("MONGO_URI environment variable not set")
+    db = create_mongo_client(mongo_uri)[database_name()]
+    ensure_indexes(db)  # The unique id index keeps concurrent upserts from duplicating servers
+
+    sources = [os.path.abspath(source) for source in sources]
+    start, stats = 0, None
+    if checkpoint and not restart:
+        start, stats = load_checkpoint(checkpoint, sources)
+        if start:
+            click.echo(f"⏩ Resuming after {start} records ({stats['imported']} imported so far)", err=True)
+
+    errors_file = open(errors_path, 'a') if errors_path else None
+    shown_errors = 0
+
+    def on_chunk(position, chunk_stats, errors):
+        nonlocal shown_errors
+        if checkpoint:
+            save_checkpoint(checkpoint, sources, position, chunk_stats)
+        for source, error in errors:
+            if errors_file is not None:
+                errors_file.write(json.dumps({'source': source, 'error': error}) + '\n')
+            if shown_errors < 20:
+                click.echo(f"❌ {source}: {error}", err=True)
+            shown_errors += 1
+        click.echo(f"📥 {position} records: {chunk_stats['imported']} imported, {chunk_stats['existing']} existing, "
+                   f"{chunk_stats['invalid']} invalid, {chunk_stats['failed']} failed", err=True)
+
+    try:
+        stats = import_servers(db, iter_records(sources), chunk_size=chunk_size, workers=workers,
+                               namespace=namespace, owner=owner, skip_existing=skip_existing, actor=actor,
+                               start=start, stats=stats, on_chunk=on_chunk)
+    finally:
+        if errors_file is not None:
+            errors_file.close()
+    if shown_errors > 20:
+        click.echo(f"… {shown_errors - 20} more errors" + (f" in {errors_path}" if errors_path else ''), err=True)
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)  # Complete; a rerun starts from the beginning
+    click.echo(f"✅ Done: {stats['imported']} imported, {stats['existing']} existing, "
+               f"{stats['invalid']} invalid, {stats['failed']} failed")
+    if stats['invalid'] or stats['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
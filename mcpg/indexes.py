@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Index management for the registry collections.
+
+Declares the indexes the API's query shapes rely on, creates missing ones
+idempotently, and checks with explain() that those shapes are served by an index
+rather than a collection scan. Runs at server startup (app.py) and standalone:
+
+    uv run python indexes.py            # ensure indexes, then verify query plans
+    uv run python indexes.py --check    # only verify query plans
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Tuple
+
+import click
+import pymongo
+
+from logs import get_logger
+
+log = get_logger('indexes')
+
+TEXT_INDEX_KEYS = [('name', 'text'), ('description', 'text'), ('tools.name', 'text'), ('tags', 'text')]
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, object]]
+    unique: bool = False
+    optional: bool = False  # Failure is expected on some deployments (e.g. text indexes on Cosmos DB)
+
+
+INDEXES = [
+    # Lookups, replace/update/delete by id, keyset pagination sorted by id
+    IndexSpec('servers', [('id', pymongo.ASCENDING)], unique=True),
+    # `tools` filter ($in on a multikey array)
+    IndexSpec('servers', [('tools.name', pymongo.ASCENDING)]),
+    # A publisher's servers, most recently updated first
+    IndexSpec('servers', [('owner', pymongo.ASCENDING), ('updated_at', pymongo.DESCENDING)]),
+    # Change polling by workers (sync.py)
+    IndexSpec('servers', [('updated_at', pymongo.ASCENDING)]),
+    # Changes feed position
+    IndexSpec('servers', [('sync_seq', pymongo.ASCENDING), ('id', pymongo.ASCENDING)]),
+    IndexSpec('servers', TEXT_INDEX_KEYS, optional=True),
+    IndexSpec('tombstones', [('sync_seq', pymongo.ASCENDING), ('id', pymongo.ASCENDING)]),
+    IndexSpec('tombstones', [('deleted_at', pymongo.ASCENDING)]),
+    IndexSpec('tombstones', [('id', pymongo.ASCENDING)]),
+    # A server's audit history, newest first
+    IndexSpec('audits', [('server_id', pymongo.ASCENDING), ('timestamp', pymongo.DESCENDING)]),
+]
+
+
+def _is_text(keys) -> bool:
+    return any(direction == 'text' for _, direction in keys)
+
+
+def _matches(spec: IndexSpec, existing: dict) -> bool:
+    key = list(existing['key'].items())
+    if _is_text(spec.keys):
+        # Text indexes are stored as {_fts, _ftsx}; only one is allowed per collection
+        return any(field == '_fts' for field, _ in key) or _is_text(key)
+    normalized = [(field, direction if isinstance(direction, str) else int(direction)) for field, direction in key]
+    return normalized == list(spec.keys)
+
+
+def _duplicate_values(collection, field: str, limit: int = 5) -> list:
+    pipeline = [
+        {'$group': {'_id': f'${field}', 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+        {'$limit': limit},
+    ]
+    return [group['_id'] for group in collection.aggregate(pipeline, allowDiskUse=True)]
+
+
+def ensure_index(db, spec: IndexSpec) -> dict:
+    """Create one declared index unless an equivalent exists. Never raises."""
+    collection = db[spec.collection]
+    result = {'collection': spec.collection, 'keys': spec.keys, 'unique': spec.unique}
+    try:
+        existing = next((index for index in collection.list_indexes() if _matches(spec, index)), None)
+        if existing is not None and (existing.get('unique', False) or not spec.unique):
+            return dict(result, name=existing['name'], status='exists')
+        if existing is not None:
+            # Older deployments created a plain `id` index; upgrade it once the data allows
+            duplicates = _duplicate_values(collection, spec.keys[0][0])
+            if duplicates:
+                log.error("Cannot make %s.%s unique, duplicate values: %s",
+                          spec.collection, existing['name'], duplicates)
+                return dict(result, name=existing['name'], status='failed', error=f'duplicate values: {duplicates}')
+            collection.drop_index(existing['name'])
+            name = collection.create_index(spec.keys, unique=spec.unique)
+            log.info("Rebuilt index %s.%s as unique", spec.collection, name)
+            return dict(result, name=name, status='rebuilt')
+        name = collection.create_index(spec.keys, unique=spec.unique)
+        log.info("Created index %s.%s", spec.collection, name)
+        return dict(result, name=name, status='created')
+    except Exception as e:
+        if spec.optional:
+            log.info("Optional index on %s %s not created: %s", spec.collection, spec.keys, e)
+        else:
+            log.warning("Could not create index on %s %s: %s", spec.collection, spec.keys, e)
+        return dict(result, status='failed', optional=spec.optional, error=str(e))
+
+
+def ensure_indexes(db, include_text: bool = True) -> List[dict]:
+    """Create any missing declared indexes; safe to run on every startup"""
+    return [ensure_index(db, spec) for spec in INDEXES if include_text or not _is_text(spec.keys)]
+
+
+def query_shapes(db) -> dict:
+    """The hot query shapes, as unexecuted cursors (name -> cursor)"""
+    servers, tombstones, audits = db['servers'], db['tombstones'], db['audits']
+    since = datetime.now(timezone.utc)
+    by_position = [('sync_seq', pymongo.ASCENDING), ('id', pymongo.ASCENDING)]
+    after_position = {'$or': [{'sync_seq': {'$gt': 0}}, {'sync_seq': 0, 'id': {'$gt': ''}}]}
+    return {
+        'get_server': servers.find({'id': 'kp.internal.example'}).limit(1),
+        'list_first_page': servers.find({}).sort('id', pymongo.ASCENDING).limit(21),
+        'list_after_cursor': servers.find({'id': {'$gt': 'kp.internal.example'}}).sort('id', pymongo.ASCENDING).limit(21),
+        'list_id_prefix': servers.find({'id': {'$regex': r'^kp\.internal\.'}}).sort('id', pymongo.ASCENDING).limit(21),
+        'list_tools_filter': servers.find({'tools.name': {'$in': ['example_tool']}}).sort('id', pymongo.ASCENDING).limit(21),
+        'servers_by_owner': servers.find({'owner': 'dev@kp.com'}).sort('updated_at', pymongo.DESCENDING),
+        'sync_poll_servers': servers.find({'updated_at': {'$gt': since}}),
+        'changes_servers': servers.find(after_position).sort(by_position).limit(101),
+        'changes_tombstones': tombstones.find(after_position).sort(by_position).limit(101),
+        'sync_poll_tombstones': tombstones.find({'deleted_at': {'$gt': since}}),
+        'audits_for_server': audits.find({'server_id': 'kp.internal.example'}).sort('timestamp', pymongo.DESCENDING),
+    }
+
+
+def plan_stages(plan) -> List[str]:
+    """All stage names in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+def verify_query_plans(db) -> List[dict]:
+    """explain() each hot query shape and flag winning plans containing a COLLSCAN"""
+    results = []
+    for shape, cursor in query_shapes(db).items():
+        try:
+            winning_plan = cursor.explain().get('queryPlanner', {}).get('winningPlan')
+        except Exception as e:
+            results.append({'shape': shape, 'status': 'unavailable', 'error': str(e)})
+            continue
+        if winning_plan is None:
+            results.append({'shape': shape, 'status': 'unavailable', 'error': 'no queryPlanner in explain output'})
+            continue
+        stages = plan_stages(winning_plan)
+        status = 'collscan' if 'COLLSCAN' in stages else 'ok'
+        if status == 'collscan':
+            log.warning("Query shape %s uses a collection scan: %s", shape, ' > '.join(stages))
+        results.append({'shape': shape, 'status': status, 'stages': stages})
+    return results
+
+
+@click.command()
+@click.option('--check', is_flag=True, help='Only verify query plans, do not create indexes')
+@click.option('--no-text', is_flag=True, help='Skip the text search index (e.g. Cosmos DB)')
+def main(check, no_text):
+    """Ensure registry indexes exist and verify hot query plans"""
+    mongo_uri = os.getenv('MONGO_URI')
+    if not mongo_uri:
+        raise click.ClickException("MONGO_URI environment variable not set")
+    db = pymongo.MongoClient(mongo_uri)[os.getenv('MONGO_DB', 'Agentic')]
+
+    failed = False
+    if not check:
+        for result in ensure_indexes(db, include_text=not no_text):
+            icon = {'exists': '✅', 'created': '🆕', 'rebuilt': '🔁'}.get(result['status'], '❌')
+            label = result.get('name') or ', '.join(f'{field}:{direction}' for field, direction in result['keys'])
+            click.echo(f"{icon} {result['collection']}.{label}: {result['status']}"
+                       + (f" ({result['error']})" if result.get('error') else ''))
+            failed |= result['status'] == 'failed' and not result.get('optional')
+
+    for result in verify_query_plans(db):
+        icon = {'ok': '✅', 'collscan': '❌'}.get(result['status'], '⚠️ ')
+        detail = ' > '.join(result['stages']) if 'stages' in result else result.get('error')
+        click.echo(f"{icon} {result['shape']}: {detail}")
+        failed |= result['status'] == 'collscan'
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
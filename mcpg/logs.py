@@ -0,0 +1,153 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Loggers are named `registry.<category>`, e.g. registry.query for per-request list
+# queries. LOG_LEVELS / LOG_SAMPLE tune categories independently of LOG_LEVEL.
+ROOT_LOGGER = 'registry'
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def get_logger(category: str) -> logging.Logger:
+    return logging.getLogger(f'{ROOT_LOGGER}.{category}')
+
+
+def parse_category_settings(value: Optional[str]) -> Dict[str, str]:
+    """'query=DEBUG,sync=WARNING' -> {'query': 'DEBUG', 'sync': 'WARNING'}"""
+    settings = {}
+    for item in (value or '').split(','):
+        name, _, setting = item.partition('=')
+        if name.strip() and setting.strip():
+            settings[name.strip()] = setting.strip()
+    return settings
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra={...}` fields become top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Pass a fraction of records; warnings and errors are always kept"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never block the request thread: drop (and count) records when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Queue handler on the `registry` logger, drained to stderr by a background listener"""
+
+    def __init__(self, level: str = 'INFO', levels: Optional[Dict[str, str]] = None,
+                 sample: Optional[Dict[str, str]] = None, fmt: str = 'json', max_queue: int = 10000,
+                 stream=None):
+        self.output = logging.StreamHandler(stream or sys.stderr)
+        if fmt == 'json':
+            self.output.setFormatter(JsonFormatter())
+        else:
+            self.output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        self.handler = DroppingQueueHandler(queue.Queue(max_queue))
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(level.upper())
+        root.propagate = False
+        for handler in list(root.handlers):
+            if isinstance(handler, DroppingQueueHandler):
+                root.removeHandler(handler)
+        root.addHandler(self.handler)
+        for category, category_level in (levels or {}).items():
+            get_logger(category).setLevel(category_level.upper())
+        for category, rate in (sample or {}).items():
+            category_logger = get_logger(category)
+            category_logger.filters = [f for f in category_logger.filters if not isinstance(f, SamplingFilter)]
+            category_logger.addFilter(SamplingFilter(float(rate)))
+
+    def ensure_started(self) -> None:
+        """Start the listener thread once per process (threads do not survive fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._listener = logging.handlers.QueueListener(self.handler.queue, self.output)
+            self._listener.start()
+
+    def after_fork(self) -> None:
+        """In a forked child: drop the parent's queue (its lock may be held) and start a listener"""
+        with self._lock:
+            self.handler.queue = queue.Queue(self.handler.queue.maxsize)
+            self._listener = None
+            self._pid = None
+        self.ensure_started()
+
+    def stop(self) -> None:
+        """Drain queued records and stop the listener"""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def stats(self) -> dict:
+        return {'queued': self.handler.queue.qsize(), 'dropped': self.handler.dropped}
+
+
+def configure_logging(**overrides) -> LogPipeline:
+    """Build the log pipeline from LOG_* environment variables and start its listener"""
+    settings = dict(
+        level=os.getenv('LOG_LEVEL', 'INFO'),
+        levels=parse_category_settings(os.getenv('LOG_LEVELS')),
+        sample=parse_category_settings(os.getenv('LOG_SAMPLE')),
+        fmt=os.getenv('LOG_FORMAT', 'json').lower(),
+        max_queue=int(os.getenv('LOG_QUEUE_SIZE', 10000)),
+    )
+    settings.update(overrides)
+    pipeline = LogPipeline(**settings)
+    pipeline.ensure_started()
+    atexit.register(pipeline.stop)
+    return pipeline
@@ -0,0 +1,257 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Tuple
+
+from pymongo import monitoring
+
+# Latency buckets in seconds (sub-millisecond cache hits up to multi-second scans)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _le(bound) -> str:
+    return 'le="%s"' % _format_value(float(bound))
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f'{self.name}_bucket{_format_labels(self.labels, key, _le(bound))} {cumulative}'
+            yield f'{self.name}_bucket{_format_labels(self.labels, key, _le(float("inf")))} {series[-1]}'
+            yield f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series[-2])}'
+            yield f'{self.name}_count{_format_labels(self.labels, key)} {series[-1]}'
+
+
+class Gauges:
+    """Values read from a callback at scrape time, e.g. cache stats dicts"""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str], collect: Callable[[], Dict[tuple, float]],
+                 metric_type: str = 'gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.metric_type = metric_type
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} {self.metric_type}'
+        for key, value in sorted(self.collect().items()):
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                yield f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauges(self, name: str, help_text: str, labels: Iterable[str], collect, metric_type: str = 'gauge') -> Gauges:
+        return self.register(Gauges(name, help_text, labels, collect, metric_type))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+mongo_commands = registry.counter(
+    'registry_mongo_commands_total', 'MongoDB commands issued', ['command', 'outcome'])
+mongo_command_seconds = registry.histogram(
+    'registry_mongo_command_duration_seconds', 'MongoDB command round-trip time', ['command'])
+
+
+class _RequestDatabaseStats(threading.local):
+    def __init__(self):
+        self.operations = 0
+        self.seconds = 0.0
+
+
+request_db_stats = _RequestDatabaseStats()
+
+
+def reset_request_db_stats() -> None:
+    request_db_stats.operations = 0
+    request_db_stats.seconds = 0.0
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """pymongo command monitoring: global per-command metrics plus per-request totals.
+
+    pymongo publishes events on the thread that issued the command, so the
+    thread-local request stats line up with the Flask request being served.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, 'success')
+
+    def failed(self, event):
+        self._record(event, 'failure')
+
+    def _record(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        mongo_commands.inc(command=event.command_name, outcome=outcome)
+        mongo_command_seconds.observe(seconds, command=event.command_name)
+        request_db_stats.operations += 1
+        request_db_stats.seconds += seconds
+
+
+def stats_collector(sources: Dict[str, Callable[[], dict]], key: str) -> Callable[[], Dict[tuple, float]]:
+    """Collect `key` from several stats() dicts, labelled by source name"""
+    def collect():
+        values = {}
+        for source, stats in sources.items():
+            value = stats().get(key)
+            if value is not None:
+                values[(source,)] = value
+        return values
+    return collect
+
+
+mongo_pool_wait_seconds = registry.histogram(
+    'registry_mongo_pool_wait_seconds', 'Time spent waiting to check a connection out of the pool')
+mongo_pool_checkouts = registry.counter(
+    'registry_mongo_pool_checkouts_total', 'Connection checkouts by outcome', ['outcome'])
+mongo_pool_connections = registry.counter(
+    'registry_mongo_pool_connections_total', 'Pool connection lifecycle events', ['event'])
+
+
+class _CheckoutStarts(threading.local):
+    def __init__(self):
+        self.started = {}  # server address -> perf_counter at check-out start
+
+
+_checkout_starts = _CheckoutStarts()
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Connection pool monitoring: checkout wait time and pool churn.
+
+    Check-out events are published on the requesting thread, so a thread-local
+    start time gives the wait (pymongo 3 events carry no durations).
+    """
+
+    def connection_check_out_started(self, event):
+        _checkout_starts.started[event.address] = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._finish(event, 'success')
+
+    def connection_check_out_failed(self, event):
+        self._finish(event, str(event.reason))
+
+    def _finish(self, event, outcome):
+        started = _checkout_starts.started.pop(event.address, None)
+        if started is not None:
+            mongo_pool_wait_seconds.observe(time.perf_counter() - started)
+        mongo_pool_checkouts.inc(outcome=outcome)
+
+    def connection_created(self, event):
+        mongo_pool_connections.inc(event='created')
+
+    def connection_closed(self, event):
+        mongo_pool_connections.inc(event='closed')
+
+    def connection_checked_in(self, event):
+        # Connections in use = checkouts_total{outcome="success"} - this
+        mongo_pool_connections.inc(event='checked_in')
+
+    def pool_cleared(self, event):
+        mongo_pool_connections.inc(event='pool_cleared')
+
+    # Remaining events are not tracked
+    def pool_created(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
@@ -1,21 +1,53 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
+from functools import lru_cache
+import glob
+import json
+import os
 import jsonschema  # For MCP schema
 
-# MCP v0 schema (simplified; fetch full from https://modelcontextprotocol.io/schema/v0/server.json)
-MCP_SERVER_SCHEMA = {
-    "type": "object",
-    "properties": {
-        "name": {"type": "string"},
-        "description": {"type": "string"},
-        "version": {"type": "string"},
-        "endpoint": {"type": "string", "format": "uri"},
-        "tools": {"type": "array", "items": {"type": "object"}},
-        "auth_methods": {"type": "array", "items": {"type": "string"}}
-    },
-    "required": ["name", "endpoint"]
-}
+# MCP server.json schemas, one file per version: schemas/<version>.json (v0.json is a
+# simplified copy of https://modelcontextprotocol.io/schema/v0/server.json). A document's
+# `$schema` selects the schema with that `$id`; others use MCP_SCHEMA_VERSION.
+SCHEMA_DIR = os.getenv('MCP_SCHEMA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas')
+DEFAULT_SCHEMA_VERSION = os.getenv('MCP_SCHEMA_VERSION', 'v0')
+
+
+def load_schemas(directory: str) -> Dict[str, dict]:
+    """Schema version (file name without .json) -> schema"""
+    schemas = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path) as f:
+            schemas[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+    return schemas
+
+
+SCHEMAS = load_schemas(SCHEMA_DIR)
+if DEFAULT_SCHEMA_VERSION not in SCHEMAS:
+    raise RuntimeError(f"MCP schema '{DEFAULT_SCHEMA_VERSION}' not found in {SCHEMA_DIR}")
+MCP_SERVER_SCHEMA = SCHEMAS[DEFAULT_SCHEMA_VERSION]
+SCHEMA_VERSIONS_BY_ID = {schema['$id']: version for version, schema in SCHEMAS.items() if '$id' in schema}
+
+
+@lru_cache(maxsize=None)
+def get_validator(version: str = DEFAULT_SCHEMA_VERSION):
+    """Validator for a schema version, built once; the schema itself is checked here, not per document"""
+    schema = SCHEMAS[version]
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def schema_version_for(metadata: dict) -> str:
+    return SCHEMA_VERSIONS_BY_ID.get(metadata.get('$schema'), DEFAULT_SCHEMA_VERSION)
+
+
+def validate_metadata(metadata: dict) -> None:
+    """Raise the same ValidationError jsonschema.validate would"""
+    error = jsonschema.exceptions.best_match(get_validator(schema_version_for(metadata)).iter_errors(metadata))
+    if error is not None:
+        raise error
 
 class Tool(BaseModel):
     name: str
@@ -29,7 +61,8 @@ class Server(BaseModel):
     endpoint: str
     tools: List[Tool]
     auth_methods: List[str]
-    owner: str  # Azure AD email
+    owner: str  # Immutable user id from the token (`<tid>:<oid>`, or `sub`); used for ownership checks
+    owner_email: Optional[str] = None  # Display only: emails can be renamed or reassigned
     team: str
     tags: Optional[List[str]] = []
     metadata: Dict[str, Any]  # Full server.json
@@ -40,7 +73,7 @@ class Server(BaseModel):
     @field_validator('metadata')
     @classmethod
     def validate_mcp_schema(cls, v):
-        jsonschema.validate(instance=v, schema=MCP_SERVER_SCHEMA)
+        validate_metadata(v)
         return v
 
     class Config:
@@ -0,0 +1,178 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+# Fields indexed for search and how much a match in each counts towards the score
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'tags': 2.0,
+    'tools.name': 2.0,
+    'description': 1.0,
+    'tools.description': 0.5,
+}
+
+# Only what the index needs when (re)building from the collection
+SEARCH_PROJECTION = {'_id': 0, 'id': 1, 'name': 1, 'description': 1, 'tags': 1, 'tools.name': 1, 'tools.description': 1}
+
+# Prefix matches rank below exact term matches
+PREFIX_PENALTY = 0.8
+# Short prefixes expand to at most this many terms, the ones in the most documents
+MAX_PREFIX_EXPANSIONS = 64
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens; `list_repos` -> ['list', 'repos']"""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _field_texts(doc: dict) -> Dict[str, List[str]]:
+    tools = doc.get('tools') or []
+    return {
+        'name': [doc.get('name') or ''],
+        'description': [doc.get('description') or ''],
+        'tags': list(doc.get('tags') or []),
+        'tools.name': [tool.get('name') or '' for tool in tools],
+        'tools.description': [tool.get('description') or '' for tool in tools],
+    }
+
+
+class InvertedIndex:
+    """In-process inverted index with prefix matching and BM25 ranking"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.built = False
+        self._postings = defaultdict(dict)  # term -> {server_id: weighted term frequency}
+        self._terms = []  # sorted vocabulary, for prefix lookups
+        self._doc_terms = {}  # server_id -> set of terms (for removal)
+        self._doc_len = {}  # server_id -> weighted document length
+        self._doc_tools = {}  # server_id -> set of tool names (for the tools filter)
+        self._total_len = 0.0
+        self._lock = threading.RLock()
+
+    def rebuild(self, docs: Iterable[dict]) -> int:
+        """Replace the index contents with `docs`; returns the number indexed"""
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._terms = []
+            self._doc_terms = {}
+            self._doc_len = {}
+            self._doc_tools = {}
+            self._total_len = 0.0
+            for doc in docs:
+                self._add(doc, sort_terms=False)
+            self._terms = sorted(self._postings)
+            self.built = True
+            return len(self._doc_len)
+
+    def invalidate(self) -> None:
+        """Mark the index stale so the owner rebuilds it from the collection"""
+        with self._lock:
+            self.built = False
+
+    def add(self, doc: dict) -> None:
+        """Index (or re-index) a single server document"""
+        with self._lock:
+            self._add(doc, sort_terms=True)
+
+    def remove(self, server_id: str) -> None:
+        with self._lock:
+            self._remove(server_id)
+
+    def _add(self, doc: dict, sort_terms: bool) -> None:
+        server_id = doc['id']
+        self._remove(server_id)
+
+        frequencies = defaultdict(float)
+        length = 0.0
+        for field, texts in _field_texts(doc).items():
+            weight = FIELD_WEIGHTS[field]
+            for text in texts:
+                for token in tokenize(text):
+                    frequencies[token] += weight
+                    length += weight
+
+        for term, tf in frequencies.items():
+            postings = self._postings[term]
+            if not postings and sort_terms:
+                self._terms.insert(bisect_left(self._terms, term), term)
+            postings[server_id] = tf
+        self._doc_terms[server_id] = set(frequencies)
+        self._doc_len[server_id] = length
+        self._doc_tools[server_id] = {tool.get('name') for tool in doc.get('tools') or []}
+        self._total_len += length
+
+    def _remove(self, server_id: str) -> None:
+        terms = self._doc_terms.pop(server_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(server_id, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect_left(self._terms, term)
+                if index < len(self._terms) and self._terms[index] == term:
+                    del self._terms[index]
+        self._total_len -= self._doc_len.pop(server_id, 0.0)
+        self._doc_tools.pop(server_id, None)
+
+    def _expand(self, token: str) -> List[str]:
+        """Vocabulary terms starting with `token` (always including the exact term)"""
+        start = bisect_left(self._terms, token)
+        expansions = self._terms[start:bisect_left(self._terms, token + '\uffff', start)]
+        if len(expansions) <= MAX_PREFIX_EXPANSIONS:
+            return expansions
+        # Too many to score: keep the exact term and the expansions in the most documents
+        exact = [token] if token in self._postings else []
+        common = heapq.nlargest(MAX_PREFIX_EXPANSIONS - len(exact), (term for term in expansions if term != token),
+                                key=lambda term: len(self._postings[term]))
+        return exact + common
+
+    def search(self, query: str, tools: Optional[List[str]] = None) -> List[str]:
+        """Server ids matching every query token (by prefix), best BM25 score first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            doc_count = len(self._doc_len)
+            if not doc_count:
+                return []
+            avg_len = self._total_len / doc_count
+
+            scores = None
+            for token in tokens:
+                token_scores = defaultdict(float)
+                for term in self._expand(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    boost = 1.0 if term == token else PREFIX_PENALTY
+                    for server_id, tf in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_len[server_id] / avg_len)
+                        token_scores[server_id] += boost * idf * tf * (self.k1 + 1) / (tf + norm)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {sid: score + token_scores[sid] for sid, score in scores.items() if sid in token_scores}
+                if not scores:
+                    return []
+
+            if tools:
+                wanted = set(tools)
+                scores = {sid: score for sid, score in scores.items() if self._doc_tools[sid] & wanted}
+            return sorted(scores, key=lambda sid: (-scores[sid], sid))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'built': self.built,
+                'documents': len(self._doc_len),
+                'terms': len(self._terms),
+            }
@@ -1,13 +1,131 @@
-import requests
 import pymongo
-from models import Server, Tool
+from importer import import_servers
+from indexes import ensure_indexes
 from dotenv import load_dotenv
 import os
-from datetime import datetime, timezone
+import random
 
 # Load environment variables
 load_dotenv()
 
+# Sample servers for testing
+SAMPLE_SERVERS = [
+    {
+        "id": "kp.internal.example/github-integration",
+        "name": "GitHub Integration",
+        "description": "Access GitHub repositories, issues, and pull requests",
+        "version": "1.0.0",
+        "endpoint": "https://github-mcp.kp.com",
+        "tools": [
+            {"name": "list_repos", "description": "List user repositories"},
+            {"name": "get_issues", "description": "Get repository issues"},
+            {"name": "create_pr", "description": "Create a pull request"}
+        ],
+        "auth_methods": ["bearer"],
+        "owner": "platform@kp.com",
+        "team": "Platform Team",
+        "tags": ["git", "development", "api"],
+        "metadata": {
+            "name": "GitHub Integration",
+            "endpoint": "https://github-mcp.kp.com",
+            "tools": [{"name": "list_repos"}, {"name": "get_issues"}],
+            "auth_methods": ["bearer"]
+        },
+        "is_public": False
+    },
+    {
+        "id": "kp.internal.example/slack-bot",
+        "name": "Slack Bot",
+        "description": "Send messages and interact with Slack channels",
+        "version": "1.2.0",
+        "endpoint": "https://slack-mcp.kp.com",
+        "tools": [
+            {"name": "send_message", "description": "Send a message to a channel"},
+            {"name": "list_channels", "description": "List available channels"},
+            {"name": "get_users", "description": "Get workspace users"}
+        ],
+        "auth_methods": ["oauth2"],
+        "owner": "communication@kp.com",
+        "team": "Communication Team",
+        "tags": ["messaging", "collaboration"],
+        "metadata": {
+            "name": "Slack Bot",
+            "endpoint": "https://slack-mcp.kp.com",
+            "tools": [{"name": "send_message"}, {"name": "list_channels"}],
+            "auth_methods": ["oauth2"]
+        },
+        "is_public": True
+    },
+    {
+        "id": "kp.internal.example/database-query",
+        "name": "Database Query Tool",
+        "description": "Execute safe database queries and retrieve data",
+        "version": "2.1.0",
+        "endpoint": "https://db-mcp.kp.com",
+        "tools": [
+            {"name": "execute_query", "description": "Execute a SELECT query"},
+            {"name": "get_schema", "description": "Get table schema information"},
+            {"name": "list_tables", "description": "List available tables"}
+        ],
+        "auth_methods": ["bearer"],
+        "owner": "data@kp.com",
+        "team": "Data Team",
+        "tags": ["database", "analytics", "query"],
+        "metadata": {
+            "name": "Database Query Tool",
+            "endpoint": "https://db-mcp.kp.com",
+            "tools": [{"name": "execute_query"}, {"name": "get_schema"}],
+            "auth_methods": ["bearer"]
+        },
+        "is_public": False
+    }
+]
+
+# Vocabulary for synthetic servers (benchmarks / load tests)
+_SYNTHETIC_DOMAINS = ['github', 'slack', 'jira', 'confluence', 'database', 'analytics', 'billing', 'search',
+                      'calendar', 'email', 'storage', 'monitoring', 'deploy', 'identity', 'docs', 'translation']
+_SYNTHETIC_VERBS = ['list', 'get', 'create', 'update', 'delete', 'search', 'send', 'query', 'export', 'sync']
+_SYNTHETIC_NOUNS = ['repos', 'issues', 'messages', 'channels', 'tables', 'reports', 'invoices', 'events',
+                    'files', 'alerts', 'users', 'pages', 'records', 'jobs', 'metrics', 'tickets']
+_SYNTHETIC_TEAMS = ['Platform Team', 'Data Team', 'Communication Team', 'Security Team', 'Finance Team']
+
+def generate_servers(count: int, start: int = 0, seed: int = 0, tools_per_server: int = 5,
+                     metadata_padding: int = 0, owner: str = 'dev@kp.com'):
+    """Yield `count` synthetic, schema-valid server documents with deterministic content"""
+    rng = random.Random(seed)
+    for number in range(start, start + count):
+        domain = _SYNTHETIC_DOMAINS[number % len(_SYNTHETIC_DOMAINS)]
+        name = f"{domain.title()} Server {number}"
+        endpoint = f"https://{domain}-{number}.mcp.kp.com"
+        tools = [
+            {"name": f"{rng.choice(_SYNTHETIC_VERBS)}_{rng.choice(_SYNTHETIC_NOUNS)}",
+             "description": f"{rng.choice(_SYNTHETIC_VERBS).title()} {domain} {rng.choice(_SYNTHETIC_NOUNS)}"}
+            for _ in range(tools_per_server)
+        ]
+        metadata = {
+            "name": name,
+            "endpoint": endpoint,
+            "tools": [{"name": tool["name"]} for tool in tools],
+            "auth_methods": ["bearer"]
+        }
+        if metadata_padding:
+            metadata["readme"] = "x" * metadata_padding
+        yield {
+            "id": f"kp.internal.bench.{domain}-{number:06d}",
+            "name": name,
+            "description": f"Synthetic {domain} integration number {number} for {rng.choice(_SYNTHETIC_NOUNS)}",
+            "version": f"{rng.randint(0, 3)}.{rng.randint(0, 9)}.{rng.randint(0, 9)}",
+            "endpoint": endpoint,
+            "tools": tools,
+            "auth_methods": ["bearer"],
+            "owner": owner,
+            "team": _SYNTHETIC_TEAMS[number % len(_SYNTHETIC_TEAMS)],
+            "tags": [domain, rng.choice(["api", "internal", "beta", "analytics"])],
+            "metadata": metadata,
+            "is_public": number % 2 == 0
+        }
+
+
 def seed_database():
     """Seed the database with sample MCP servers"""
     
@@ -26,113 +144,23 @@ def seed_database():
         print(f"❌ Error connecting to MongoDB: {e}")
         return
     
-    # Create sample servers for testing
-    sample_servers = [
-        {
-            "id": "kp.internal.example/github-integration",
-            "name": "GitHub Integration",
-            "description": "Access GitHub repositories, issues, and pull requests",
-            "version": "1.0.0",
-            "endpoint": "https://github-mcp.kp.com",
-            "tools": [
-                {"name": "list_repos", "description": "List user repositories"},
-                {"name": "get_issues", "description": "Get repository issues"},
-                {"name": "create_pr", "description": "Create a pull request"}
-            ],
-            "auth_methods": ["bearer"],
-            "owner": "platform@kp.com",
-            "team": "Platform Team",
-            "tags": ["git", "development", "api"],
-            "metadata": {
-                "name": "GitHub Integration",
-                "endpoint": "https://github-mcp.kp.com",
-                "tools": [{"name": "list_repos"}, {"name": "get_issues"}],
-                "auth_methods": ["bearer"]
-            },
-            "is_public": False
-        },
-        {
-            "id": "kp.internal.example/slack-bot",
-            "name": "Slack Bot",
-            "description": "Send messages and interact with Slack channels",
-            "version": "1.2.0",
-            "endpoint": "https://slack-mcp.kp.com",
-            "tools": [
-                {"name": "send_message", "description": "Send a message to a channel"},
-                {"name": "list_channels", "description": "List available channels"},
-                {"name": "get_users", "description": "Get workspace users"}
-            ],
-            "auth_methods": ["oauth2"],
-            "owner": "communication@kp.com",
-            "team": "Communication Team",
-            "tags": ["messaging", "collaboration"],
-            "metadata": {
-                "name": "Slack Bot",
-                "endpoint": "https://slack-mcp.kp.com",
-                "tools": [{"name": "send_message"}, {"name": "list_channels"}],
-                "auth_methods": ["oauth2"]
-            },
-            "is_public": True
-        },
-        {
-            "id": "kp.internal.example/database-query",
-            "name": "Database Query Tool",
-            "description": "Execute safe database queries and retrieve data",
-            "version": "2.1.0",
-            "endpoint": "https://db-mcp.kp.com",
-            "tools": [
-                {"name": "execute_query", "description": "Execute a SELECT query"},
-                {"name": "get_schema", "description": "Get table schema information"},
-                {"name": "list_tables", "description": "List available tables"}
-            ],
-            "auth_methods": ["bearer"],
-            "owner": "data@kp.com",
-            "team": "Data Team",
-            "tags": ["database", "analytics", "query"],
-            "metadata": {
-                "name": "Database Query Tool",
-                "endpoint": "https://db-mcp.kp.com",
-                "tools": [{"name": "execute_query"}, {"name": "get_schema"}],
-                "auth_methods": ["bearer"]
-            },
-            "is_public": False
-        }
-    ]
-    
-    # Insert sample servers
-    inserted_count = 0
-    for server_data in sample_servers:
-        try:
-            # Validate using Pydantic model
-            server = Server(**server_data)
-            
-            # Check if server already exists
-            existing = servers_collection.find_one({'id': server.id})
-            if existing:
-                print(f"⚠️  Server {server.id} already exists, skipping")
-                continue
-            
-            # Insert into database
-            servers_collection.insert_one(server.model_dump())
-            print(f"✅ Inserted server: {server.id}")
-            inserted_count += 1
-            
-        except Exception as e:
-            print(f"❌ Error inserting server {server_data.get('id', 'unknown')}: {e}")
+    # Insert sample servers (existing ids are left untouched)
+    def report(position, stats, errors):
+        for source, error in errors:
+            print(f"❌ Error inserting server {source}: {error}")
+
+    records = ((server_data.get('id', 'unknown'), server_data) for server_data in SAMPLE_SERVERS)
+    stats = import_servers(db, records, skip_existing=True, actor='seed', on_chunk=report)
+    if stats['existing']:
+        print(f"⚠️  {stats['existing']} servers already exist, skipped")
     
-    # Create text indexes for search functionality
-    try:
-        servers_collection.create_index([
-            ("name", "text"), 
-            ("description", "text"), 
-            ("tools.name", "text"),
-            ("tags", "text")
-        ])
-        print("✅ Created text search indexes")
-    except Exception as e:
-        print(f"⚠️  Warning: Could not create indexes: {e}")
+    # Create the indexes the API relies on (including text search, where supported)
+    for result in ensure_indexes(db):
+        if result['status'] == 'failed':
+            print(f"⚠️  Warning: Could not create index on {result['collection']} {result['keys']}: {result['error']}")
+    print("✅ Ensured indexes")
     
-    print(f"\n🎉 Seeding completed! Inserted {inserted_count} new servers")
+    print(f"\n🎉 Seeding completed! Inserted {stats['imported']} new servers")
     print(f"Total servers in database: {servers_collection.count_documents({})}")
 
 if __name__ == "__main__":
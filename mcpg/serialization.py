@@ -0,0 +1,78 @@
+"""
+JSON encoding for API responses.
+
+Uses orjson when installed (the `fast-json` extra) and the standard library otherwise.
+Both produce the same bytes: compact, keys sorted, UTF-8, and datetimes as RFC 3339
+in UTC with a `Z` suffix (naive datetimes from MongoDB are UTC). JSON_ENCODER=json
+forces the standard library.
+"""
+
+import dataclasses
+import decimal
+import json
+import os
+import uuid
+from datetime import date, datetime, timezone
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto').lower()
+
+
+def _default(value):
+    """Types neither encoder handles natively (and, for the stdlib, datetimes)"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        text = value.isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None and JSON_ENCODER in ('auto', 'orjson'):
+    ENCODER = 'orjson'
+    _ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    if JSON_ENCODER == 'orjson':
+        raise RuntimeError("JSON_ENCODER=orjson but orjson is not installed")
+    ENCODER = 'json'
+    _encoder = json.JSONEncoder(sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=_default)
+
+    def dumps(obj) -> bytes:
+        return _encoder.encode(obj).encode('utf-8')
+
+
+def dumps_body(obj) -> bytes:
+    """A complete response body (newline-terminated, like jsonify)"""
+    return dumps(obj) + b'\n'
+
+
+class RegistryJSONProvider(DefaultJSONProvider):
+    """Flask/Quart JSON provider that encodes with `dumps`; request parsing is unchanged"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        return self._app.response_class(dumps_body(self._prepare_response_obj(args, kwargs)), mimetype=self.mimetype)
+
+
+def json_response(app, body: bytes, status: int = 200):
+    """Response for an already encoded body"""
+    return app.response_class(body, status=status, mimetype=app.json.mimetype)
@@ -0,0 +1,194 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from logs import get_logger
+
+log = get_logger('sync')
+
+# Called with (server_id, deleted). server_id is None when a change could not be
+# attributed to a single server and all local state should be dropped.
+ChangeListener = Callable[[Optional[str], bool], None]
+
+# Change stream errors after which the resume tokens are useless (ChangeStreamHistoryLost,
+# ChangeStreamFatalError, InvalidResumeToken): the streams are reopened from now instead
+RESUME_TOKEN_LOST_CODES = {286, 280, 260}
+MAX_RECONNECT_DELAY = 30.0
+
+
+class ChangeSync:
+    """Background thread that feeds registry writes from any worker into local listeners.
+
+    Tails a MongoDB change stream on the servers collection when the deployment
+    supports it; otherwise (Cosmos DB without change streams, mongomock, standalone
+    mongod) it polls `updated_at` on servers and `deleted_at` on tombstones. A stream
+    that fails once open (network error, failover) is reopened with backoff, resuming
+    where it left off when its resume token is still valid.
+    """
+
+    def __init__(self, servers_collection, tombstones_collection, mode: str = 'auto',
+                 poll_interval: float = 2.0, poll_overlap: float = 5.0, reconnect_delay: float = 1.0):
+        self.servers_collection = servers_collection
+        self.tombstones_collection = tombstones_collection
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.poll_overlap = poll_overlap
+        self.reconnect_delay = reconnect_delay
+        self.listeners = []
+        self.active_mode = None
+        # Polling starts from here, so a worker forked long after this object was created
+        # (a pre-forked server recycling workers) still sees every write since then
+        self.created_at = datetime.now(timezone.utc)
+        self.events = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.connected = False  # Stream open, or last poll succeeded
+        self.last_error = None
+        self._resume_tokens = {}  # collection name -> resume token
+        self._pid = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def add_listener(self, listener: ChangeListener) -> None:
+        self.listeners.append(listener)
+
+    def ensure_started(self) -> None:
+        """Start the sync thread once per process (threads do not survive fork)"""
+        if self.mode == 'off' or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='registry-sync', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _notify(self, server_id: Optional[str], deleted: bool = False) -> None:
+        self.events += 1
+        for listener in self.listeners:
+            try:
+                listener(server_id, deleted)
+            except Exception as e:
+                self.errors += 1
+                log.warning("Sync listener failed for %s: %s", server_id, e)
+
+    def _run(self) -> None:
+        if self.mode in ('auto', 'changestream'):
+            delay = self.reconnect_delay / 2  # Doubled before the first wait
+            while not self._stop.is_set():
+                try:
+                    self._tail_change_stream()
+                except Exception as e:
+                    was_connected, self.connected = self.connected, False
+                    self.last_error = str(e)
+                    if self.mode == 'auto' and self.active_mode is None:
+                        log.info("Change streams not available, polling for changes instead: %s", e)
+                        break
+                    self.errors += 1
+                    if getattr(e, 'code', None) in RESUME_TOKEN_LOST_CODES:
+                        self._resume_tokens = {}
+                    delay = self.reconnect_delay if was_connected else min(delay * 2, MAX_RECONNECT_DELAY)
+                    log.warning("Change stream failed, reopening in %.1fs: %s", delay, e)
+                    if self._stop.wait(delay):
+                        return
+                    self.reconnects += 1
+            if self._stop.is_set():
+                return
+        self._poll()
+
+    def _tail_change_stream(self) -> None:
+        tokens = self._resume_tokens
+        # Server deletes only carry the ObjectId, so deletions are read from the tombstone
+        # inserted alongside each one, which names the server
+        with self.servers_collection.watch(full_document='updateLookup',
+                                           resume_after=tokens.get('servers')) as stream, \
+                self.tombstones_collection.watch([{'$match': {'operationType': 'insert'}}],
+                                                 resume_after=tokens.get('tombstones')) as deletes:
+            self.active_mode = 'changestream'
+            self.connected = True
+            if not (tokens.get('servers') and tokens.get('tombstones')):
+                # Anything written before the streams opened (or since they failed) is unaccounted for
+                self._notify(None)
+            while not self._stop.is_set():
+                change = stream.try_next()
+                tombstone = deletes.try_next()
+                self._resume_tokens = {'servers': stream.resume_token, 'tombstones': deletes.resume_token}
+                if change is None and tombstone is None:
+                    self._stop.wait(0.1)
+                    continue
+                if tombstone is not None:
+                    server_id = (tombstone.get('fullDocument') or {}).get('id')
+                    if server_id:
+                        self._notify(server_id, deleted=True)
+                if change is not None:
+                    self._apply_server_change(change)
+
+    def _apply_server_change(self, change: dict) -> None:
+        operation = change.get('operationType')
+        document = change.get('fullDocument') or {}
+        if operation in ('insert', 'replace', 'update') and document.get('id'):
+            self._notify(document['id'])
+        elif operation != 'delete':
+            # Drops, renames and invalidations affect everything
+            self._notify(None)
+
+    def _poll(self) -> None:
+        self.active_mode = 'poll'
+        watermark = self.created_at
+        recently_seen = {}  # (kind, server_id, timestamp) -> timestamp, to skip overlap re-reads
+        while not self._stop.wait(self.poll_interval):
+            # Re-read a window before the watermark to tolerate clock skew between workers
+            since = watermark - timedelta(seconds=self.poll_overlap)
+            try:
+                changes = [
+                    ('upsert', doc.get('id'), doc.get('updated_at'))
+                    for doc in self.servers_collection.find(
+                        {'updated_at': {'$gt': since}}, {'_id': 0, 'id': 1, 'updated_at': 1})
+                ]
+                changes += [
+                    ('delete', tombstone.get('id'), tombstone.get('deleted_at'))
+                    for tombstone in self.tombstones_collection.find(
+                        {'deleted_at': {'$gt': since}}, {'_id': 0, 'id': 1, 'deleted_at': 1})
+                ]
+            except Exception as e:
+                self.errors += 1
+                self.connected = False
+                self.last_error = str(e)
+                log.warning("Sync poll failed: %s", e)
+                continue
+            self.connected = True
+
+            for kind, server_id, timestamp in changes:
+                if timestamp is None or server_id is None:
+                    continue
+                if timestamp.tzinfo is None:
+                    timestamp = timestamp.replace(tzinfo=timezone.utc)
+                key = (kind, server_id, timestamp)
+                if key in recently_seen:
+                    continue
+                recently_seen[key] = timestamp
+                watermark = max(watermark, timestamp)
+                self._notify(server_id, deleted=kind == 'delete')
+
+            cutoff = watermark - timedelta(seconds=self.poll_overlap)
+            recently_seen = {key: ts for key, ts in recently_seen.items() if ts > cutoff}
+
+    def stats(self) -> dict:
+        return {
+            'mode': self.mode,
+            'active_mode': self.active_mode,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'connected': self.connected,
+            'events': self.events,
+            'errors': self.errors,
+            'reconnects': self.reconnects,
+            'last_error': self.last_error,
+        }
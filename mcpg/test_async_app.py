@@ -0,0 +1,40 @@
+"""ASGI serving mode (async_app.py) against the same in-memory database"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('quart')
+
+from search import InvertedIndex  # noqa: E402
+
+
+def run(*requests):
+    """Issue (path, headers) requests in order against async_app; returns the responses"""
+    import async_app
+
+    async def main():
+        responses = []
+        async with async_app.async_app.test_app() as test_app:
+            client = test_app.test_client()
+            for path, headers in requests:
+                responses.append(await client.get(path, headers=headers))
+        return responses
+    return asyncio.run(main())
+
+
+def test_list_revalidates_with_registry_version_etag(registry_app, publish):
+    publish('kp.internal.async1')
+    first, = run(('/v0/servers', {}))
+    assert first.status_code == 200
+    second, = run(('/v0/servers', {'If-None-Match': first.headers['ETag']}))
+    assert second.status_code == 304
+
+
+def test_memory_search_revalidates_with_hashed_etag(registry_app, publish, monkeypatch):
+    monkeypatch.setattr(registry_app, 'search_index', InvertedIndex())
+    publish('kp.internal.async2')
+    first, = run(('/v0/servers?q=github', {}))
+    assert first.status_code == 200
+    second, = run(('/v0/servers?q=github', {'If-None-Match': first.headers['ETag']}))
+    assert second.status_code == 304
@@ -0,0 +1,156 @@
+"""Signing key cache and token validation (auth_cache.py) with a file:// JWKS"""
+
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import auth_cache
+from auth_cache import JWKSCache, TokenValidator
+from conftest import make_server
+
+ISSUER = 'https://login.example.com/tenant/v2.0'
+
+
+@pytest.fixture(scope='module')
+def signing_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def jwks_uri(tmp_path, signing_key):
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(signing_key.public_key()))
+    path = tmp_path / 'keys.json'
+    path.write_text(json.dumps({'keys': [dict(jwk, kid='key1', use='sig', alg='RS256')]}))
+    return path.as_uri()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def make_token(signing_key, kid='key1', **claims):
+    claims = {'iss': ISSUER, 'exp': int(time.time()) + 600, **claims}
+    return jwt.encode(claims, signing_key, algorithm='RS256', headers={'kid': kid})
+
+
+def test_valid_token_is_verified_once_then_cached(jwks_uri, signing_key, monkeypatch):
+    validator = TokenValidator(JWKSCache(jwks_uri), issuer=ISSUER, audience=None)
+    token = make_token(signing_key, oid='oid-1', preferred_username='a@kp.com')
+    assert validator.validate(token).email == 'a@kp.com'
+    monkeypatch.setattr(jwt, 'decode', lambda *args, **kwargs: pytest.fail('not served from cache'))
+    assert validator.validate(token).email == 'a@kp.com'
+    assert validator.jwks.fetches == 1
+
+
+def test_unknown_key_id_refetches_at_most_once_per_interval(jwks_uri, signing_key, clock):
+    jwks = JWKSCache(jwks_uri, min_refresh_interval=60)
+    jwks.get_signing_key('key1')
+    for _ in range(3):
+        with pytest.raises(jwt.InvalidTokenError):
+            jwks.get_signing_key('rotated')
+    assert jwks.fetches == 1
+    clock[0] += 61
+    with pytest.raises(jwt.InvalidTokenError):
+        jwks.get_signing_key('rotated')
+    assert jwks.fetches == 2
+
+
+def test_failed_first_fetch_is_not_retried_on_every_request(tmp_path, clock):
+    jwks = JWKSCache((tmp_path / 'missing.json').as_uri(), min_refresh_interval=60)
+    for _ in range(5):
+        with pytest.raises(jwt.PyJWKClientError):
+            jwks.get_signing_key('key1')
+    assert jwks.failures == 1
+    clock[0] += 61
+    with pytest.raises(jwt.PyJWKClientError):
+        jwks.get_signing_key('key1')
+    assert jwks.failures == 2
+
+
+def test_failed_refresh_keeps_previous_keys(jwks_uri, clock, monkeypatch):
+    jwks = JWKSCache(jwks_uri, ttl=10, min_refresh_interval=60)
+    jwks.get_signing_key('key1')
+
+    def unreachable():
+        raise OSError('provider down')
+    monkeypatch.setattr(jwks, '_fetch', unreachable)
+    clock[0] += 11
+    assert jwks.get_signing_key('key1').key_id == 'key1'
+    assert jwks.get_signing_key('key1').key_id == 'key1'
+    assert jwks.failures == 1
+
+
+@pytest.mark.parametrize('claims', [{'iss': 'https://evil.example.com'}, {'exp': int(time.time()) - 3600}])
+def test_invalid_claims_are_rejected(jwks_uri, signing_key, claims):
+    validator = TokenValidator(JWKSCache(jwks_uri), issuer=ISSUER, audience=None)
+    with pytest.raises(jwt.PyJWTError):
+        validator.validate(make_token(signing_key, oid='oid-1', **claims))
+
+
+@pytest.fixture
+def production_auth(registry_app, jwks_uri, monkeypatch):
+    """The app with DEV_MODE off, verifying tokens against the test JWKS"""
+    monkeypatch.setattr(registry_app, 'DEV_MODE', False)
+    monkeypatch.setattr(registry_app, 'token_validator',
+                        TokenValidator(JWKSCache(jwks_uri), issuer=ISSUER, audience=None))
+    return registry_app
+
+
+def test_token_exchange(production_auth, client, signing_key):
+    token = make_token(signing_key, oid='oid-1', preferred_username='a@kp.com')
+    response = client.post('/auth/token', json={'id_token': token})
+    assert response.status_code == 200
+    assert response.get_json()['user_email'] == 'a@kp.com'
+    forged = make_token(rsa.generate_private_key(public_exponent=65537, key_size=2048), oid='oid-1')
+    assert client.post('/auth/token', json={'id_token': forged}).status_code == 401
+
+
+@pytest.mark.parametrize('body', [{'id_token': 123}, {'id_token': ['a', 'b']}, {'id_token': {'a': 1}}, ['id_token']])
+def test_token_exchange_rejects_malformed_bodies(production_auth, client, body):
+    assert client.post('/auth/token', json=body).status_code == 400
+
+
+@pytest.mark.parametrize('claims, user_id', [
+    ({'tid': 'tenant', 'oid': 'oid-1', 'sub': 'pairwise'}, 'tenant:oid-1'),
+    ({'oid': 'oid-1', 'sub': 'pairwise'}, 'oid-1'),
+    ({'sub': 'pairwise'}, 'pairwise'),
+])
+def test_user_id_comes_from_immutable_claims(jwks_uri, signing_key, claims, user_id):
+    validator = TokenValidator(JWKSCache(jwks_uri), issuer=ISSUER, audience=None)
+    identity = validator.validate(make_token(signing_key, upn='a@kp.com', **claims))
+    assert (identity.user_id, identity.email) == (user_id, 'a@kp.com')
+
+
+def test_token_without_user_id_is_rejected(jwks_uri, signing_key):
+    validator = TokenValidator(JWKSCache(jwks_uri), issuer=ISSUER, audience=None)
+    with pytest.raises(jwt.InvalidTokenError):
+        validator.validate(make_token(signing_key, preferred_username='a@kp.com'))
+
+
+def test_ownership_follows_the_object_id_not_the_email(production_auth, client, signing_key):
+    def login(oid, email):
+        token = make_token(signing_key, tid='tenant', oid=oid, preferred_username=email)
+        access_token = client.post('/auth/token', json={'id_token': token}).get_json()['access_token']
+        return {'Authorization': f'Bearer {access_token}'}
+
+    owner = login('oid-1', 'a@kp.com')
+    assert client.post('/v0/servers', json=make_server('kp.internal.own1'), headers=owner).status_code == 201
+    server = client.get('/v0/servers/kp.internal.own1').get_json()
+    assert (server['owner'], server['owner_email']) == ('tenant:oid-1', 'a@kp.com')
+
+    # The email was reassigned to someone else
+    newcomer = login('oid-2', 'a@kp.com')
+    assert client.put('/v0/servers/kp.internal.own1', json={'name': 'Taken'}, headers=newcomer).status_code == 403
+    assert client.delete('/v0/servers/kp.internal.own1', headers=newcomer).status_code == 403
+    # The owner was renamed
+    renamed = login('oid-1', 'a.renamed@kp.com')
+    update = {'name': 'Still mine', 'owner': 'tenant:oid-2', 'owner_email': 'x@kp.com'}
+    assert client.put('/v0/servers/kp.internal.own1', json=update, headers=renamed).status_code == 200
+    server = client.get('/v0/servers/kp.internal.own1').get_json()
+    assert (server['name'], server['owner'], server['owner_email']) == ('Still mine', 'tenant:oid-1', 'a.renamed@kp.com')
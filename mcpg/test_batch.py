@@ -0,0 +1,59 @@
+"""Batch publish: per-item results and partial success"""
+
+import pytest
+
+from conftest import make_server
+
+
+def publish_batch(client, auth_headers, servers):
+    return client.post('/v0/servers:batch', json={'servers': servers}, headers=auth_headers)
+
+
+def test_batch_all_valid_returns_201(client, auth_headers):
+    servers = [make_server('kp.internal.batch1'), make_server('kp.internal.batch2')]
+    response = publish_batch(client, auth_headers, servers)
+    assert response.status_code == 201
+    assert response.get_json()['published'] == 2
+    assert client.get('/v0/servers/kp.internal.batch2').status_code == 200
+
+
+def test_batch_partial_failure_returns_207_with_per_item_results(registry_app, client, auth_headers):
+    response = publish_batch(client, auth_headers, [
+        make_server('kp.internal.batch3'),
+        make_server('kp.internal.batch4', version=None),
+        make_server('bad.namespace.batch5'),
+        make_server('kp.internal.batch3', name='Second copy'),
+        'not an object',
+    ])
+    assert response.status_code == 207
+    data = response.get_json()
+    assert (data['published'], data['failed']) == (1, 4)
+    assert [(result['id'], result['status']) for result in data['results']] == [
+        ('kp.internal.batch3', 201), ('kp.internal.batch4', 400), ('bad.namespace.batch5', 403),
+        ('kp.internal.batch3', 409), (None, 400),
+    ]
+    assert registry_app.servers_collection.count_documents({}) == 1
+    # The first copy of a duplicate id wins
+    assert client.get('/v0/servers/kp.internal.batch3').get_json()['name'] == 'Server kp.internal.batch3'
+
+
+def test_batch_publish_is_visible_in_lists_and_clears_tombstones(registry_app, client, auth_headers, publish):
+    publish('kp.internal.batch6')
+    assert client.delete('/v0/servers/kp.internal.batch6', headers=auth_headers).status_code == 200
+    client.get('/v0/servers')  # Warm the count cache
+    assert publish_batch(client, auth_headers, [make_server('kp.internal.batch6')]).status_code == 201
+    data = client.get('/v0/servers').get_json()
+    assert [server['id'] for server in data['servers']] == ['kp.internal.batch6']
+    assert data['total'] == 1
+    assert registry_app.tombstones_collection.count_documents({'id': 'kp.internal.batch6'}) == 0
+
+
+@pytest.mark.parametrize('body', [[], {'servers': []}, {'servers': 'nope'}])
+def test_batch_rejects_empty_or_malformed_body(client, auth_headers, body):
+    assert client.post('/v0/servers:batch', json=body, headers=auth_headers).status_code == 400
+
+
+def test_batch_rejects_oversized_batch(registry_app, client, auth_headers, monkeypatch):
+    monkeypatch.setattr(registry_app, 'MAX_BATCH_SIZE', 2)
+    servers = [make_server(f'kp.internal.big{number}') for number in range(3)]
+    assert publish_batch(client, auth_headers, servers).status_code == 413
@@ -0,0 +1,52 @@
+"""Read-through server cache: invalidation on local and remote writes"""
+
+import cache as cache_module
+from cache import TTLCache
+
+
+def test_get_is_served_from_cache(registry_app, client, publish):
+    assert publish('kp.internal.cache1').status_code == 201
+    assert client.get('/v0/servers/kp.internal.cache1').status_code == 200
+    # Change the document behind the cache's back: the cached copy is still served
+    registry_app.servers_collection.update_one({'id': 'kp.internal.cache1'}, {'$set': {'name': 'Changed'}})
+    assert client.get('/v0/servers/kp.internal.cache1').get_json()['name'] == 'Server kp.internal.cache1'
+
+
+def test_update_refreshes_cached_server(client, publish, auth_headers):
+    publish('kp.internal.cache2')
+    client.get('/v0/servers/kp.internal.cache2')
+    response = client.put('/v0/servers/kp.internal.cache2', json={'name': 'Renamed'}, headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get('/v0/servers/kp.internal.cache2').get_json()['name'] == 'Renamed'
+
+
+def test_delete_drops_cached_server(client, publish, auth_headers):
+    publish('kp.internal.cache3')
+    client.get('/v0/servers/kp.internal.cache3')
+    assert client.delete('/v0/servers/kp.internal.cache3', headers=auth_headers).status_code == 200
+    assert client.get('/v0/servers/kp.internal.cache3').status_code == 404
+
+
+def test_remote_change_invalidates_cached_server(registry_app, client, publish):
+    publish('kp.internal.cache4')
+    client.get('/v0/servers/kp.internal.cache4')
+    # Another worker's write, as delivered by the background sync
+    registry_app.servers_collection.update_one({'id': 'kp.internal.cache4'}, {'$set': {'name': 'Remote'}})
+    registry_app.apply_remote_change('kp.internal.cache4', False)
+    assert client.get('/v0/servers/kp.internal.cache4').get_json()['name'] == 'Remote'
+    registry_app.servers_collection.delete_one({'id': 'kp.internal.cache4'})
+    registry_app.apply_remote_change('kp.internal.cache4', True)
+    assert client.get('/v0/servers/kp.internal.cache4').status_code == 404
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    cache = TTLCache(max_size=2, ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)  # Evicts the least recently used entry
+    assert cache.get('b') is None and cache.get('a') == 1
+    now[0] = 11
+    assert cache.get('a') is None
@@ -0,0 +1,75 @@
+"""Delta sync feed: ordering, tombstones and sequence gaps"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+def read_feed(client, **params):
+    """Every change from following next_token until has_more is false, and the last token"""
+    changes = []
+    while True:
+        data = client.get('/v0/servers/changes', query_string=params).get_json()
+        changes += data['changes']
+        params['since'] = data['next_token']
+        if not data['has_more']:
+            return changes, data['next_token']
+
+
+def summary(changes):
+    return [(change['type'], change['id']) for change in changes]
+
+
+def test_feed_pages_through_writes_in_order(client, publish):
+    for number in range(5):
+        publish(f'kp.internal.feed{number}')
+    changes, _ = read_feed(client, limit=2)
+    assert summary(changes) == [('upsert', f'kp.internal.feed{number}') for number in range(5)]
+    assert [change['sync_seq'] for change in changes] == [1, 2, 3, 4, 5]
+    assert all('sync_seq' not in change['server'] and '_id' not in change['server'] for change in changes)
+
+
+def test_feed_resumes_from_token_with_updates_and_deletes(client, publish, auth_headers):
+    publish('kp.internal.feed1')
+    publish('kp.internal.feed2')
+    _, token = read_feed(client)
+    client.delete('/v0/servers/kp.internal.feed1', headers=auth_headers)
+    client.put('/v0/servers/kp.internal.feed2', json={'name': 'Renamed'}, headers=auth_headers)
+    changes, token = read_feed(client, since=token)
+    assert summary(changes) == [('delete', 'kp.internal.feed1'), ('upsert', 'kp.internal.feed2')]
+    assert 'server' not in changes[0] and changes[1]['server']['name'] == 'Renamed'
+    assert read_feed(client, since=token)[0] == []
+
+
+def test_feed_projection_keeps_bodies_small(client, publish):
+    publish('kp.internal.feed1')
+    changes, _ = read_feed(client, fields='name')
+    # updated_at is always read: the gap check needs it
+    assert set(changes[0]['server']) == {'id', 'name', 'updated_at'}
+
+
+def test_feed_waits_at_a_recent_gap(registry_app, client, publish):
+    publish('kp.internal.feed1')
+    registry_app.next_sync_seq()  # A write that reserved seq 2 and has not committed yet
+    publish('kp.internal.feed3')
+    changes, token = read_feed(client)
+    assert summary(changes) == [('upsert', 'kp.internal.feed1')]
+    # Once the write after the gap is older than CHANGES_GAP_TIMEOUT the gap is skipped
+    old = datetime.now(timezone.utc) - timedelta(seconds=registry_app.CHANGES_GAP_TIMEOUT + 1)
+    registry_app.servers_collection.update_one({'id': 'kp.internal.feed3'}, {'$set': {'updated_at': old}})
+    changes, _ = read_feed(client, since=token)
+    assert summary(changes) == [('upsert', 'kp.internal.feed3')]
+
+
+def test_feed_does_not_wait_for_overwritten_sequence_numbers(registry_app, client, publish, monkeypatch):
+    monkeypatch.setattr(registry_app, 'CHANGES_GAP_TIMEOUT', 0)
+    publish('kp.internal.feed1')
+    publish('kp.internal.feed1', name='Republished')  # Seq 1 is superseded by seq 2
+    changes, _ = read_feed(client)
+    assert summary(changes) == [('upsert', 'kp.internal.feed1')]
+    assert changes[0]['server']['name'] == 'Republished'
+
+
+@pytest.mark.parametrize('since', ['garbage', 'eyJzZXEiOiAiMSJ9'])
+def test_feed_rejects_invalid_tokens(client, since):
+    assert client.get('/v0/servers/changes', query_string={'since': since}).status_code == 400
@@ -0,0 +1,73 @@
+"""ETag / Last-Modified validators and 304 responses"""
+
+import pytest
+
+
+def revalidate(client, path, etag):
+    return client.get(path, headers={'If-None-Match': etag})
+
+
+def test_server_get_revalidates_until_it_changes(client, publish, auth_headers):
+    publish('kp.internal.etag1')
+    first = client.get('/v0/servers/kp.internal.etag1')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Last-Modified']
+    not_modified = client.get('/v0/servers/kp.internal.etag1', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not_modified.get_data() == b''
+    assert not_modified.headers['ETag'] == etag
+
+    client.put('/v0/servers/kp.internal.etag1', json={'name': 'Renamed'}, headers=auth_headers)
+    changed = client.get('/v0/servers/kp.internal.etag1', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+def test_weak_and_listed_etags_match(client, publish):
+    publish('kp.internal.etag2')
+    etag = client.get('/v0/servers/kp.internal.etag2').headers['ETag']
+    assert etag.startswith('W/"')
+    etag = etag[2:].strip('"')
+    assert revalidate(client, '/v0/servers/kp.internal.etag2', f'W/"{etag}"').status_code == 304
+    assert revalidate(client, '/v0/servers/kp.internal.etag2', f'"{etag}"').status_code == 304
+    assert revalidate(client, '/v0/servers/kp.internal.etag2', f'"other", "{etag}"').status_code == 304
+    assert revalidate(client, '/v0/servers/kp.internal.etag2', '"other"').status_code == 200
+
+
+def test_if_modified_since(client, publish):
+    publish('kp.internal.etag3')
+    last_modified = client.get('/v0/servers/kp.internal.etag3').headers['Last-Modified']
+    response = client.get('/v0/servers/kp.internal.etag3', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+    long_ago = 'Mon, 01 Jan 2001 00:00:00 GMT'
+    response = client.get('/v0/servers/kp.internal.etag3', headers={'If-Modified-Since': long_ago})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('query', ['', '?limit=5', '?q=github'])
+def test_list_etag_changes_after_any_write(client, publish, auth_headers, query):
+    publish('kp.internal.etag4')
+    etag = client.get(f'/v0/servers{query}').headers['ETag']
+    assert revalidate(client, f'/v0/servers{query}', etag).status_code == 304
+    publish('kp.internal.etag5')
+    response = revalidate(client, f'/v0/servers{query}', etag)
+    assert response.status_code == 200
+    assert 'kp.internal.etag5' in [server['id'] for server in response.get_json()['servers']]
+    # Deletes bump the registry version too
+    etag = response.headers['ETag']
+    client.delete('/v0/servers/kp.internal.etag5', headers=auth_headers)
+    assert revalidate(client, f'/v0/servers{query}', etag).status_code == 200
+
+
+def test_list_etag_depends_on_the_query(client, publish):
+    publish('kp.internal.etag6')
+    assert client.get('/v0/servers?limit=5').headers['ETag'] != client.get('/v0/servers?limit=6').headers['ETag']
+
+
+def test_tool_lookup_etag_hashes_the_body(client, publish, auth_headers):
+    publish('kp.internal.etag7')
+    first = client.get('/v0/tools?q=list_repos&match=exact')
+    assert revalidate(client, '/v0/tools?q=list_repos&match=exact', first.headers['ETag']).status_code == 304
+    # A write that does not touch this lookup's results keeps its ETag
+    publish('kp.internal.etag8', tools=[{'name': 'send_message', 'description': 'Send a message'}])
+    assert revalidate(client, '/v0/tools?q=list_repos&match=exact', first.headers['ETag']).status_code == 304
+    client.delete('/v0/servers/kp.internal.etag7', headers=auth_headers)
+    assert revalidate(client, '/v0/tools?q=list_repos&match=exact', first.headers['ETag']).status_code == 200
@@ -0,0 +1,53 @@
+"""Bulk import: upserts, skip_existing and the changes feed"""
+
+from conftest import make_server
+from importer import import_servers
+
+OWNER = 'dev@kp.com'  # The dev-mode token identity, so API writes are allowed too
+
+
+def records(*server_ids, **overrides):
+    return [(f'test.ndjson:{line}', make_server(server_id, **overrides))
+            for line, server_id in enumerate(server_ids, 1)]
+
+
+def feed(client):
+    data = client.get('/v0/servers/changes', query_string={'limit': 100}).get_json()
+    return [(change['sync_seq'], change['id']) for change in data['changes']]
+
+
+def test_import_replaces_existing_servers(registry_app, client):
+    stats = import_servers(registry_app.db, records('kp.internal.imp1', 'kp.internal.imp2'), owner=OWNER)
+    assert (stats['imported'], stats['existing']) == (2, 0)
+    stats = import_servers(registry_app.db, records('kp.internal.imp1', name='Reimported'), owner=OWNER)
+    assert stats['imported'] == 1
+    assert client.get('/v0/servers/kp.internal.imp1').get_json()['name'] == 'Reimported'
+
+
+def test_skip_existing_keeps_servers_and_leaves_no_sequence_gaps(registry_app, client):
+    import_servers(registry_app.db, records('kp.internal.imp1', 'kp.internal.imp2', 'kp.internal.imp3'), owner=OWNER)
+    stats = import_servers(registry_app.db, records('kp.internal.imp1', 'kp.internal.imp2', 'kp.internal.imp3',
+                                                    'kp.internal.imp4', 'kp.internal.imp5', name='Second import'),
+                           owner=OWNER, skip_existing=True)
+    assert (stats['imported'], stats['existing'], stats['failed']) == (2, 3, 0)
+    assert client.get('/v0/servers/kp.internal.imp1').get_json()['name'] == 'Server kp.internal.imp1'
+    # Every reserved sequence number was used, so the feed does not wait at a gap
+    assert feed(client) == [(1, 'kp.internal.imp1'), (2, 'kp.internal.imp2'), (3, 'kp.internal.imp3'),
+                            (4, 'kp.internal.imp4'), (5, 'kp.internal.imp5')]
+
+
+def test_skip_existing_with_nothing_new_reserves_nothing(registry_app, client, publish):
+    publish('kp.internal.imp1')
+    stats = import_servers(registry_app.db, records('kp.internal.imp1'), owner=OWNER, skip_existing=True)
+    assert (stats['imported'], stats['existing']) == (0, 1)
+    publish('kp.internal.imp2')
+    assert feed(client) == [(1, 'kp.internal.imp1'), (2, 'kp.internal.imp2')]
+
+
+def test_import_invalidates_list_etags_and_clears_tombstones(registry_app, client, publish, auth_headers):
+    publish('kp.internal.imp1')
+    client.delete('/v0/servers/kp.internal.imp1', headers=auth_headers)
+    etag = client.get('/v0/servers').headers['ETag']
+    import_servers(registry_app.db, records('kp.internal.imp1'), owner=OWNER, skip_existing=True)
+    assert client.get('/v0/servers', headers={'If-None-Match': etag}).status_code == 200
+    assert registry_app.tombstones_collection.count_documents({}) == 0
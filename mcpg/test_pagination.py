@@ -0,0 +1,66 @@
+"""Keyset cursor pagination and list parameter validation"""
+
+import pytest
+
+
+@pytest.fixture
+def servers(publish):
+    ids = [f'kp.internal.page{number:02d}' for number in range(7)]
+    for server_id in reversed(ids):
+        assert publish(server_id).status_code == 201
+    return ids
+
+
+def walk(client, **params):
+    """All ids from following next_cursor, and the page sizes seen"""
+    seen, sizes = [], []
+    while True:
+        data = client.get('/v0/servers', query_string=params).get_json()
+        seen += [server['id'] for server in data['servers']]
+        sizes.append(len(data['servers']))
+        if not data['next_cursor']:
+            return seen, sizes
+        params['cursor'] = data['next_cursor']
+
+
+def test_cursor_walk_returns_every_server_once_in_id_order(client, servers):
+    seen, sizes = walk(client, limit=3)
+    assert seen == servers
+    assert sizes == [3, 3, 1]
+
+
+def test_cursor_walk_with_exact_page_size_ends_without_empty_page(client, servers):
+    seen, sizes = walk(client, limit=7)
+    assert seen == servers
+    assert sizes == [7]
+
+
+def test_cursor_walk_sees_servers_published_mid_walk(client, servers, publish):
+    first = client.get('/v0/servers', query_string={'limit': 3}).get_json()
+    publish('kp.internal.page99')
+    seen, _ = walk(client, limit=3, cursor=first['next_cursor'])
+    assert seen == servers[3:] + ['kp.internal.page99']
+
+
+def test_id_prefix_walk_includes_the_prefix_itself(client, servers, publish):
+    publish('kp.internal.page0')
+    seen, _ = walk(client, limit=2, id_prefix='kp.internal.page0')
+    assert seen == ['kp.internal.page0'] + servers
+
+
+def test_offset_still_supported(client, servers):
+    data = client.get('/v0/servers', query_string={'limit': 2, 'offset': 5}).get_json()
+    assert [server['id'] for server in data['servers']] == servers[5:]
+    assert data['total'] == 7
+
+
+@pytest.mark.parametrize('params', [
+    {'limit': 0}, {'limit': -1}, {'limit': 'ten'}, {'offset': -1}, {'cursor': 'not-a-cursor'},
+])
+def test_invalid_list_parameters_are_rejected(client, params):
+    assert client.get('/v0/servers', query_string=params).status_code == 400
+
+
+@pytest.mark.parametrize('params', [{'limit': 0}, {'limit': -5}, {'offset': -1}])
+def test_invalid_tool_lookup_parameters_are_rejected(client, params):
+    assert client.get('/v0/tools', query_string=params).status_code == 400
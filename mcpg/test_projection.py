@@ -0,0 +1,44 @@
+"""`fields` / `view` projections on list, changes and export"""
+
+import json
+
+import pytest
+
+
+@pytest.fixture
+def server(publish):
+    assert publish('kp.internal.proj1').status_code == 201
+    return 'kp.internal.proj1'
+
+
+def test_fields_pick_top_level_and_nested_paths(client, server):
+    data = client.get('/v0/servers', query_string={'fields': 'name,tools.name'}).get_json()
+    assert data['servers'] == [{'id': server, 'name': f'Server {server}', 'tools': [{'name': 'list_repos'}]}]
+
+
+def test_summary_view_drops_metadata(client, server):
+    listed = client.get('/v0/servers', query_string={'view': 'summary'}).get_json()['servers'][0]
+    assert 'metadata' not in listed and listed['tools'] == [{'name': 'list_repos'}]
+
+
+@pytest.mark.parametrize('fields', ['tools,tools.name', 'id,id.x', 'name, name'])
+def test_overlapping_fields_are_merged(client, server, fields):
+    response = client.get('/v0/servers', query_string={'fields': fields})
+    assert response.status_code == 200
+    assert response.get_json()['servers'][0]['id'] == server
+
+
+@pytest.mark.parametrize('fields', ['$where', 'name.$', 'a..b', '.name', 'name.', 'tools.$[]', 'name;drop', 'nope'])
+@pytest.mark.parametrize('path', ['/v0/servers', '/v0/servers/changes', '/v0/servers:export'])
+def test_invalid_fields_are_rejected(client, server, path, fields):
+    assert client.get(path, query_string={'fields': fields}).status_code == 400
+
+
+def test_changes_feed_accepts_updated_at_subpaths(client, server):
+    response = client.get('/v0/servers/changes', query_string={'fields': 'updated_at.x'})
+    assert response.status_code == 200
+
+
+def test_export_applies_fields(client, server):
+    response = client.get('/v0/servers:export', query_string={'fields': 'team'})
+    assert [json.loads(line) for line in response.get_data().splitlines()] == [{'id': server, 'team': 'Test Team'}]
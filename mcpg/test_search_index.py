@@ -0,0 +1,110 @@
+"""In-memory search and tool indexes: ranking, and maintenance during rebuilds"""
+
+import threading
+
+import pytest
+
+import search
+from search import InvertedIndex
+from tool_index import ToolIndex
+
+
+def doc(server_id, name, description='', tools=()):
+    return {'id': server_id, 'name': name, 'description': description, 'tags': [],
+            'tools': [{'name': tool, 'description': ''} for tool in tools]}
+
+
+@pytest.fixture
+def memory_search(registry_app, monkeypatch):
+    monkeypatch.setattr(registry_app, 'search_index', InvertedIndex())
+    return registry_app
+
+
+def test_search_ranks_exact_and_prefix_matches():
+    index = InvertedIndex()
+    index.rebuild([doc('a', 'GitHub Integration'), doc('b', 'Git tools'), doc('c', 'Slack')])
+    assert index.search('git') == ['b', 'a']
+    assert index.search('git int') == ['a']
+    assert index.search('slack', tools=['nope']) == []
+
+
+def test_prefix_expansion_keeps_most_common_terms(monkeypatch):
+    monkeypatch.setattr(search, 'MAX_PREFIX_EXPANSIONS', 3)
+    index = InvertedIndex()
+    # 'za', 'zb', 'zc' appear once; 'zz' (last alphabetically) in many documents
+    docs = [doc(f'rare-{term}', term) for term in ('za', 'zb', 'zc')]
+    docs += [doc(f'common-{number}', 'zz') for number in range(5)]
+    index.rebuild(docs)
+    results = index.search('z')
+    assert all(f'common-{number}' in results for number in range(5))
+    assert len(results) == 7  # Two of the three rare terms fit under the cap
+
+
+def rebuild_blocked_mid_scan(index, first_docs, rest_docs):
+    """Start index.rebuild() on another thread; it stops after `first_docs` until released"""
+    scanned, release = threading.Event(), threading.Event()
+
+    def docs():
+        yield from first_docs
+        scanned.set()
+        release.wait(5)
+        yield from rest_docs
+
+    thread = threading.Thread(target=index.rebuild, args=(docs(),))
+    thread.start()
+    assert scanned.wait(5)
+    return thread, release
+
+
+@pytest.mark.parametrize('index_name', ['search_index', 'tool_index'])
+def test_write_during_rebuild_is_not_lost(memory_search, publish, client, auth_headers, index_name):
+    registry_app = memory_search
+    publish('kp.internal.rebuild1', tools=[{'name': 'old_tool', 'description': 'x'}])
+    publish('kp.internal.rebuild2')
+    index = getattr(registry_app, index_name)
+    stale = registry_app.servers_collection.find_one({'id': 'kp.internal.rebuild1'}, {'_id': 0})
+    rest = registry_app.servers_collection.find_one({'id': 'kp.internal.rebuild2'}, {'_id': 0})
+    index.invalidate()
+
+    # The rebuild has read the old copy of rebuild1 when the update commits
+    thread, release = rebuild_blocked_mid_scan(index, [stale], [rest])
+    writer = threading.Thread(target=client.put, args=('/v0/servers/kp.internal.rebuild1',), kwargs={
+        'json': {'name': 'Renamed', 'tools': [{'name': 'new_tool', 'description': 'x'}]}, 'headers': auth_headers})
+    writer.start()
+    writer.join(0.2)  # Blocked on the index lock until the rebuild finishes
+    release.set()
+    thread.join(5)
+    writer.join(5)
+
+    assert index.built
+    if index_name == 'search_index':
+        assert index.search('renamed') == ['kp.internal.rebuild1']
+    else:
+        assert index.search('new_tool', 'exact')[1] == 1
+        assert index.search('old_tool', 'exact')[1] == 0
+
+
+def test_delete_during_rebuild_is_not_lost(memory_search, publish, client, auth_headers):
+    registry_app = memory_search
+    publish('kp.internal.rebuild3')
+    index = registry_app.tool_index
+    stale = registry_app.servers_collection.find_one({'id': 'kp.internal.rebuild3'}, {'_id': 0})
+    index.invalidate()
+
+    thread, release = rebuild_blocked_mid_scan(index, [stale], [])
+    writer = threading.Thread(target=client.delete, args=('/v0/servers/kp.internal.rebuild3',),
+                              kwargs={'headers': auth_headers})
+    writer.start()
+    writer.join(0.2)
+    release.set()
+    thread.join(5)
+    writer.join(5)
+    assert index.search('list_repos', 'exact')[1] == 0
+
+
+def test_tool_index_lookup_modes():
+    index = ToolIndex()
+    index.rebuild([doc('a', 'A', tools=['list_repos', 'send_message']), doc('b', 'B', tools=['list_repos'])])
+    assert index.search('LIST_REPOS', 'exact')[1] == 2
+    assert [entry['name'] for entry in index.search('list', 'prefix')[0]] == ['list_repos', 'list_repos']
+    assert index.search('lst_repos', 'fuzzy')[1] == 2
@@ -0,0 +1,129 @@
+"""Background sync: change stream handling, reconnects and polling"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from sync import ChangeSync
+
+
+class FakeStream:
+    def __init__(self, events, fail_when_drained=None):
+        self.events = list(events)
+        self.fail_when_drained = fail_when_drained
+        self.resume_token = {'_data': 'start'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def try_next(self):
+        if self.events:
+            event = self.events.pop(0)
+            self.resume_token = {'_data': f'after-{len(self.events)}'}
+            return event
+        if self.fail_when_drained is not None:
+            raise self.fail_when_drained
+        return None
+
+
+class FakeCollection:
+    """watch() returns the next scripted stream (or raises the next scripted error)"""
+
+    def __init__(self, streams):
+        self.streams = list(streams)
+        self.resume_after = []
+
+    def watch(self, *args, resume_after=None, **kwargs):
+        self.resume_after.append(resume_after)
+        stream = self.streams.pop(0) if self.streams else FakeStream([])
+        if isinstance(stream, Exception):
+            raise stream
+        return stream
+
+
+def run_until(sync, condition, timeout=5.0):
+    sync.ensure_started()
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sync.stop()
+    assert condition()
+
+
+def recording(sync):
+    seen = []
+    sync.add_listener(lambda server_id, deleted: seen.append((server_id, deleted)))
+    return seen
+
+
+def test_upserts_and_tombstones_are_attributed_to_one_server():
+    servers = FakeCollection([FakeStream([
+        {'operationType': 'update', 'fullDocument': {'id': 'kp.internal.a'}},
+        {'operationType': 'delete', 'documentKey': {'_id': 1}},
+    ])])
+    tombstones = FakeCollection([FakeStream([{'operationType': 'insert', 'fullDocument': {'id': 'kp.internal.b'}}])])
+    sync = ChangeSync(servers, tombstones, mode='changestream')
+    seen = recording(sync)
+    run_until(sync, lambda: len(seen) >= 3)
+    # Reset once at open; the server delete event itself is covered by the tombstone
+    assert seen == [(None, False), ('kp.internal.b', True), ('kp.internal.a', False)]
+
+
+def test_stream_failure_reopens_and_resumes():
+    servers = FakeCollection([
+        FakeStream([{'operationType': 'insert', 'fullDocument': {'id': 'kp.internal.a'}}],
+                   fail_when_drained=AutoReconnect('connection reset')),
+        FakeStream([{'operationType': 'insert', 'fullDocument': {'id': 'kp.internal.c'}}]),
+    ])
+    tombstones = FakeCollection([FakeStream([]), FakeStream([])])
+    sync = ChangeSync(servers, tombstones, mode='changestream', reconnect_delay=0.01)
+    seen = recording(sync)
+    run_until(sync, lambda: ('kp.internal.c', False) in seen)
+    assert sync.reconnects == 1 and sync.errors == 1
+    assert servers.resume_after[1] == {'_data': 'after-0'}
+    # Resumed, so no second reset of local state
+    assert seen.count((None, False)) == 1
+
+
+def test_lost_resume_token_reopens_from_now_and_resets():
+    servers = FakeCollection([
+        FakeStream([], fail_when_drained=OperationFailure('history lost', code=286)),
+        FakeStream([]),
+    ])
+    tombstones = FakeCollection([FakeStream([]), FakeStream([])])
+    sync = ChangeSync(servers, tombstones, mode='changestream', reconnect_delay=0.01)
+    seen = recording(sync)
+    run_until(sync, lambda: seen.count((None, False)) == 2)
+    assert servers.resume_after[1] is None
+    assert sync.stats()['reconnects'] == 1
+
+
+def test_changestream_mode_keeps_retrying_until_streams_open():
+    servers = FakeCollection([AutoReconnect('no primary'), AutoReconnect('no primary'), FakeStream([])])
+    sync = ChangeSync(servers, FakeCollection([]), mode='changestream', reconnect_delay=0.01)
+    seen = recording(sync)
+    run_until(sync, lambda: seen == [(None, False)])
+    assert sync.reconnects == 2 and sync.errors == 2
+    assert sync.stats()['last_error'] == 'no primary'
+
+
+def test_auto_mode_falls_back_to_polling():
+    db = mongomock.MongoClient().db
+    sync = ChangeSync(db.servers, db.tombstones, mode='auto', poll_interval=0.01)
+    seen = recording(sync)
+    sync.created_at -= timedelta(seconds=60)
+    now = datetime.now(timezone.utc)
+    db.servers.insert_one({'id': 'kp.internal.p', 'updated_at': now})
+    db.tombstones.insert_one({'id': 'kp.internal.q', 'deleted_at': now})
+    run_until(sync, lambda: {('kp.internal.p', False), ('kp.internal.q', True)} <= set(seen))
+    assert sync.active_mode == 'poll'
+
+
+def test_health_reports_sync_state(client):
+    sync = client.get('/v0/health').get_json()['sync']
+    assert {'running', 'connected', 'reconnects', 'last_error'} <= set(sync)
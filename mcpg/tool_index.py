@@ -0,0 +1,177 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Iterable, List, Tuple
+
+from search import tokenize
+
+# Only what the index needs when (re)building from the collection
+TOOL_INDEX_PROJECTION = {'_id': 0, 'id': 1, 'name': 1, 'tools.name': 1, 'tools.description': 1}
+
+MATCH_MODES = ('exact', 'prefix', 'fuzzy')
+
+# Share of the query's trigrams a tool name must contain to be a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+
+def _trigrams(name: str) -> set:
+    """Trigrams of the name's tokens; `list_repos` and `List Repos` give the same set"""
+    padded = f" {' '.join(tokenize(name))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ToolIndex:
+    """In-process map of tool name -> servers exposing it, with exact, prefix and fuzzy lookup.
+
+    Names are matched case-insensitively. Fuzzy lookup ranks names by how many of
+    the query's trigrams they contain, so typos and partial names still match.
+    """
+
+    def __init__(self):
+        self.built = False
+        self._tools = defaultdict(dict)  # lowercased tool name -> {server_id: (tool name, description)}
+        self._names = []  # sorted lowercased tool names, for prefix lookups
+        self._grams = defaultdict(set)  # trigram -> lowercased tool names containing it
+        self._gram_counts = {}  # lowercased tool name -> number of trigrams
+        self._server_names = {}  # server_id -> server name
+        self._doc_tools = {}  # server_id -> lowercased tool names (for removal)
+        self._lock = threading.RLock()
+
+    def rebuild(self, docs: Iterable[dict]) -> int:
+        """Replace the index contents with `docs`; returns the number of servers indexed"""
+        with self._lock:
+            self._tools = defaultdict(dict)
+            self._names = []
+            self._grams = defaultdict(set)
+            self._gram_counts = {}
+            self._server_names = {}
+            self._doc_tools = {}
+            for doc in docs:
+                self._add(doc, sort_names=False)
+            self._names = sorted(self._tools)
+            self.built = True
+            return len(self._doc_tools)
+
+    def invalidate(self) -> None:
+        """Mark the index stale so the owner rebuilds it from the collection"""
+        with self._lock:
+            self.built = False
+
+    def add(self, doc: dict) -> None:
+        """Index (or re-index) the tools of a single server document"""
+        with self._lock:
+            self._add(doc, sort_names=True)
+
+    def remove(self, server_id: str) -> None:
+        with self._lock:
+            self._remove(server_id)
+
+    def _add(self, doc: dict, sort_names: bool) -> None:
+        server_id = doc['id']
+        self._remove(server_id)
+        keys = set()
+        for tool in doc.get('tools') or []:
+            name = tool.get('name')
+            if not name:
+                continue
+            key = name.lower()
+            servers = self._tools[key]
+            if not servers:
+                if sort_names:
+                    self._names.insert(bisect_left(self._names, key), key)
+                grams = _trigrams(key)
+                for gram in grams:
+                    self._grams[gram].add(key)
+                self._gram_counts[key] = len(grams)
+            servers[server_id] = (name, tool.get('description') or '')
+            keys.add(key)
+        self._server_names[server_id] = doc.get('name') or ''
+        self._doc_tools[server_id] = keys
+
+    def _remove(self, server_id: str) -> None:
+        keys = self._doc_tools.pop(server_id, None)
+        if keys is None:
+            return
+        self._server_names.pop(server_id, None)
+        for key in keys:
+            servers = self._tools[key]
+            servers.pop(server_id, None)
+            if servers:
+                continue
+            del self._tools[key]
+            index = bisect_left(self._names, key)
+            if index < len(self._names) and self._names[index] == key:
+                del self._names[index]
+            for gram in _trigrams(key):
+                names = self._grams.get(gram)
+                if names is not None:
+                    names.discard(key)
+                    if not names:
+                        del self._grams[gram]
+            self._gram_counts.pop(key, None)
+
+    def _match(self, query: str, mode: str) -> List[str]:
+        """Matching lowercased tool names, best first"""
+        key = query.lower()
+        if mode == 'exact':
+            return [key] if key in self._tools else []
+        if mode == 'prefix':
+            # The exact name (if any) sorts first among the names it prefixes
+            start = bisect_left(self._names, key)
+            return self._names[start:bisect_left(self._names, key + '\U0010ffff', start)]
+        query_grams = _trigrams(key)
+        if not query_grams:
+            return []
+        common = defaultdict(int)
+        for gram in query_grams:
+            for name in self._grams.get(gram, ()):
+                common[name] += 1
+        scored = []
+        for name, shared in common.items():
+            coverage = shared / len(query_grams)
+            if coverage >= FUZZY_THRESHOLD:
+                dice = 2 * shared / (len(query_grams) + self._gram_counts[name])
+                scored.append((-coverage, -dice, name))
+        scored.sort()
+        return [name for _, _, name in scored]
+
+    def search(self, query: str, mode: str = 'prefix', offset: int = 0, limit: int = 20) -> Tuple[List[dict], int]:
+        """One page of (tool, server) matches -> (entries, total matches).
+
+        Entries are ordered by match quality, then tool name, then server id.
+        """
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode '{mode}'")
+        with self._lock:
+            names = self._match(query, mode)
+            total = sum(len(self._tools[name]) for name in names)
+            end = offset + limit if limit > 0 else total
+            entries = []
+            position = 0
+            for name in names:
+                servers = self._tools[name]
+                if position + len(servers) <= offset:
+                    position += len(servers)
+                    continue
+                for server_id in sorted(servers):
+                    if position >= end:
+                        break
+                    if position >= offset:
+                        tool_name, description = servers[server_id]
+                        entries.append({
+                            'name': tool_name,
+                            'description': description,
+                            'server': {'id': server_id, 'name': self._server_names.get(server_id, '')},
+                        })
+                    position += 1
+                if position >= end:
+                    break
+            return entries, total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'built': self.built,
+                'servers': len(self._doc_tools),
+                'tools': len(self._names),
+            }
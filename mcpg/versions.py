@@ -0,0 +1,45 @@
+import pymongo
+from pymongo.errors import DuplicateKeyError
+
+# Single document in the meta collection holding the registry-wide write counters:
+# `version` (advanced after writes commit; drives list ETags) and `sync_seq` (reserved
+# before a write, to order it in the changes feed)
+REGISTRY_VERSION_ID = 'registry'
+
+
+def bump_registry_version(meta_collection, count: int = 1) -> int:
+    """Atomically advance the registry version by `count` writes; returns the new value"""
+    doc = meta_collection.find_one_and_update(
+        {'_id': REGISTRY_VERSION_ID},
+        {'$inc': {'version': count}},
+        upsert=True,
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+    return doc['version']
+
+
+def get_registry_version(meta_collection) -> int:
+    """Current registry version (0 before the first tracked write)"""
+    doc = meta_collection.find_one({'_id': REGISTRY_VERSION_ID})
+    return doc.get('version', 0) if doc else 0
+
+
+def reserve_sync_seqs(meta_collection, count: int = 1) -> int:
+    """Atomically reserve `count` consecutive changes-feed sequence numbers; returns the first"""
+    doc = meta_collection.find_one_and_update(
+        {'_id': REGISTRY_VERSION_ID, 'sync_seq': {'$exists': True}},
+        {'$inc': {'sync_seq': count}},
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+    if doc is None:
+        # First reservation: continue after the version, which used to number writes
+        try:
+            meta_collection.update_one(
+                {'_id': REGISTRY_VERSION_ID, 'sync_seq': {'$exists': False}},
+                {'$set': {'sync_seq': get_registry_version(meta_collection)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # Another worker initialised it first
+        return reserve_sync_seqs(meta_collection, count)
+    return doc['sync_seq'] - count + 1
@@ -0,0 +1,9 @@
+"""
+WSGI entry point for production servers (see gunicorn.conf.py).
+
+Startup work runs at import, so with preload_app it happens once in the master.
+"""
+
+from app import app, prepare_to_serve
+
+prepare_to_serve()